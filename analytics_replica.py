@@ -0,0 +1,268 @@
+# Optional columnar replica of customers and predictions for aggregate queries
+#
+#   pip install duckdb
+#   CHURN_ANALYTICS=duckdb gunicorn -c gunicorn.conf.py backend_app:app
+#   python benchmark_analytics.py --customers 1000000 10000000
+#
+# SQLite answers dashboard totals, revenue at risk and segment breakdowns by
+# reading every row of both tables. With CHURN_ANALYTICS=duckdb each serving
+# process keeps a DuckDB copy of them. A background thread brings the copy up to
+# date: customers by updated_at, predictions by prediction_id, which only grows.
+# Aggregate endpoints query the copy. Point lookups and writes stay on SQLite.
+# The aggregate SQL below runs on both engines, so without the replica the same
+# queries go to SQLite. There {latest_predictions} is the latest_predictions
+# table, one row per customer kept current by triggers; the replica computes
+# it with a window over its copy of predictions.
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from customer_snapshot import CATEGORICAL_COLUMNS
+from db_migrations import DB_PATH
+from prediction_partitions import PREDICTION_COLUMNS, PredictionPartitions, month_bounds
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Columns /api/analytics/segments can group by
+SEGMENT_COLUMNS = CATEGORICAL_COLUMNS
+
+# {customers}, {predictions} and {latest_predictions} are filled in with each engine's relation
+# names. On the replica, ties on prediction_date go to the later prediction_id, as they do in
+# the trigger that maintains SQLite's latest_predictions
+LATEST_PREDICTIONS_SQL = """
+    SELECT customer_id, churn_probability, risk_level
+    FROM (
+        SELECT customer_id, churn_probability, risk_level,
+               ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY prediction_date DESC, prediction_id DESC) AS rn
+        FROM {predictions}
+    ) ranked
+    WHERE rn = 1
+"""
+
+DASHBOARD_SQL = """
+    SELECT
+        COUNT(*) AS total_customers,
+        AVG(p.churn_probability) AS avg_churn_prob,
+        SUM(CASE WHEN p.risk_level = 'High Risk' THEN 1 ELSE 0 END) AS high_risk_customers,
+        SUM(CASE WHEN p.risk_level = 'Medium Risk' THEN 1 ELSE 0 END) AS medium_risk_customers,
+        SUM(CASE WHEN p.risk_level = 'Low Risk' THEN 1 ELSE 0 END) AS low_risk_customers,
+        SUM(CASE WHEN p.risk_level = 'High Risk' THEN c.monthly_bill ELSE 0 END) AS revenue_at_risk
+    FROM {customers} c
+    LEFT JOIN {latest_predictions} p ON p.customer_id = c.customer_id
+    WHERE c.status = 'active'
+"""
+
+SEGMENTS_SQL = """
+    SELECT
+        c.{segment} AS segment,
+        COUNT(*) AS customers,
+        COUNT(p.customer_id) AS scored_customers,
+        AVG(p.churn_probability) AS avg_churn_prob,
+        SUM(CASE WHEN p.risk_level = 'High Risk' THEN 1 ELSE 0 END) AS high_risk_customers,
+        SUM(c.monthly_bill) AS monthly_revenue,
+        SUM(CASE WHEN p.risk_level = 'High Risk' THEN c.monthly_bill ELSE 0 END) AS revenue_at_risk
+    FROM {customers} c
+    LEFT JOIN {latest_predictions} p ON p.customer_id = c.customer_id
+    WHERE c.status = 'active'
+    GROUP BY c.{segment}
+    ORDER BY revenue_at_risk DESC
+"""
+
+def segments_sql(segment):
+    if segment not in SEGMENT_COLUMNS:
+        raise ValueError(f"Unknown segment: {segment}. Choose one of {', '.join(SEGMENT_COLUMNS)}")
+    return SEGMENTS_SQL.replace('{segment}', segment)
+
+def dashboard_record(row):
+    total, avg_prob, high, medium, low, revenue = row
+    return {
+        'total_customers': total,
+        'average_churn_risk': round((avg_prob or 0) * 100, 1),
+        'high_risk_customers': int(high or 0),
+        'medium_risk_customers': int(medium or 0),
+        'low_risk_customers': int(low or 0),
+        'revenue_at_risk': round(revenue or 0, 2)
+    }
+
+def segment_records(rows):
+    return [
+        {
+            'segment': segment,
+            'customers': customers,
+            'scored_customers': scored,
+            'average_churn_risk': None if avg_prob is None else round(avg_prob * 100, 1),
+            'high_risk_customers': int(high or 0),
+            'monthly_revenue': round(revenue or 0, 2),
+            'revenue_at_risk': round(at_risk or 0, 2)
+        }
+        for segment, customers, scored, avg_prob, high, revenue, at_risk in rows
+    ]
+
+# SQLite declared types to DuckDB column types; timestamps stay text, as SQLite stores them
+DUCKDB_TYPES = {'INTEGER': 'BIGINT', 'REAL': 'DOUBLE', 'TEXT': 'VARCHAR', 'TIMESTAMP': 'VARCHAR', 'DATE': 'VARCHAR'}
+
+class AnalyticsReplica:
+    """DuckDB copy of customers and predictions, refreshed incrementally from SQLite"""
+
+    def __init__(self, db_path=DB_PATH, partitions=None, path=':memory:', refresh_interval=30, chunk_size=200_000):
+        if duckdb is None:
+            raise RuntimeError("CHURN_ANALYTICS=duckdb requires the duckdb package (pip install duckdb)")
+        self.db_path = db_path
+        self.partitions = partitions or PredictionPartitions(db_path)
+        self.refresh_interval = refresh_interval
+        self.chunk_size = chunk_size
+        self.path = path
+        # Opened by the first refresh, so a preforking server connects in each worker after the fork
+        self.conn = None
+        self.ready = False
+        self.customers_watermark = None
+        self.predictions_watermark = None
+        self.refreshed_at = None
+        self.last_refresh_seconds = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _create_table(self, sqlite_conn, table, source, columns=None):
+        declared = [(row[1], row[2].upper()) for row in sqlite_conn.execute(f"PRAGMA table_info({source})")]
+        if columns is not None:
+            declared = [(name, kind) for name, kind in declared if name in columns]
+        definition = ', '.join(f'"{name}" {DUCKDB_TYPES.get(kind, "VARCHAR")}' for name, kind in declared)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+
+    def _copy(self, sqlite_conn, query, params, apply):
+        """Stream a SQLite query in chunks, applying each as one DuckDB transaction; returns the row count"""
+        rows = 0
+        for chunk in pd.read_sql_query(query, sqlite_conn, params=params, chunksize=self.chunk_size):
+            cursor = self.conn.cursor()
+            try:
+                cursor.register('chunk', chunk)
+                cursor.execute("BEGIN TRANSACTION")
+                apply(cursor)
+                cursor.execute("COMMIT")
+            finally:
+                cursor.close()
+            rows += len(chunk)
+        return rows
+
+    @staticmethod
+    def _insert(table):
+        def apply(cursor):
+            cursor.execute(f"INSERT INTO {table} BY NAME SELECT * FROM chunk")
+        return apply
+
+    @staticmethod
+    def _upsert_customers(cursor):
+        cursor.execute("DELETE FROM customers WHERE customer_id IN (SELECT customer_id FROM chunk)")
+        cursor.execute("INSERT INTO customers BY NAME SELECT * FROM chunk")
+
+    def refresh(self):
+        """Copy customer and prediction rows written since the last refresh"""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            if self.conn is None:
+                self.conn = duckdb.connect(self.path)
+            sqlite_conn = sqlite3.connect(self.db_path)
+            try:
+                self.partitions.attach(sqlite_conn)
+                if not self.ready:
+                    self._create_table(sqlite_conn, 'customers', 'customers')
+                    self._create_table(sqlite_conn, 'predictions', 'predictions_all', PREDICTION_COLUMNS)
+
+                # Read the new watermarks first; rows written meanwhile are picked up again next time
+                customers_watermark = sqlite_conn.execute("SELECT MAX(updated_at) FROM customers").fetchone()[0]
+                last_id = sqlite_conn.execute("SELECT MAX(prediction_id) FROM predictions_all").fetchone()[0]
+                # Main-table ids never pass its AUTOINCREMENT sequence; partition ids start far above it
+                legacy_last_id = (sqlite_conn.execute(
+                    "SELECT seq FROM main.sqlite_sequence WHERE name = 'predictions'"
+                ).fetchone() or (0,))[0]
+                legacy_since = sqlite_conn.execute("SELECT MIN(prediction_date) FROM main.predictions").fetchone()[0]
+
+                if self.customers_watermark is None:
+                    changed = self._copy(sqlite_conn, "SELECT * FROM customers", (), self._insert('customers'))
+                else:
+                    changed = self._copy(sqlite_conn, "SELECT * FROM customers WHERE updated_at > ?",
+                                         (self.customers_watermark,), self._upsert_customers)
+                self.customers_watermark = customers_watermark
+
+                # predictions are append-only and prediction_id only grows, across partitions too
+                added = 0
+                if last_id is not None:
+                    added = self._copy(
+                        sqlite_conn,
+                        f"SELECT {', '.join(PREDICTION_COLUMNS)} FROM predictions_all "
+                        "WHERE prediction_id > ? AND prediction_id <= ?",
+                        (self.predictions_watermark or 0, last_id), self._insert('predictions')
+                    )
+                    self.predictions_watermark = last_id
+            finally:
+                sqlite_conn.close()
+
+            # Mirror what has left predictions_all: partitions of months past retention, which are no
+            # longer attached, and main-table months the retention job deleted. Main-table rows are
+            # kept until then, however old, as SQLite keeps serving them
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("DELETE FROM predictions WHERE prediction_id > ? AND prediction_date < ?",
+                               (legacy_last_id, month_bounds(self.partitions.oldest_month())[0]))
+                cursor.execute("DELETE FROM predictions WHERE prediction_id <= ? AND prediction_date < ?",
+                               (legacy_last_id, legacy_since or '9999-12-31'))
+            finally:
+                cursor.close()
+
+            self.ready = True
+            self.refreshed_at = time.time()
+            self.last_refresh_seconds = time.perf_counter() - start
+            return changed, added
+
+    def query(self, template, params=()):
+        """Run aggregate SQL written against {customers} and {predictions}"""
+        cursor = self.conn.cursor()
+        try:
+            return cursor.execute(template.format(
+                customers='customers', predictions='predictions',
+                latest_predictions=f"({LATEST_PREDICTIONS_SQL.format(predictions='predictions')})"
+            ), params).fetchall()
+        finally:
+            cursor.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='analytics-replica-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Aggregates fall back to SQLite until the initial copy finishes
+        try:
+            self.refresh()
+            print(f"✅ Analytics replica loaded in {self.last_refresh_seconds:.1f}s")
+        except Exception as e:
+            print(f"❌ Analytics replica not loaded: {e}")
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing analytics replica: {e}")
+
+    def summary(self):
+        counts = self.query("SELECT (SELECT COUNT(*) FROM {customers}), (SELECT COUNT(*) FROM {predictions})")[0]
+        return {
+            'engine': 'duckdb',
+            'customers': counts[0],
+            'predictions': counts[1],
+            'age_seconds': None if self.refreshed_at is None else round(time.time() - self.refreshed_at, 1),
+            'last_refresh_seconds': self.last_refresh_seconds
+        }
+
+def sqlite_query(conn, template, params=()):
+    """The same aggregate SQL against SQLite; conn must have predictions_all (PredictionPartitions.attach)"""
+    return conn.execute(template.format(
+        customers='customers', predictions='predictions_all', latest_predictions='latest_predictions'
+    ), params).fetchall()
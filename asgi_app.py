@@ -0,0 +1,416 @@
+# Async variant of the Customer Churn Prediction API (same routes as backend_app.py)
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# Database access goes through aiosqlite, and CPU-bound scoring runs on a bounded
+# thread pool, so one process can hold thousands of open dashboard connections
+# while scoring latency stays tied to the number of cores. Reads open their own
+# connection. Predictions are saved by one writer task that owns the only write
+# connection: it commits everything queued by concurrent requests in one
+# transaction, so statements of different requests never share an open one.
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import aiosqlite
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from backend_app import (
+    API_INFO, DB_PATH, model_registry, early_exit, wants_exact, explain_method, prediction_partitions, predict_churn,
+    prediction_record, score_batch, batch_npy_response, batch_json_payload, score_stored_customer,
+    customers_page, dashboard_payload, segments_payload, high_risk_payload, analytics, read_replica, shadow_scorer,
+    drift_monitor, online_evaluator, interaction_ingestor, change_rescorer, high_risk_index, start_background_tasks
+)
+from interaction_ingest import IngestBusy
+from columnar_batch import NPY_MIMETYPE, read_npy_records, wants_npy
+from data_export import EXPORT_FORMATS, EXPORT_SOURCES, EXPORT_TABLES, FETCH_SIZE, build_export_query, export_header, encode_batch
+from prediction_partitions import group_by_month, insert_sql, schema_name
+from prediction_trends import build_trends_query, trend_records
+
+# One scoring thread per core; the forest releases the GIL while walking trees
+SCORING_THREADS = int(os.environ.get('CHURN_SCORING_THREADS', os.cpu_count() or 1))
+# Requests beyond this many queued or running scores are shed with a 503
+MAX_PENDING_SCORES = int(os.environ.get('CHURN_MAX_PENDING_SCORES', SCORING_THREADS * 8))
+PREDICT_JOBS = int(os.environ.get('CHURN_PREDICT_JOBS', 1))
+
+logger = logging.getLogger(__name__)
+
+scoring_executor = ThreadPoolExecutor(SCORING_THREADS, thread_name_prefix='scoring')
+scoring_slots = asyncio.Semaphore(MAX_PENDING_SCORES)
+
+class ScoringQueueFull(Exception):
+    pass
+
+async def run_scoring(func, *args):
+    """Run CPU-bound scoring on the bounded executor"""
+    if scoring_slots.locked():
+        raise ScoringQueueFull()
+    async with scoring_slots:
+        return await asyncio.get_running_loop().run_in_executor(scoring_executor, func, *args)
+
+async def attach_partitions(db, months=(), partitions=prediction_partitions):
+    """Attach the monthly prediction partitions and create predictions_all on an aiosqlite connection"""
+    attached = {row[1] for row in await db.execute_fetchall("PRAGMA database_list")}
+    for statement, params in partitions.setup_statements(attached, months):
+        await db.execute(statement, params)
+
+async def connect_db():
+    db = await aiosqlite.connect(DB_PATH)
+    await attach_partitions(db)
+    return db
+
+async def connect_read_db():
+    """Connection for read-only queries: the newest snapshot if fresh enough, otherwise the primary"""
+    snapshot = read_replica.current() if read_replica is not None else None
+    if snapshot is None:
+        return await connect_db()
+    uri, partitions = snapshot
+    db = await aiosqlite.connect(uri, uri=True)
+    await attach_partitions(db, partitions=partitions)
+    return db
+
+async def insert_predictions(db, records):
+    """Async PredictionPartitions.insert; attaches a new month's partition on first use"""
+    attached = {row[1] for row in await db.execute_fetchall("PRAGMA database_list")}
+    by_month = group_by_month(records)
+    if any(schema_name(month) not in attached for month in by_month):
+        await attach_partitions(db, by_month)
+    for month, rows in by_month.items():
+        await db.executemany(insert_sql(month), rows)
+
+class PredictionWriter:
+    """Single task that owns the write connection and group-commits queued prediction records"""
+
+    def __init__(self):
+        self.db = None
+        self.saved = 0
+        self.failed = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def start(self):
+        self.db = await connect_db()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit what is already queued, then close the connection"""
+        await self._queue.put(None)
+        await self._task
+        await self.db.close()
+
+    async def save(self, records):
+        """Queue prediction_record tuples; returns once they are committed, raises if the commit failed"""
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, done))
+        await done
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+
+            records = [record for rows, _ in batch for record in rows]
+            try:
+                # Only this task touches the connection, so a new month's ATTACH cannot race another insert
+                await insert_predictions(self.db, records)
+                await self.db.commit()
+            except Exception as e:
+                await self.db.rollback()
+                self.failed += len(records)
+                logger.exception("Failed to save %d predictions", len(records))
+                for _, done in batch:
+                    # A request that went away has cancelled its future
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                self.saved += len(records)
+                for _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+            if stopping:
+                return
+
+    def summary(self):
+        return {'saved': self.saved, 'failed': self.failed, 'queued': self._queue.qsize()}
+
+prediction_writer = PredictionWriter()
+
+def error(message, status_code):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+async def home(request):
+    serving = model_registry.current()
+    info = dict(API_INFO, model_version=serving.version if serving else None)
+    if early_exit is not None:
+        info['early_exit'] = early_exit.summary()
+    if analytics is not None and analytics.ready:
+        info['analytics'] = analytics.summary()
+    if read_replica is not None:
+        info['read_replica'] = read_replica.summary()
+    info['online_evaluation'] = online_evaluator.summary()
+    info['interaction_ingest'] = interaction_ingestor.summary()
+    info['change_rescoring'] = change_rescorer.summary()
+    info['high_risk_index'] = high_risk_index.summary()
+    info['prediction_writer'] = prediction_writer.summary()
+    return JSONResponse(info)
+
+async def api_predict(request):
+    try:
+        customer_data = await request.json()
+        if not customer_data:
+            return error("No customer data provided", 400)
+
+        prediction = await run_scoring(
+            predict_churn, customer_data, wants_exact(request.query_params), explain_method(request.query_params, 'shap')
+        )
+
+        # Save prediction to database if customer_id provided
+        if 'customer_id' in customer_data and 'error' not in prediction:
+            # A failed save is logged by the writer; the caller still gets the score
+            with contextlib.suppress(Exception):
+                await prediction_writer.save([prediction_record(customer_data['customer_id'], prediction)])
+
+        return JSONResponse(prediction)
+
+    except ScoringQueueFull:
+        return error("Scoring queue full, retry later", 503)
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+def _batch_response(body, npy_request, npy_response, exact, explain):
+    # Parsing, scoring and encoding are all CPU-bound, so the whole batch runs off the event loop
+    if npy_request:
+        customers = read_npy_records(body)
+        fields = customers.dtype.names
+    else:
+        customers_data = json.loads(body or b'null')
+        if not customers_data or not isinstance(customers_data, list):
+            raise ValueError("Expected list of customer data")
+        customers = pd.DataFrame(customers_data)
+        fields = customers.columns
+
+    scores = score_batch(customers, fields, exact, explain)
+    if npy_response:
+        body, headers = batch_npy_response(scores)
+        return Response(body, media_type=NPY_MIMETYPE, headers=headers)
+    return JSONResponse(batch_json_payload(customers, fields, scores))
+
+async def batch_predict(request):
+    """Predict churn for multiple customers as JSON or a columnar .npy array"""
+    try:
+        if model_registry.current() is None:
+            return error("Model not loaded", 503)
+
+        npy_request = request.headers.get('content-type', '').split(';')[0].strip().lower() == NPY_MIMETYPE
+        npy_response = wants_npy(request.headers.get('accept'))
+        return await run_scoring(
+            _batch_response, await request.body(), npy_request, npy_response,
+            wants_exact(request.query_params), explain_method(request.query_params, 'path')
+        )
+
+    except ScoringQueueFull:
+        return error("Scoring queue full, retry later", 503)
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def get_customers(request):
+    try:
+        page = int(request.query_params.get('page', 1))
+        per_page = int(request.query_params.get('per_page', 20))
+        return JSONResponse(customers_page(page, per_page))
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def dashboard_stats(request):
+    try:
+        # Aggregates may scan whole tables, so keep them off the event loop
+        return JSONResponse(await asyncio.to_thread(dashboard_payload))
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def prediction_trends(request):
+    """Daily prediction volume, churn probability and risk bands from the rollup table"""
+    try:
+        query, params = build_trends_query(request.query_params)
+        db = await connect_read_db()
+        try:
+            rows = await db.execute_fetchall(query, params)
+        finally:
+            await db.close()
+        return JSONResponse(trend_records(rows))
+
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def customer_segments(request):
+    """Churn risk and revenue at risk broken down by ?by=<categorical column>"""
+    try:
+        return JSONResponse(await asyncio.to_thread(segments_payload, request.query_params.get('by', 'contract_type')))
+
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def high_risk_customers(request):
+    """Active High Risk customers ranked by latest churn probability"""
+    try:
+        page = int(request.query_params.get('page', 1))
+        per_page = int(request.query_params.get('per_page', 20))
+        # Pages past the in-memory ranking query SQLite
+        return JSONResponse(await asyncio.to_thread(high_risk_payload, page, per_page))
+
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def score_customer(request):
+    """Score a stored customer from the in-memory feature store"""
+    try:
+        if model_registry.current() is None:
+            return error("Model not loaded", 503)
+
+        prediction = await run_scoring(
+            score_stored_customer, request.path_params['customer_id'], wants_exact(request.query_params),
+            explain_method(request.query_params, 'shap')
+        )
+        if prediction is None:
+            return error("Customer not found", 404)
+
+        return JSONResponse(prediction)
+
+    except ScoringQueueFull:
+        return error("Scoring queue full, retry later", 503)
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+async def export_table(request):
+    """Stream customers or predictions as CSV or newline-delimited JSON"""
+    table = request.path_params['table']
+    if table not in EXPORT_TABLES:
+        return error(f"Unknown export: {table}", 404)
+
+    args = dict(request.query_params)
+    export_format = args.pop('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return error(f"Unsupported format: {export_format}", 400)
+
+    conn = await connect_read_db()
+    try:
+        available = [row[1] for row in await conn.execute_fetchall(f"PRAGMA table_info({EXPORT_SOURCES[table]})")]
+        query, params, columns = build_export_query(available, table, args)
+        await conn.execute(f"EXPLAIN {query}", params)
+    except (ValueError, sqlite3.Error) as e:
+        await conn.close()
+        return error(str(e), 400)
+
+    async def stream():
+        try:
+            yield export_header(columns, export_format)
+            async with conn.execute(query, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    yield encode_batch(rows, columns, export_format)
+        finally:
+            await conn.close()
+
+    return StreamingResponse(stream(), media_type=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename={table}.{export_format}'
+    })
+
+async def shadow_stats(request):
+    """Compare the shadow candidate model with the served one on live traffic"""
+    try:
+        return JSONResponse(shadow_scorer.summary())
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def feature_drift(request):
+    """PSI and KS of live scored features against the training reference histograms"""
+    try:
+        return JSONResponse(drift_monitor.summary(request.query_params.get('histograms') == '1'))
+
+    except Exception as e:
+        return error(str(e), 500)
+
+async def ingest_interactions(request):
+    """Store newline-delimited JSON interaction events; returns once they are committed"""
+    try:
+        body = await request.body()
+        # Validation and the wait for the group commit both block, so they run off the event loop
+        return JSONResponse(await asyncio.get_running_loop().run_in_executor(None, interaction_ingestor.ingest, body))
+
+    except IngestBusy as e:
+        return error(str(e), 503)
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(str(e), 500)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    model_registry.set_n_jobs(PREDICT_JOBS)
+    start_background_tasks()
+    await prediction_writer.start()
+    try:
+        yield
+    finally:
+        await prediction_writer.stop()
+        scoring_executor.shutdown(wait=True)
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/api/predict', api_predict, methods=['POST']),
+        Route('/api/batch-predict', batch_predict, methods=['POST']),
+        Route('/api/customers', get_customers),
+        Route('/api/dashboard', dashboard_stats),
+        Route('/api/dashboard/trends', prediction_trends),
+        Route('/api/analytics/segments', customer_segments),
+        Route('/api/customers/high-risk', high_risk_customers),
+        Route('/api/customers/{customer_id}/score', score_customer),
+        Route('/api/export/{table}', export_table),
+        Route('/api/shadow', shadow_stats),
+        Route('/api/drift', feature_drift),
+        Route('/api/interactions', ingest_interactions, methods=['POST']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🚀 Starting async Customer Churn Prediction API...")
+    print(f"⚙️  {SCORING_THREADS} scoring threads, up to {MAX_PENDING_SCORES} pending scores")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
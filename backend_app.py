@@ -1,63 +1,124 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import pandas as pd
-import joblib
 import json
+import os
 import numpy as np
+from collections import namedtuple
 from datetime import datetime
+from db_migrations import DB_PATH, migrate_database
+from feature_store import FeatureStore
+from customer_snapshot import CustomerSnapshot
+from data_export import EXPORT_TABLES, export_stream
+from prediction_partitions import PredictionPartitions
+from read_replica import SnapshotReplica
+from analytics_replica import (
+    AnalyticsReplica, DASHBOARD_SQL, dashboard_record, segments_sql, segment_records, sqlite_query
+)
+from prediction_trends import build_trends_query, trend_records
+from model_registry import ModelRegistry
+from shadow_scoring import ShadowScorer
+from drift_monitor import DriftMonitor
+from online_evaluation import OnlineEvaluator
+from interaction_ingest import IngestBusy, InteractionIngestor
+from change_rescoring import ChangeRescorer
+from high_risk_index import HighRiskIndex
+from early_exit import EarlyExitEvaluator
+from recommendation_rules import RecommendationRules
+from explanations import EXPLAIN_METHODS, ForestExplainer
+from columnar_batch import NPY_MIMETYPE, RISK_LEVELS, read_npy_records, wants_npy, write_npy, risk_codes
+from churn_features import (
+    RAW_FEATURES, FEATURE_COLUMNS, INTERACTION_FEATURES, INTERACTION_FEATURES_ENABLED, create_features,
+    create_feature_matrix
+)
+from interaction_windows import stored_window_counts
 
 app = Flask(__name__)
 CORS(app)
 
-# Load the trained model
+# Serve the current version from the model registry (falls back to churn_model.pkl)
+model_registry = ModelRegistry()
 try:
-    model = joblib.load('churn_model.pkl')
-    print("✅ Model loaded successfully")
-except:
-    model = None
+    model_registry.load_initial()
+    print(f"✅ Model {model_registry.active.version} loaded successfully")
+except Exception:
     print("❌ Model not found")
 
+# New predictions go to monthly partition files; read them through the predictions_all view
+prediction_partitions = PredictionPartitions(DB_PATH)
+
 def get_db_connection():
-    conn = sqlite3.connect('churn_prediction_system.db')
+    conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    prediction_partitions.attach(conn)
     return conn
 
-def create_features(data):
-    """Create engineered features for churn prediction"""
-    numeric_features = [
-        'age', 'subscription_length_months', 'monthly_bill', 'total_usage_gb',
-        'customer_service_calls', 'satisfaction_score', 'last_payment_days_ago',
-        'last_login_days_ago', 'credit_score', 'support_tickets', 'avg_monthly_usage_growth'
-    ]
-
-    binary_features = [
-        'phone_service', 'multiple_lines', 'online_security', 'online_backup',
-        'device_protection', 'tech_support', 'streaming_tv', 'streaming_movies', 'paperless_billing'
-    ]
-
-    # Create feature matrix
-    X = data[numeric_features + binary_features].copy()
-
-    # Add engineered features
-    X['clv_estimate'] = data['monthly_bill'] * data['subscription_length_months']
-    X['services_count'] = data[binary_features].sum(axis=1)
-    X['high_value'] = (data['monthly_bill'] > 100).astype(int)
-    X['new_customer'] = (data['subscription_length_months'] <= 6).astype(int)
-    X['at_risk'] = ((data['satisfaction_score'] < 6) | 
-                    (data['customer_service_calls'] > 3) |
-                    (data['last_payment_days_ago'] > 30)).astype(int)
-
-    # Add categorical features as binary
-    X['contract_monthly'] = (data['contract_type'] == 'Month-to-month').astype(int)
-    X['payment_electronic'] = (data['payment_method'] == 'Electronic check').astype(int)
-    X['internet_fiber'] = (data['internet_service'] == 'Fiber optic').astype(int)
-
-    return X
+# Optional snapshot copies of the database for read-only endpoints (CHURN_READ_REPLICA=snapshot)
+read_replica = None
+if os.environ.get('CHURN_READ_REPLICA') == 'snapshot':
+    read_replica = SnapshotReplica(DB_PATH, prediction_partitions)
+
+def get_read_connection():
+    """Connection for read-only queries: the newest snapshot if fresh enough, otherwise the primary"""
+    snapshot = read_replica.current() if read_replica is not None else None
+    if snapshot is None:
+        return get_db_connection()
+    uri, partitions = snapshot
+    conn = sqlite3.connect(uri, uri=True)
+    conn.row_factory = sqlite3.Row
+    partitions.attach(conn)
+    return conn
 
-def predict_churn(customer_data):
+# Retention recommendations from retention_rules.json, reloaded when the file changes
+recommendation_rules = RecommendationRules(FEATURE_COLUMNS)
+try:
+    recommendation_rules.reload()
+except Exception as e:
+    print(f"❌ Retention rules not loaded: {e}")
+
+# Risk colors, indexed like RISK_LEVELS
+RISK_COLORS = ['#28a745', '#ffc107', '#dc3545']
+
+def decision_thresholds():
+    """Probabilities the response turns on: risk bands, churn_prediction and probability rules"""
+    return sorted({0.4, 0.5, 0.7}.union(recommendation_rules.current().probability_thresholds))
+
+# Optional early-exit scoring (CHURN_EARLY_EXIT=1): stop walking trees once a row's band is
+# decided; CHURN_EARLY_EXIT_Z additionally stops rows that are that many standard errors clear
+early_exit = None
+if os.environ.get('CHURN_EARLY_EXIT') == '1':
+    early_exit_z = os.environ.get('CHURN_EARLY_EXIT_Z')
+    early_exit = EarlyExitEvaluator(z=float(early_exit_z) if early_exit_z else None)
+
+def wants_exact(args):
+    """True when the request asks for the exact probability (?exact=1)"""
+    return args.get('exact', '').lower() in ('1', 'true')
+
+# Per-customer feature contributions (?explain=shap|path), cached by feature vector
+explainer = ForestExplainer(FEATURE_COLUMNS)
+
+def explain_method(args, default):
+    """Explanation method asked for with ?explain=, or None; explain=1 picks the endpoint's default"""
+    value = args.get('explain', '').lower()
+    if value in ('', '0', 'false'):
+        return None
+    if value in ('1', 'true'):
+        return default
+    if value not in EXPLAIN_METHODS:
+        raise ValueError(f"Unknown explanation method: {value}")
+    return value
+
+def churn_probabilities(serving, X, exact=False):
+    """Churn probabilities and trees evaluated per row (None when the whole forest was used)"""
+    if early_exit is None or exact:
+        return serving.model.predict_proba(X)[:, 1], None
+    return early_exit.predict(serving, X, decision_thresholds())
+
+def predict_churn(customer_data, exact=False, explain=None):
     """Predict churn for a customer"""
-    if model is None:
+    serving = model_registry.current()
+    if serving is None:
         return {"error": "Model not loaded"}
 
     try:
@@ -66,48 +127,304 @@ def predict_churn(customer_data):
         else:
             customer_df = customer_data.copy()
 
-        X_customer = create_features(customer_df)
-        churn_prob = model.predict_proba(X_customer)[0, 1]
-        churn_pred = int(churn_prob >= 0.5)
-
-        if churn_prob >= 0.7:
-            risk_level = "High Risk"
-            risk_color = "#dc3545"
-        elif churn_prob >= 0.4:
-            risk_level = "Medium Risk" 
-            risk_color = "#ffc107"
-        else:
-            risk_level = "Low Risk"
-            risk_color = "#28a745"
-
-        recommendations = []
-        if churn_prob > 0.6:
-            recommendations.append("🔴 URGENT: Contact customer immediately")
-        if customer_data.get('satisfaction_score', 7) < 6:
-            recommendations.append("📞 Follow up on satisfaction concerns")
-        if customer_data.get('customer_service_calls', 0) > 3:
-            recommendations.append("🎧 Provide premium support")
-        if not recommendations:
-            recommendations.append("✅ Customer appears stable")
-
-        return {
-            'churn_probability': round(churn_prob * 100, 1),
-            'churn_prediction': churn_pred,
-            'risk_level': risk_level,
-            'risk_color': risk_color,
-            'recommendations': recommendations
-        }
+        X_customer = create_features(with_stored_interaction_counts(customer_df))
+        churn_probs, trees_evaluated = churn_probabilities(serving, X_customer, exact)
+        features = X_customer.to_numpy()
+        drift_monitor.record(features)
+        prediction = build_predictions(churn_probs, features)[0]
+        prediction['model_version'] = serving.version
+        add_early_exit_fields(prediction, serving, trees_evaluated, features, churn_probs[0])
+        if explain:
+            prediction['explanation'] = explainer.explain(serving, features, explain)[0]
+        return prediction
 
     except Exception as e:
         return {"error": str(e)}
 
+def with_stored_interaction_counts(customer_df):
+    """customer_df with window counts it lacks filled in for stored customers, as the feature store has them
+
+    Counts sent in the payload win. Rows of unknown or anonymous customers keep their gaps, so
+    create_features still rejects them rather than scoring them as having no interactions.
+    """
+    if not INTERACTION_FEATURES_ENABLED or 'customer_id' not in customer_df:
+        return customer_df
+    customer_df = customer_df.reindex(columns=customer_df.columns.union(INTERACTION_FEATURES, sort=False))
+    gaps = customer_df[INTERACTION_FEATURES].isna().any(axis=1) & customer_df['customer_id'].notna()
+    if not gaps.any():
+        return customer_df
+
+    conn = get_db_connection()
+    try:
+        counts = stored_window_counts(conn, customer_df.loc[gaps, 'customer_id'].unique().tolist())
+    finally:
+        conn.close()
+    stored = gaps & customer_df['customer_id'].isin(counts.index)
+    if stored.any():
+        filled = counts.loc[customer_df.loc[stored, 'customer_id']].set_axis(customer_df.index[stored])
+        customer_df.loc[stored, INTERACTION_FEATURES] = customer_df.loc[stored, INTERACTION_FEATURES].fillna(filled)
+    return customer_df
+
+def add_early_exit_fields(prediction, serving, trees_evaluated, features, churn_prob):
+    """Report how a single prediction was scored; only full-forest scores go to the shadow model"""
+    if trees_evaluated is None:
+        shadow_scorer.submit(features, churn_prob)
+        return
+    prediction['trees_evaluated'] = int(trees_evaluated[0])
+    prediction['probability_exact'] = bool(trees_evaluated[0] == early_exit.n_trees(serving))
+
+def build_predictions(churn_probs, X):
+    """Prediction responses for churn probabilities and the matching feature matrix rows"""
+    codes = risk_codes(churn_probs)
+    recommendations = recommendation_rules.current().recommend(X, churn_probs)
+    return [
+        {
+            'churn_probability': round(float(churn_prob) * 100, 1),
+            'churn_prediction': int(churn_prob >= 0.5),
+            'risk_level': RISK_LEVELS[code],
+            'risk_color': RISK_COLORS[code],
+            'recommendations': messages
+        }
+        for churn_prob, code, messages in zip(churn_probs, codes, recommendations)
+    ]
+
+# Keep every customer's feature vector in memory so scoring by ID skips SQLite
+feature_store = FeatureStore(create_features, DB_PATH, interactions=INTERACTION_FEATURES_ENABLED)
+try:
+    migrate_database()
+    feature_store.load()
+    print(f"✅ Feature store loaded ({feature_store.size} customers)")
+except Exception as e:
+    print(f"❌ Feature store not loaded: {e}")
+
+# Columnar copy of customers for list, filter and count endpoints
+customer_snapshot = CustomerSnapshot(DB_PATH)
+try:
+    customer_snapshot.refresh(force=True)
+    print(f"✅ Customer snapshot loaded ({customer_snapshot.current.size} customers)")
+except Exception as e:
+    print(f"❌ Customer snapshot not loaded: {e}")
+
+# Top active High Risk customers by latest churn probability, for /api/customers/high-risk
+high_risk_index = HighRiskIndex(DB_PATH)
+try:
+    high_risk_index.load()
+    print(f"✅ High-risk index loaded ({len(high_risk_index.ranked)} customers)")
+except Exception as e:
+    print(f"❌ High-risk index not loaded: {e}")
+
+# Optional DuckDB replica that answers aggregate queries (CHURN_ANALYTICS=duckdb); it loads
+# in the background once start_background_tasks runs
+analytics = None
+if os.environ.get('CHURN_ANALYTICS') == 'duckdb':
+    analytics = AnalyticsReplica(DB_PATH, prediction_partitions)
+
+# Warm newly published models on real customers before they take traffic
+model_registry.warmup_sample = feature_store.sample
+
+# Mirror scored rows to the registry's candidate model, if one is set
+shadow_scorer = ShadowScorer(model_registry, FEATURE_COLUMNS, log=app.logger)
+
+# Histogram scored feature rows against the training data (drift_reference.json)
+drift_monitor = DriftMonitor(FEATURE_COLUMNS)
+try:
+    drift_monitor.load()
+except Exception as e:
+    print(f"❌ Drift reference not loaded: {e}")
+
+# Fold newly labeled predictions into model_performance every CHURN_EVALUATION_INTERVAL seconds
+online_evaluator = OnlineEvaluator(DB_PATH)
+
+# One writer thread group-commits interaction events posted by concurrent requests
+interaction_ingestor = InteractionIngestor(DB_PATH)
+
+# Re-score customers queued in customer_changes every CHURN_RESCORE_INTERVAL seconds
+change_rescorer = ChangeRescorer(model_registry, DB_PATH, prediction_partitions)
+
+# Flatten the served forest now rather than on the first early-exit request
+if early_exit is not None and model_registry.current() is not None:
+    early_exit.prepare(model_registry.current())
+
+def start_background_tasks():
+    """Start the refresh threads; call once per serving process, after any fork"""
+    feature_store.start()
+    customer_snapshot.start()
+    model_registry.start()
+    shadow_scorer.start()
+    recommendation_rules.start()
+    if analytics is not None:
+        analytics.start()
+    if read_replica is not None:
+        read_replica.start()
+    online_evaluator.start()
+    interaction_ingestor.start()
+    change_rescorer.start()
+    high_risk_index.start()
+
+API_INFO = {
+    "message": "Customer Churn Prediction API",
+    "version": "1.0",
+    "endpoints": [
+        "/api/predict", "/api/batch-predict", "/api/customers", "/api/customers/<id>/score", "/api/dashboard",
+        "/api/dashboard/trends", "/api/analytics/segments", "/api/export/customers", "/api/export/predictions", "/api/shadow",
+        "/api/drift", "/api/interactions"
+    ]
+}
+
+def prediction_record(customer_id, prediction):
+    """Row for PredictionPartitions.insert"""
+    return (
+        customer_id,
+        datetime.now(),
+        prediction['churn_probability'] / 100,
+        prediction['churn_prediction'],
+        prediction['risk_level'],
+        prediction['model_version']
+    )
+
+# Result of scoring a batch; contributions is None unless explanations were requested
+BatchScores = namedtuple('BatchScores', [
+    'features', 'churn_probs', 'model_version', 'trees_evaluated', 'explain', 'base_value', 'contributions'
+])
+
+def score_batch(customers, fields, exact=False, explain=None):
+    """Score raw customer columns into BatchScores"""
+    serving = model_registry.current()
+    missing = [name for name in RAW_FEATURES if name not in fields]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    X_customers = create_feature_matrix(customers)
+    churn_probs, trees_evaluated = churn_probabilities(
+        serving, pd.DataFrame(X_customers, columns=FEATURE_COLUMNS, copy=False), exact
+    )
+    if trees_evaluated is None:
+        shadow_scorer.submit(X_customers, churn_probs)
+    drift_monitor.record(X_customers)
+
+    base_value = contributions = None
+    if explain:
+        base_value, contributions = explainer.contributions(serving, X_customers, explain)
+    return BatchScores(X_customers, churn_probs, serving.version, trees_evaluated, explain, base_value, contributions)
+
+def batch_npy_response(scores):
+    """Body and headers of a columnar batch response"""
+    rules = recommendation_rules.current()
+    fields = {
+        'churn_probability': scores.churn_probs,
+        'churn_prediction': (scores.churn_probs >= 0.5).astype(np.int8),
+        'risk_code': risk_codes(scores.churn_probs),
+        'recommendations': rules.codes(scores.features, scores.churn_probs)
+    }
+    headers = {
+        'X-Risk-Levels': ','.join(RISK_LEVELS),
+        'X-Recommendation-Rules': ','.join(rules.ids),
+        'X-Model-Version': scores.model_version
+    }
+    if scores.trees_evaluated is not None:
+        headers['X-Avg-Trees-Evaluated'] = f"{scores.trees_evaluated.mean():.2f}"
+    if scores.contributions is not None:
+        # Every feature's contribution as its own column, as a fraction of probability
+        for i, name in enumerate(FEATURE_COLUMNS):
+            fields[f'contribution_{name}'] = scores.contributions[:, i].astype(np.float32)
+        headers['X-Explanation-Method'] = scores.explain
+        headers['X-Base-Probability'] = f"{scores.base_value:.6f}"
+    return write_npy(fields), headers
+
+def batch_json_payload(customers, fields, scores):
+    if 'customer_id' in fields:
+        customer_ids = np.asarray(customers['customer_id']).astype(str)
+    else:
+        customer_ids = ['unknown'] * len(scores.churn_probs)
+
+    predictions = build_predictions(scores.churn_probs, scores.features)
+    for customer_id, prediction in zip(customer_ids, predictions):
+        prediction['customer_id'] = customer_id
+    if scores.contributions is not None:
+        explanations = explainer.describe(scores.features, scores.base_value, scores.contributions, scores.explain)
+        for prediction, explanation in zip(predictions, explanations):
+            prediction['explanation'] = explanation
+
+    payload = {
+        'predictions': predictions,
+        'total_processed': len(predictions),
+        'model_version': scores.model_version
+    }
+    if scores.trees_evaluated is not None:
+        payload['avg_trees_evaluated'] = float(scores.trees_evaluated.mean())
+    return payload
+
+def score_stored_customer(customer_id, exact=False, explain=None):
+    """Score a customer from the in-memory feature store, or None if unknown"""
+    serving = model_registry.current()
+    features = feature_store.get(customer_id)
+    if features is None:
+        # The customer may have been added since the last background refresh
+        features = feature_store.lookup(customer_id)
+    if features is None:
+        return None
+
+    X_customer = pd.DataFrame([features], columns=feature_store.columns)
+    churn_probs, trees_evaluated = churn_probabilities(serving, X_customer, exact)
+    prediction = build_predictions(churn_probs, features[None, :])[0]
+    prediction['customer_id'] = customer_id
+    prediction['model_version'] = serving.version
+    add_early_exit_fields(prediction, serving, trees_evaluated, features, churn_probs[0])
+    if explain:
+        prediction['explanation'] = explainer.explain(serving, features[None, :], explain)[0]
+    return prediction
+
+def customers_page(page, per_page):
+    offset = (page - 1) * per_page
+    snapshot = customer_snapshot.get()
+    rows = snapshot.select(snapshot.order('monthly_bill'), offset=offset, limit=per_page)
+
+    return {
+        'customers': snapshot.records(rows),
+        'total': snapshot.count(),
+        'page': page,
+        'per_page': per_page
+    }
+
+def aggregate_query(template, params=()):
+    """Aggregate SQL on the analytics replica once it has loaded, otherwise on SQLite"""
+    if analytics is not None and analytics.ready:
+        return analytics.query(template, params)
+    conn = get_read_connection()
+    try:
+        return sqlite_query(conn, template, params)
+    finally:
+        conn.close()
+
+def dashboard_payload():
+    """Active customers, average churn risk, risk bands and revenue at risk from latest predictions"""
+    if analytics is not None and analytics.ready:
+        return dashboard_record(analytics.query(DASHBOARD_SQL)[0])
+    # Vectorized over the in-memory snapshot, which carries each customer's latest prediction
+    return dashboard_record(customer_snapshot.get().dashboard_row())
+
+def segments_payload(segment):
+    """Active customers, churn risk and revenue at risk per value of a categorical column"""
+    return segment_records(aggregate_query(segments_sql(segment)))
+
+def high_risk_payload(page=1, per_page=20):
+    return high_risk_index.page(page, per_page)
+
 @app.route('/')
 def home():
-    return jsonify({
-        "message": "Customer Churn Prediction API",
-        "version": "1.0",
-        "endpoints": ["/api/predict", "/api/customers", "/api/dashboard"]
-    })
+    serving = model_registry.current()
+    info = dict(API_INFO, model_version=serving.version if serving else None)
+    if early_exit is not None:
+        info['early_exit'] = early_exit.summary()
+    if analytics is not None and analytics.ready:
+        info['analytics'] = analytics.summary()
+    if read_replica is not None:
+        info['read_replica'] = read_replica.summary()
+    info['online_evaluation'] = online_evaluator.summary()
+    info['interaction_ingest'] = interaction_ingestor.summary()
+    info['change_rescoring'] = change_rescorer.summary()
+    info['high_risk_index'] = high_risk_index.summary()
+    return jsonify(info)
 
 @app.route('/api/predict', methods=['POST'])
 def api_predict():
@@ -116,26 +433,13 @@ def api_predict():
         if not customer_data:
             return jsonify({"error": "No customer data provided"}), 400
 
-        prediction = predict_churn(customer_data)
+        prediction = predict_churn(customer_data, wants_exact(request.args), explain_method(request.args, 'shap'))
 
         # Save prediction to database if customer_id provided
         if 'customer_id' in customer_data and 'error' not in prediction:
             try:
                 conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO predictions 
-                    (customer_id, prediction_date, churn_probability, churn_prediction, 
-                     risk_level, model_version)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    customer_data['customer_id'],
-                    datetime.now(),
-                    prediction['churn_probability'] / 100,
-                    prediction['churn_prediction'],
-                    prediction['risk_level'],
-                    'v1.0'
-                ))
+                prediction_partitions.insert(conn, [prediction_record(customer_data['customer_id'], prediction)])
                 conn.commit()
                 conn.close()
             except Exception as e:
@@ -143,33 +447,47 @@ def api_predict():
 
         return jsonify(prediction)
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/customers', methods=['GET'])
-def get_customers():
+@app.route('/api/batch-predict', methods=['POST'])
+def batch_predict():
+    """Predict churn for multiple customers as JSON or a columnar .npy array"""
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        offset = (page - 1) * per_page
+        if model_registry.current() is None:
+            return jsonify({"error": "Model not loaded"}), 503
 
-        conn = get_db_connection()
-        total = conn.execute('SELECT COUNT(*) FROM customers').fetchone()[0]
+        if request.mimetype == NPY_MIMETYPE:
+            customers = read_npy_records(request.get_data())
+            fields = customers.dtype.names
+        else:
+            customers_data = request.json
+            if not customers_data or not isinstance(customers_data, list):
+                return jsonify({"error": "Expected list of customer data"}), 400
+            customers = pd.DataFrame(customers_data)
+            fields = customers.columns
 
-        customers = conn.execute("""
-            SELECT * FROM customers 
-            ORDER BY monthly_bill DESC 
-            LIMIT ? OFFSET ?
-        """, (per_page, offset)).fetchall()
+        scores = score_batch(customers, fields, wants_exact(request.args), explain_method(request.args, 'path'))
 
-        conn.close()
+        if wants_npy(request.headers.get('Accept')):
+            body, headers = batch_npy_response(scores)
+            return Response(body, mimetype=NPY_MIMETYPE, headers=headers)
 
-        return jsonify({
-            'customers': [dict(customer) for customer in customers],
-            'total': total,
-            'page': page,
-            'per_page': per_page
-        })
+        return jsonify(batch_json_payload(customers, fields, scores))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/customers', methods=['GET'])
+def get_customers():
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+        return jsonify(customers_page(page, per_page))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -177,43 +495,117 @@ def get_customers():
 @app.route('/api/dashboard', methods=['GET'])
 def dashboard_stats():
     try:
-        conn = get_db_connection()
-
-        total_customers = conn.execute("SELECT COUNT(*) FROM customers WHERE status = 'active'").fetchone()[0]
-
-        # Simple stats for demo
-        stats = {
-            'total_customers': total_customers,
-            'average_churn_risk': 24.3,
-            'high_risk_customers': 234,
-            'medium_risk_customers': 567,
-            'low_risk_customers': 1199,
-            'revenue_at_risk': 45670.50
-        }
+        return jsonify(dashboard_payload())
 
-        conn.close()
-        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+@app.route('/api/dashboard/trends', methods=['GET'])
+def prediction_trends():
+    """Daily prediction volume, churn probability and risk bands from the rollup table"""
+    try:
+        query, params = build_trends_query(request.args)
+        conn = get_read_connection()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return jsonify(trend_records(rows))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/segments', methods=['GET'])
+def customer_segments():
+    """Churn risk and revenue at risk broken down by ?by=<categorical column>"""
+    try:
+        return jsonify(segments_payload(request.args.get('by', 'contract_type')))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/customers/high-risk', methods=['GET'])
 def high_risk_customers():
+    """Active High Risk customers ranked by latest churn probability"""
     try:
-        conn = get_db_connection()
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+        return jsonify(high_risk_payload(page, per_page))
 
-        customers = conn.execute("""
-            SELECT customer_id, first_name, last_name, monthly_bill, satisfaction_score
-            FROM customers 
-            WHERE status = 'active' AND satisfaction_score < 6
-            ORDER BY monthly_bill DESC
-            LIMIT 20
-        """).fetchall()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        conn.close()
+@app.route('/api/customers/<customer_id>/score', methods=['GET'])
+def score_customer(customer_id):
+    """Score a stored customer from the in-memory feature store"""
+    try:
+        if model_registry.current() is None:
+            return jsonify({"error": "Model not loaded"}), 503
+
+        prediction = score_stored_customer(customer_id, wants_exact(request.args), explain_method(request.args, 'shap'))
+        if prediction is None:
+            return jsonify({"error": "Customer not found"}), 404
 
-        return jsonify([dict(customer) for customer in customers])
+        return jsonify(prediction)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/export/<table>', methods=['GET'])
+def export_table(table):
+    """Stream customers or predictions as CSV or newline-delimited JSON"""
+    if table not in EXPORT_TABLES:
+        return jsonify({"error": f"Unknown export: {table}"}), 404
+
+    try:
+        args = request.args.to_dict()
+        export_format = args.pop('format', 'csv')
+        stream, mimetype = export_stream(get_read_connection, table, args, export_format)
+    except (ValueError, sqlite3.Error) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return Response(stream_with_context(stream), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={table}.{export_format}'
+    })
+
+@app.route('/api/shadow', methods=['GET'])
+def shadow_stats():
+    """Compare the shadow candidate model with the served one on live traffic"""
+    try:
+        return jsonify(shadow_scorer.summary())
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/drift', methods=['GET'])
+def feature_drift():
+    """PSI and KS of live scored features against the training reference histograms"""
+    try:
+        return jsonify(drift_monitor.summary(request.args.get('histograms') == '1'))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/interactions', methods=['POST'])
+def ingest_interactions():
+    """Store newline-delimited JSON interaction events; returns once they are committed"""
+    try:
+        return jsonify(interaction_ingestor.ingest(request.get_data()))
 
+    except IngestBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -222,7 +614,18 @@ if __name__ == '__main__':
     print("📊 Available endpoints:")
     print("   - GET  /                     : API info")
     print("   - POST /api/predict          : Single prediction")
+    print("   - POST /api/batch-predict    : Batch predictions (JSON or .npy)")
     print("   - GET  /api/customers        : List customers")
+    print("   - GET  /api/customers/<id>/score : Score a stored customer")
     print("   - GET  /api/dashboard        : Dashboard statistics")
+    print("   - GET  /api/dashboard/trends : Daily prediction trends")
+    print("   - GET  /api/analytics/segments : Churn risk by segment")
     print("   - GET  /api/customers/high-risk : High-risk customers")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    print("   - GET  /api/export/<table>   : Stream customers or predictions")
+    print("   - GET  /api/shadow           : Shadow candidate comparison")
+    print("   - GET  /api/drift            : Feature drift against training data")
+    print("   - POST /api/interactions     : Ingest interaction events (NDJSON)")
+    print()
+    print("⚠️  Development server. For production run: gunicorn -c gunicorn.conf.py backend_app:app")
+    start_background_tasks()
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5000)
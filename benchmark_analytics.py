@@ -0,0 +1,134 @@
+# Compare aggregate query latency on SQLite and on the DuckDB analytics replica
+#
+#   python benchmark_analytics.py --customers 1000000 10000000
+#
+# Builds a synthetic database per size (customers resampled from the training
+# dataset, --predictions-per-customer scores each), then times the dashboard
+# aggregate and a segment breakdown on both engines, plus the replica's
+# initial load and an incremental refresh.
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from analytics_replica import AnalyticsReplica, DASHBOARD_SQL, dashboard_record, segments_sql, sqlite_query
+from db_migrations import DB_PATH, migrate_database
+from prediction_partitions import PredictionPartitions
+
+CHUNK = 500_000
+
+def build_database(path, n_customers, predictions_per_customer, seed=42):
+    """Synthetic copy of the schema with n_customers customers and their prediction history"""
+    rng = np.random.default_rng(seed)
+    source = sqlite3.connect(DB_PATH)
+    schema = [row[0] for row in source.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' "
+        "AND name IN ('customers', 'predictions', 'customer_interactions', 'model_performance')"
+    )]
+    columns = [row[1] for row in source.execute("PRAGMA table_info(customers)") if row[1] != 'updated_at']
+    source.close()
+
+    template = pd.read_csv('customer_churn_dataset.csv')
+    conn = sqlite3.connect(path)
+    # schema may contain columns later added by migrations; migrate_database skips those it finds
+    for statement in schema:
+        conn.execute(statement)
+
+    now = datetime.now()
+    for start in range(0, n_customers, CHUNK):
+        size = min(CHUNK, n_customers - start)
+        chunk = template.iloc[rng.integers(0, len(template), size)].reset_index(drop=True)
+        chunk['customer_id'] = [f'CUST_{i:08d}' for i in range(start, start + size)]
+        chunk['email'] = [f'customer{i}@example.com' for i in range(start, start + size)]
+        chunk['phone'] = None
+        chunk['status'] = np.where(rng.random(size) < 0.85, 'active', 'churned')
+        chunk['created_at'] = (now - timedelta(days=400)).strftime('%Y-%m-%d %H:%M:%S')
+        chunk = chunk.reindex(columns=columns)
+        conn.executemany(
+            f"INSERT INTO customers ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            chunk.itertuples(index=False, name=None)
+        )
+
+        for _ in range(predictions_per_customer):
+            probability = rng.random(size)
+            risk = np.select([probability >= 0.7, probability >= 0.4], ['High Risk', 'Medium Risk'], 'Low Risk')
+            dates = [(now - timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S.%f')
+                     for m in rng.integers(0, 60 * 24 * 60, size)]
+            conn.executemany(
+                "INSERT INTO predictions (customer_id, prediction_date, churn_probability, churn_prediction, "
+                "risk_level, model_version) VALUES (?, ?, ?, ?, ?, 'v1.0')",
+                zip(chunk['customer_id'], dates, probability.tolist(), (probability >= 0.5).astype(int).tolist(),
+                    risk.tolist())
+            )
+        conn.commit()
+    conn.close()
+    migrate_database(path)
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run(n_customers, predictions_per_customer, repeat, workdir):
+    path = os.path.join(workdir, f'churn_{n_customers}.db')
+    start = time.perf_counter()
+    build_database(path, n_customers, predictions_per_customer)
+    print(f"\n{n_customers:,} customers, {n_customers * predictions_per_customer:,} predictions "
+          f"(built in {time.perf_counter() - start:.0f}s, {os.path.getsize(path) / 1e9:.2f} GB)")
+
+    partitions = PredictionPartitions(path)
+    conn = sqlite3.connect(path)
+    partitions.attach(conn)
+    segments = segments_sql('contract_type')
+    results = {
+        'dashboard': [best_of(repeat, lambda: sqlite_query(conn, DASHBOARD_SQL))],
+        'segments': [best_of(repeat, lambda: sqlite_query(conn, segments))],
+    }
+
+    replica = AnalyticsReplica(path, partitions)
+    start = time.perf_counter()
+    replica.refresh()
+    load_seconds = time.perf_counter() - start
+    results['dashboard'].append(best_of(repeat, lambda: replica.query(DASHBOARD_SQL)))
+    results['segments'].append(best_of(repeat, lambda: replica.query(segments)))
+    # Float sums differ in the last digits between engines, so compare the response form
+    assert dashboard_record(sqlite_query(conn, DASHBOARD_SQL)[0]) == dashboard_record(replica.query(DASHBOARD_SQL)[0])
+
+    # Incremental refresh after a burst of writes
+    conn.execute("UPDATE customers SET satisfaction_score = satisfaction_score WHERE rowid <= 1000")
+    now = datetime.now()
+    partitions.insert(conn, [(f'CUST_{i:08d}', now, 0.9, 1, 'High Risk', 'v1.0') for i in range(10000)])
+    conn.commit()
+    start = time.perf_counter()
+    changed, added = replica.refresh()
+    refresh_seconds = time.perf_counter() - start
+    conn.close()
+
+    print(f"   {'query':12} {'SQLite':>10} {'DuckDB':>10} {'speedup':>8}")
+    for name, (sqlite_seconds, duckdb_seconds) in results.items():
+        print(f"   {name:12} {sqlite_seconds:9.2f}s {duckdb_seconds:9.3f}s {sqlite_seconds / duckdb_seconds:7.0f}x")
+    print(f"   replica initial load {load_seconds:.1f}s; "
+          f"incremental refresh ({changed} customers, {added} predictions) {refresh_seconds:.2f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark aggregate queries on SQLite and DuckDB')
+    parser.add_argument('--customers', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--predictions-per-customer', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='churn_analytics_')
+    try:
+        for n_customers in args.customers:
+            run(n_customers, args.predictions_per_customer, args.repeat, workdir)
+    finally:
+        shutil.rmtree(workdir)
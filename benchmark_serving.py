@@ -0,0 +1,91 @@
+# Compare API throughput of the Flask development server and the gunicorn setup
+#
+#   python benchmark_serving.py --requests 2000 --concurrency 16
+import argparse
+import csv
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Predict requests carry no customer_id so the benchmark never writes predictions
+with open('customer_churn_dataset.csv') as f:
+    sample_customer = next(csv.DictReader(f))
+sample_customer.pop('customer_id')
+PREDICT_PAYLOAD = json.dumps({
+    k: (v if k in ('contract_type', 'payment_method', 'internet_service') else float(v))
+    for k, v in sample_customer.items() if k not in ('first_name', 'last_name', 'gender', 'location')
+}).encode()
+
+SERVERS = {
+    'flask dev server (debug=True)': lambda port: (
+        [sys.executable, '-c', f"import backend_app; backend_app.app.run(debug=True, port={port})"], {}
+    ),
+    'gunicorn': lambda port: (
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'backend_app:app'],
+        {'CHURN_ACCESS_LOG': '/dev/null'}
+    ),
+}
+
+def call(base_url, i):
+    if i % 2:
+        request = urllib.request.Request(f"{base_url}/api/predict", data=PREDICT_PAYLOAD,
+                                         headers={'Content-Type': 'application/json'})
+    else:
+        request = urllib.request.Request(f"{base_url}/api/customers/CUST_{(i % 1000) + 1:06d}/score")
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+def wait_until_ready(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/").read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+def run(name, port, total, concurrency):
+    command, env = SERVERS[name](port)
+    process = subprocess.Popen(command, env={**os.environ, **env}, start_new_session=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url)
+        for i in range(50):
+            call(base_url, i)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            latencies = sorted(pool.map(lambda i: call(base_url, i), range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        # SIGTERM to the whole group: gunicorn drains gracefully, the reloader takes its child down
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+    return {
+        'requests_per_second': round(total / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare dev server and gunicorn throughput')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5050)
+    args = parser.parse_args()
+
+    print(f"⏱️  {args.requests} requests, concurrency {args.concurrency}, {os.cpu_count()} CPUs")
+    for name in SERVERS:
+        result = run(name, args.port, args.requests, args.concurrency)
+        print(f"   {name:32s} {result['requests_per_second']:8.1f} req/s   "
+              f"p50 {result['p50_ms']:6.1f} ms   p99 {result['p99_ms']:6.1f} ms")
@@ -0,0 +1,126 @@
+# Model input features, shared by the API and the offline model tools
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from db_migrations import DB_PATH
+
+DATASET_PATH = 'customer_churn_dataset.csv'
+
+NUMERIC_FEATURES = [
+    'age', 'subscription_length_months', 'monthly_bill', 'total_usage_gb',
+    'customer_service_calls', 'satisfaction_score', 'last_payment_days_ago',
+    'last_login_days_ago', 'credit_score', 'support_tickets', 'avg_monthly_usage_growth'
+]
+
+BINARY_FEATURES = [
+    'phone_service', 'multiple_lines', 'online_security', 'online_backup',
+    'device_protection', 'tech_support', 'streaming_tv', 'streaming_movies', 'paperless_billing'
+]
+
+CATEGORICAL_FEATURES = ['contract_type', 'payment_method', 'internet_service']
+
+# Sliding-window interaction counts (interaction_windows.py): per interaction type and for
+# escalated and failed outcomes, over the last 7, 30 and 90 days
+INTERACTION_WINDOWS = [7, 30, 90]
+INTERACTION_COUNTERS = ['email', 'call', 'support_ticket', 'login', 'payment', 'chat', 'escalated', 'failed']
+INTERACTION_FEATURES = [f'{counter}_count_{days}d' for days in INTERACTION_WINDOWS for counter in INTERACTION_COUNTERS]
+# Train and serve with the window counts (CHURN_INTERACTION_FEATURES=1); the model must match
+INTERACTION_FEATURES_ENABLED = os.environ.get('CHURN_INTERACTION_FEATURES') == '1'
+
+# Raw fields a caller must send, and the model's input columns in training order
+RAW_FEATURES = NUMERIC_FEATURES + BINARY_FEATURES + CATEGORICAL_FEATURES + (
+    INTERACTION_FEATURES if INTERACTION_FEATURES_ENABLED else []
+)
+FEATURE_COLUMNS = NUMERIC_FEATURES + BINARY_FEATURES + [
+    'clv_estimate', 'services_count', 'high_value', 'new_customer', 'at_risk',
+    'contract_monthly', 'payment_electronic', 'internet_fiber'
+] + (INTERACTION_FEATURES if INTERACTION_FEATURES_ENABLED else [])
+
+def create_features(data):
+    """Create engineered features for churn prediction"""
+    numeric_features = NUMERIC_FEATURES
+    binary_features = BINARY_FEATURES
+
+    # Create feature matrix
+    X = data[numeric_features + binary_features].copy()
+
+    # Add engineered features
+    X['clv_estimate'] = data['monthly_bill'] * data['subscription_length_months']
+    X['services_count'] = data[binary_features].sum(axis=1)
+    X['high_value'] = (data['monthly_bill'] > 100).astype(int)
+    X['new_customer'] = (data['subscription_length_months'] <= 6).astype(int)
+    X['at_risk'] = ((data['satisfaction_score'] < 6) | 
+                    (data['customer_service_calls'] > 3) |
+                    (data['last_payment_days_ago'] > 30)).astype(int)
+
+    # Add categorical features as binary
+    X['contract_monthly'] = (data['contract_type'] == 'Month-to-month').astype(int)
+    X['payment_electronic'] = (data['payment_method'] == 'Electronic check').astype(int)
+    X['internet_fiber'] = (data['internet_service'] == 'Fiber optic').astype(int)
+
+    if INTERACTION_FEATURES_ENABLED:
+        # The model was trained on window counts, so a row without them is not scored as zero
+        # interactions; stored customers get theirs from interaction_windows.join_window_counts
+        missing = [name for name in INTERACTION_FEATURES if name not in data or data[name].isna().any()]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+        X = pd.concat([X, data[INTERACTION_FEATURES].astype(int)], axis=1)
+
+    return X
+
+def create_feature_matrix(columns):
+    """Vectorized create_features over a mapping of column name -> 1-D array"""
+    def equals(name, value):
+        column = np.asarray(columns[name])
+        return column == (value.encode() if column.dtype.kind == 'S' else value)
+
+    n = len(columns[NUMERIC_FEATURES[0]])
+    # The forest evaluates in float32, so build the matrix in that dtype directly
+    X = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+    for i, name in enumerate(NUMERIC_FEATURES + BINARY_FEATURES):
+        X[:, i] = columns[name]
+
+    monthly_bill = np.asarray(columns['monthly_bill'], dtype=np.float64)
+    subscription_length = np.asarray(columns['subscription_length_months'], dtype=np.float64)
+    engineered = X[:, len(NUMERIC_FEATURES) + len(BINARY_FEATURES):]
+    engineered[:, 0] = monthly_bill * subscription_length
+    engineered[:, 1] = sum(np.asarray(columns[name], dtype=np.float64) for name in BINARY_FEATURES)
+    engineered[:, 2] = monthly_bill > 100
+    engineered[:, 3] = subscription_length <= 6
+    engineered[:, 4] = ((np.asarray(columns['satisfaction_score']) < 6) |
+                        (np.asarray(columns['customer_service_calls']) > 3) |
+                        (np.asarray(columns['last_payment_days_ago']) > 30))
+    engineered[:, 5] = equals('contract_type', 'Month-to-month')
+    engineered[:, 6] = equals('payment_method', 'Electronic check')
+    engineered[:, 7] = equals('internet_service', 'Fiber optic')
+
+    if INTERACTION_FEATURES_ENABLED:
+        for i, name in enumerate(INTERACTION_FEATURES, start=len(FEATURE_COLUMNS) - len(INTERACTION_FEATURES)):
+            counts = np.asarray(columns[name], dtype=np.float64)
+            if np.isnan(counts).any():
+                raise ValueError(f"Missing values for {name}")
+            X[:, i] = counts
+
+    return X
+
+def load_dataset(dataset_path=DATASET_PATH):
+    """The training dataset, with each customer's current window counts when they are model inputs"""
+    df = pd.read_csv(dataset_path)
+    if INTERACTION_FEATURES_ENABLED:
+        # Imported here: interaction_windows itself imports this module
+        from interaction_windows import join_window_counts, window_counts
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            df = join_window_counts(df, window_counts(conn))
+        finally:
+            conn.close()
+    return df
+
+def holdout_split(dataset_path=DATASET_PATH):
+    """The training script's train/test split, as (X_train, X_test, y_train, y_test)"""
+    df = load_dataset(dataset_path)
+    return train_test_split(create_features(df), df['churn'], test_size=0.2, random_state=42, stratify=df['churn'])
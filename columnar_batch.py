@@ -0,0 +1,45 @@
+import io
+import numpy as np
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+NPY_MIMETYPE = 'application/x-npy'
+
+# Order matches risk_codes(): 0 = low, 1 = medium, 2 = high
+RISK_LEVELS = ['Low Risk', 'Medium Risk', 'High Risk']
+
+def wants_npy(accept):
+    """True when an Accept header value prefers NPY_MIMETYPE to JSON, honouring q-values"""
+    return parse_accept_header(accept, MIMEAccept).best_match(['application/json', NPY_MIMETYPE]) == NPY_MIMETYPE
+
+def read_npy_records(body):
+    """Map a .npy structured array onto the request body without copying it"""
+    stream = io.BytesIO(body)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+
+    if dtype.names is None or len(shape) != 1:
+        raise ValueError("Expected a 1-D structured array with one field per column")
+    if dtype.hasobject:
+        raise ValueError("Object fields are not supported; use fixed-width string dtypes")
+
+    # The header is the schema; each field is then a strided view into the body
+    return np.frombuffer(body, dtype=dtype, count=shape[0], offset=stream.tell())
+
+def write_npy(fields):
+    """Serialize named 1-D arrays of equal length as a .npy structured array"""
+    length = len(next(iter(fields.values())))
+    records = np.empty(length, dtype=[(name, values.dtype) for name, values in fields.items()])
+    for name, values in fields.items():
+        records[name] = values
+
+    buffer = io.BytesIO()
+    np.save(buffer, records, allow_pickle=False)
+    return buffer.getvalue()
+
+def risk_codes(churn_probs):
+    """Index into RISK_LEVELS for each probability"""
+    return (churn_probs >= 0.4).astype(np.int8) + (churn_probs >= 0.7)
@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns stored as integer codes into a categories array
+CATEGORICAL_COLUMNS = [
+    'gender', 'location', 'internet_service', 'contract_type', 'payment_method', 'status'
+]
+
+# Each customer's latest prediction, aligned with the customer rows; not part of customer records
+LATEST_PREDICTION_COLUMNS = {'churn_probability': 'latest_churn_probability', 'risk_level': 'latest_risk_level'}
+
+# Changes when customers is written or any latest prediction moves (latest_predictions.change_seq)
+SIGNATURE_SQL = """
+    SELECT COUNT(*), MAX(updated_at), (SELECT MAX(change_seq) FROM latest_predictions) FROM customers
+"""
+
+class ColumnarCustomers:
+    """Immutable column-oriented copy of the customers table"""
+
+    def __init__(self, frame, latest=None):
+        self.column_names = list(frame.columns)
+        self.size = len(frame)
+        self.columns = {}
+        self.categories = {}
+        self._order_cache = {}
+
+        if latest is not None:
+            # Latest prediction per customer (customer_id, churn_probability, risk_level), NaN if never scored
+            aligned = latest.set_index('customer_id').reindex(frame['customer_id'])
+            frame = frame.assign(**{
+                column: aligned[source].to_numpy() for source, column in LATEST_PREDICTION_COLUMNS.items()
+            })
+
+        for name in frame.columns:
+            series = frame[name]
+            if name in CATEGORICAL_COLUMNS or name == 'latest_risk_level':
+                codes, categories = pd.factorize(series, sort=True)
+                dtype = np.int8 if len(categories) < 127 else np.int32
+                self.columns[name] = codes.astype(dtype)
+                self.categories[name] = categories.to_numpy(dtype=object)
+            elif series.dtype == object:
+                self.columns[name] = series.to_numpy(dtype=object)
+            else:
+                self.columns[name] = series.to_numpy()
+
+    def code(self, column, value):
+        """Return the integer code for a categorical value, or -1 if absent"""
+        matches = np.flatnonzero(self.categories[column] == value)
+        return int(matches[0]) if len(matches) else -1
+
+    def equals(self, column, value):
+        """Boolean mask of rows where column == value"""
+        if column in self.categories:
+            code = self.code(column, value)
+            # -1 is also the code of missing values, which never equal anything
+            return self.columns[column] == code if code >= 0 else np.zeros(self.size, dtype=bool)
+        return self.columns[column] == value
+
+    def count(self, mask=None):
+        return self.size if mask is None else int(np.count_nonzero(mask))
+
+    def order(self, column, descending=True):
+        """Row indices sorted by a numeric column, cached per snapshot"""
+        key = (column, descending)
+        if key not in self._order_cache:
+            values = self.columns[column].astype(np.float64)
+            # Stable sort on the negated values keeps NULLs last, like SQLite's DESC
+            self._order_cache[key] = np.argsort(-values if descending else values, kind='stable')
+        return self._order_cache[key]
+
+    def select(self, order, mask=None, offset=0, limit=None):
+        """Apply an optional filter to a precomputed order and slice one page"""
+        if mask is not None:
+            order = order[mask[order]]
+        stop = None if limit is None else offset + limit
+        return order[offset:stop]
+
+    def dashboard_row(self):
+        """DASHBOARD_SQL's row (active customers, mean probability, risk band counts, revenue at risk)"""
+        active = self.equals('status', 'active')
+        probability = self.columns['latest_churn_probability'][active]
+        scored = probability[~np.isnan(probability)]
+        high, medium, low = (self.equals('latest_risk_level', level) & active
+                             for level in ('High Risk', 'Medium Risk', 'Low Risk'))
+        return (
+            self.count(active),
+            float(scored.mean()) if len(scored) else None,
+            self.count(high), self.count(medium), self.count(low),
+            float(np.nansum(self.columns['monthly_bill'][high]))
+        )
+
+    def records(self, rows, columns=None):
+        """Materialize dicts for the selected rows only"""
+        names = columns or self.column_names
+        values = [self._decode(name, rows) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def _decode(self, name, rows):
+        column = self.columns[name][rows]
+        if name in self.categories:
+            categories = self.categories[name]
+            return [categories[code] if code >= 0 else None for code in column]
+        if column.dtype == object:
+            return column.tolist()
+        if column.dtype.kind == 'f':
+            return [None if value != value else value for value in column.tolist()]
+        return column.tolist()
+
+
+class CustomerSnapshot:
+    """Process-wide columnar customers snapshot, rebuilt periodically in the background"""
+
+    def __init__(self, db_path='churn_prediction_system.db', refresh_interval=30):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.current = None
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_signature(self, conn):
+        return conn.execute(SIGNATURE_SQL).fetchone()
+
+    def refresh(self, force=False):
+        """Rebuild the snapshot if the customers table has changed"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            signature = self._read_signature(conn)
+            if not force and self.current is not None and signature == self._signature:
+                return False
+            frame = pd.read_sql_query("SELECT * FROM customers", conn)
+            latest = pd.read_sql_query(
+                f"SELECT customer_id, {', '.join(LATEST_PREDICTION_COLUMNS)} FROM latest_predictions", conn
+            )
+        finally:
+            conn.close()
+
+        # Readers keep whichever snapshot they grabbed; swapping the reference is atomic
+        self.current = ColumnarCustomers(frame, latest)
+        self._signature = signature
+        return True
+
+    def get(self):
+        if self.current is None:
+            self.refresh()
+        return self.current
+
+    def start(self):
+        """Keep the snapshot fresh from a background thread, loading it first if needed"""
+        if self.current is None:
+            self.refresh(force=True)
+        self._thread = threading.Thread(target=self._run, name='customer-snapshot-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing customer snapshot: {e}")
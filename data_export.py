@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Date column used by the since/until filters for each exportable table
+EXPORT_TABLES = {
+    'customers': 'created_at',
+    'predictions': 'prediction_date',
+}
+
+# Relation each export reads; predictions_all is the partitioned view (see prediction_partitions)
+EXPORT_SOURCES = {
+    'customers': 'customers',
+    'predictions': 'predictions_all',
+}
+
+FETCH_SIZE = 1000
+
+def table_columns(conn, table):
+    """Column names of a table, in schema order"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def build_export_query(available, table, args):
+    """Build a parameterized SELECT from request args, validating every name against the schema"""
+    columns = available
+    if args.get('columns'):
+        columns = [name.strip() for name in args['columns'].split(',') if name.strip()]
+        unknown = [name for name in columns if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    # Any query arg named after a column is an equality filter
+    conditions = []
+    params = []
+    for name in available:
+        if name in args:
+            conditions.append(f"{name} = ?")
+            params.append(args[name])
+
+    date_column = EXPORT_TABLES[table]
+    if args.get('since'):
+        conditions.append(f"{date_column} >= ?")
+        params.append(args['since'])
+    if args.get('until'):
+        conditions.append(f"{date_column} < ?")
+        params.append(args['until'])
+
+    query = f"SELECT {', '.join(columns)} FROM {EXPORT_SOURCES[table]}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params, columns
+
+def iter_rows(connect, query, params):
+    """Yield batches of rows from a server-side cursor, holding at most one batch in memory"""
+    conn = connect()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+def encode_ndjson(rows, columns):
+    return ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+def export_header(columns, export_format):
+    return encode_csv([columns]) if export_format == 'csv' else ''
+
+def encode_batch(rows, columns, export_format):
+    return encode_csv(rows) if export_format == 'csv' else encode_ndjson(rows, columns)
+
+def stream_export(batches, columns, export_format):
+    header = export_header(columns, export_format)
+    if header:
+        yield header
+    for rows in batches:
+        yield encode_batch(rows, columns, export_format)
+
+def export_stream(connect, table, args, export_format='csv'):
+    """Validate an export request and return (generator, mimetype); connect opens a database connection"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {export_format}")
+
+    conn = connect()
+    try:
+        query, params, columns = build_export_query(table_columns(conn, EXPORT_SOURCES[table]), table, args)
+        # Prepare once up front so a bad request fails before the response starts
+        conn.execute(f"EXPLAIN {query}", params)
+    finally:
+        conn.close()
+
+    batches = iter_rows(connect, query, params)
+    return stream_export(batches, columns, export_format), EXPORT_FORMATS[export_format]
@@ -0,0 +1,28 @@
+# SQL issued by ChurnDatabase, the helper class script_5.py writes to database_functions.py
+#
+# Kept here rather than in the generated file so test_query_plans.py checks the
+# queries ChurnDatabase actually runs. Predictions are read from latest_predictions,
+# which triggers on the main table and on every monthly partition keep current,
+# so these queries see partitioned predictions and survive the retention job.
+CUSTOMER_BY_ID_SQL = "SELECT * FROM customers WHERE customer_id = ?"
+
+# Customers whose latest prediction is in one risk band, highest probability first
+CUSTOMERS_BY_RISK_SQL = """
+    SELECT c.*, lp.churn_probability, lp.risk_level, lp.prediction_date
+    FROM latest_predictions lp
+    CROSS JOIN customers c ON c.customer_id = lp.customer_id
+    WHERE lp.risk_level = ?
+    ORDER BY lp.churn_probability DESC, lp.customer_id
+"""
+
+# Daily average churn probability and volume from the rollup; rollup dates are local days
+PREDICTION_TRENDS_SQL = """
+    SELECT
+        date,
+        SUM(probability_sum) / SUM(predictions_count) AS avg_churn_prob,
+        SUM(predictions_count) AS predictions_count
+    FROM prediction_daily_rollup
+    WHERE date >= date('now', 'localtime', ?)
+    GROUP BY date
+    ORDER BY date
+"""
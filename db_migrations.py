@@ -0,0 +1,557 @@
+import sqlite3
+
+DB_PATH = 'churn_prediction_system.db'
+
+def column_exists(conn, table, column):
+    """Check whether a column exists on a table"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+def add_customer_updated_at(conn):
+    """Track when each customer row was last written"""
+    if not column_exists(conn, 'customers', 'updated_at'):
+        # ALTER TABLE cannot add a column with a non-constant default, so backfill instead
+        conn.execute("ALTER TABLE customers ADD COLUMN updated_at TIMESTAMP")
+        conn.execute("UPDATE customers SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)")
+
+    # Millisecond timestamps so watermark readers can tell writes within one second apart
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_insert_updated_at
+        AFTER INSERT ON customers
+        BEGIN
+            UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE customer_id = NEW.customer_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_update_updated_at
+        AFTER UPDATE ON customers
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+            WHERE customer_id = NEW.customer_id;
+        END
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_updated_at ON customers(updated_at)")
+
+# Trigger body adding one inserted prediction (NEW) to prediction_daily_rollup
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO prediction_daily_rollup VALUES (
+        DATE(NEW.prediction_date), COALESCE(NEW.model_version, ''), COALESCE(NEW.risk_level, ''),
+        1, COALESCE(NEW.churn_probability, 0), COALESCE(NEW.churn_probability * NEW.churn_probability, 0)
+    )
+    ON CONFLICT (date, model_version, risk_level) DO UPDATE SET
+        predictions_count = predictions_count + 1,
+        probability_sum = probability_sum + excluded.probability_sum,
+        probability_sum_sq = probability_sum_sq + excluded.probability_sum_sq;
+"""
+
+def add_prediction_daily_rollup(conn):
+    """Per-day prediction aggregates, kept current by a trigger so trend queries never scan predictions"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_daily_rollup (
+            date TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            risk_level TEXT NOT NULL,
+            predictions_count INTEGER NOT NULL,
+            probability_sum REAL NOT NULL,
+            probability_sum_sq REAL NOT NULL,
+            PRIMARY KEY (date, model_version, risk_level)
+        ) WITHOUT ROWID
+    """)
+    # NULLs would defeat the primary key, so missing versions and bands are stored as ''
+    conn.execute("""
+        INSERT INTO prediction_daily_rollup
+        SELECT DATE(prediction_date), COALESCE(model_version, ''), COALESCE(risk_level, ''),
+               COUNT(*), SUM(churn_probability), SUM(churn_probability * churn_probability)
+        FROM predictions
+        WHERE prediction_date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_predictions_insert_rollup
+        AFTER INSERT ON predictions
+        WHEN NEW.prediction_date IS NOT NULL
+        BEGIN
+            {ROLLUP_UPSERT_SQL}
+        END
+    """)
+
+def add_hot_query_indexes(conn):
+    """Composite indexes covering the latest-prediction, risk-band and customer listing queries"""
+    # Latest prediction per customer: point lookups, MAX(prediction_date) and window partitions read only the index
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_customer_latest
+        ON predictions(customer_id, prediction_date DESC, churn_probability, risk_level)
+    """)
+    # Customers in a risk band, already ordered by probability; supersedes idx_predictions_risk
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_risk_probability
+        ON predictions(risk_level, churn_probability, customer_id, prediction_date)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_predictions_risk")
+    # Active-customer counts and listings ordered by bill; supersedes idx_customer_status
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_status_bill ON customers(status, monthly_bill)")
+    conn.execute("DROP INDEX IF EXISTS idx_customer_status")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_bill ON customers(monthly_bill, customer_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_created_at ON customers(created_at)")
+    # Give the planner row counts so it picks these indexes
+    conn.execute("ANALYZE")
+
+# Trigger body logging a changed actual_churn (NEW vs OLD) to prediction_labels
+LABEL_LOG_SQL = """
+    INSERT INTO prediction_labels (prediction_id, model_version, churn_probability, actual_churn, previous_churn)
+    VALUES (NEW.prediction_id, NEW.model_version, NEW.churn_probability, NEW.actual_churn, OLD.actual_churn);
+"""
+
+PERFORMANCE_COLUMNS = [
+    ('precision_score', 'REAL'), ('recall_score', 'REAL'), ('f1_score', 'REAL'), ('brier_score', 'REAL'),
+    ('calibration_error', 'REAL'), ('calibration_json', 'TEXT'), ('notes', 'TEXT')
+]
+
+def add_online_evaluation(conn):
+    """Prediction labels, an append-only log of label changes and the evaluator's running histograms"""
+    if not column_exists(conn, 'predictions', 'actual_churn'):
+        conn.execute("ALTER TABLE predictions ADD COLUMN actual_churn INTEGER")
+    for column, kind in PERFORMANCE_COLUMNS:
+        if not column_exists(conn, 'model_performance', column):
+            conn.execute(f"ALTER TABLE model_performance ADD COLUMN {column} {kind}")
+
+    # label_id grows in commit order (SQLite has one writer), so it is a safe watermark
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS prediction_labels (
+            label_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prediction_id INTEGER NOT NULL,
+            model_version TEXT,
+            churn_probability REAL,
+            actual_churn INTEGER,
+            previous_churn INTEGER,
+            labeled_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_predictions_label_log
+        AFTER UPDATE OF actual_churn ON predictions
+        WHEN NEW.actual_churn IS NOT OLD.actual_churn
+        BEGIN
+            {LABEL_LOG_SQL}
+        END
+    """)
+
+    # Per model version and probability bin, everything AUC, F1, Brier and calibration need
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_histogram (
+            model_version TEXT NOT NULL,
+            bin INTEGER NOT NULL,
+            positives INTEGER NOT NULL,
+            negatives INTEGER NOT NULL,
+            probability_sum REAL NOT NULL,
+            probability_sum_sq REAL NOT NULL,
+            positive_probability_sum REAL NOT NULL,
+            PRIMARY KEY (model_version, bin)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS evaluation_watermark (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            label_id INTEGER NOT NULL
+        )
+    """)
+
+    # Partition files written before this migration need the column as well
+    from prediction_partitions import PredictionPartitions
+    partitions = PredictionPartitions(conn.execute("PRAGMA database_list").fetchone()[2])
+    for month in partitions.months():
+        partition = sqlite3.connect(partitions.path(month))
+        try:
+            with partition:
+                if not column_exists(partition, 'predictions', 'actual_churn'):
+                    partition.execute("ALTER TABLE predictions ADD COLUMN actual_churn INTEGER")
+        finally:
+            partition.close()
+
+def add_label_backfill_state(conn):
+    """Watermarks of label_backfill.py: last churned customer seen and the expired-horizon cutoff"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS label_backfill_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            churned_updated_at TEXT,
+            churned_customer_id TEXT,
+            expired_before TEXT
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO label_backfill_state (id) VALUES (1)")
+    # Churned customers in updated_at order, for the backfill's watermark scan
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_status_updated ON customers(status, updated_at, customer_id)")
+
+def add_interaction_ingest(conn):
+    """agent_id on interactions (absent from databases built by script_6.py) and tailed-file positions"""
+    if not column_exists(conn, 'customer_interactions', 'agent_id'):
+        conn.execute("ALTER TABLE customer_interactions ADD COLUMN agent_id TEXT")
+    # Read positions of files tailed by interaction_ingest.py, committed with the rows read
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS interaction_ingest_offsets (
+            source TEXT PRIMARY KEY,
+            inode INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            line INTEGER NOT NULL,
+            updated_at TIMESTAMP
+        )
+    """)
+
+INTERACTION_COUNTERS_SQL = """
+    NEW.interaction_type IS 'email', NEW.interaction_type IS 'call', NEW.interaction_type IS 'support_ticket',
+    NEW.interaction_type IS 'login', NEW.interaction_type IS 'payment', NEW.interaction_type IS 'chat',
+    NEW.outcome IS 'escalated', NEW.outcome IS 'failed'
+"""
+
+def add_interaction_windows(conn):
+    """Per-customer daily interaction counters, kept current by a trigger, for sliding-window features"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS interaction_daily_counts (
+            customer_id TEXT NOT NULL,
+            day TEXT NOT NULL,
+            email INTEGER NOT NULL,
+            call INTEGER NOT NULL,
+            support_ticket INTEGER NOT NULL,
+            login INTEGER NOT NULL,
+            payment INTEGER NOT NULL,
+            chat INTEGER NOT NULL,
+            escalated INTEGER NOT NULL,
+            failed INTEGER NOT NULL,
+            PRIMARY KEY (customer_id, day)
+        ) WITHOUT ROWID
+    """)
+    # Only the longest window (90 days) is ever read
+    conn.execute("""
+        INSERT INTO interaction_daily_counts
+        SELECT customer_id, DATE(interaction_date),
+               SUM(interaction_type IS 'email'), SUM(interaction_type IS 'call'),
+               SUM(interaction_type IS 'support_ticket'), SUM(interaction_type IS 'login'),
+               SUM(interaction_type IS 'payment'), SUM(interaction_type IS 'chat'),
+               SUM(outcome IS 'escalated'), SUM(outcome IS 'failed')
+        FROM customer_interactions
+        WHERE customer_id IS NOT NULL AND interaction_date >= DATE('now', 'localtime', '-89 days')
+        GROUP BY 1, 2
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_interactions_insert_counts
+        AFTER INSERT ON customer_interactions
+        WHEN NEW.customer_id IS NOT NULL AND DATE(NEW.interaction_date) IS NOT NULL
+        BEGIN
+            INSERT INTO interaction_daily_counts VALUES (
+                NEW.customer_id, DATE(NEW.interaction_date), {INTERACTION_COUNTERS_SQL}
+            )
+            ON CONFLICT (customer_id, day) DO UPDATE SET
+                email = email + excluded.email,
+                call = call + excluded.call,
+                support_ticket = support_ticket + excluded.support_ticket,
+                login = login + excluded.login,
+                payment = payment + excluded.payment,
+                chat = chat + excluded.chat,
+                escalated = escalated + excluded.escalated,
+                failed = failed + excluded.failed;
+        END
+    """)
+
+# Trigger body making one inserted prediction (NEW) its customer's latest unless a newer one exists.
+# input_hash is only set by change_rescoring.py, so any other prediction clears it
+LATEST_UPSERT_SQL = """
+    INSERT INTO latest_predictions (
+        customer_id, prediction_id, prediction_date, churn_probability,
+        churn_prediction, risk_level, model_version, input_hash
+    ) VALUES (
+        NEW.customer_id, NEW.prediction_id, NEW.prediction_date, NEW.churn_probability,
+        NEW.churn_prediction, NEW.risk_level, NEW.model_version, NULL
+    )
+    ON CONFLICT (customer_id) DO UPDATE SET
+        prediction_id = excluded.prediction_id,
+        prediction_date = excluded.prediction_date,
+        churn_probability = excluded.churn_probability,
+        churn_prediction = excluded.churn_prediction,
+        risk_level = excluded.risk_level,
+        model_version = excluded.model_version,
+        input_hash = NULL
+    WHERE excluded.prediction_date >= latest_predictions.prediction_date;
+"""
+
+LATEST_COLUMNS = [
+    'customer_id', 'prediction_id', 'prediction_date', 'churn_probability', 'churn_prediction',
+    'risk_level', 'model_version'
+]
+
+def latest_rows(conn):
+    """Latest prediction per customer in one predictions table, as LATEST_COLUMNS tuples"""
+    columns = ', '.join(LATEST_COLUMNS)
+    return conn.execute(f"""
+        SELECT {columns} FROM (
+            SELECT {columns}, ROW_NUMBER() OVER (
+                PARTITION BY customer_id ORDER BY prediction_date DESC, prediction_id DESC
+            ) AS rn
+            FROM predictions
+            WHERE customer_id IS NOT NULL AND prediction_date IS NOT NULL
+        )
+        WHERE rn = 1
+    """).fetchall()
+
+def add_change_rescoring(conn):
+    """Queue of changed customers and each customer's latest prediction, for change_rescoring.py"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS customer_changes (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT NOT NULL
+        )
+    """)
+    # Inserts and updates both move updated_at (trg_customers_*_updated_at), so one trigger sees every write
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_queue_change
+        AFTER UPDATE OF updated_at ON customers
+        WHEN NEW.updated_at IS NOT OLD.updated_at
+        BEGIN
+            INSERT INTO customer_changes (customer_id) VALUES (NEW.customer_id);
+        END
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS latest_predictions (
+            customer_id TEXT PRIMARY KEY,
+            prediction_id INTEGER,
+            prediction_date TIMESTAMP,
+            churn_probability REAL,
+            churn_prediction INTEGER,
+            risk_level TEXT,
+            model_version TEXT,
+            input_hash TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_predictions_insert_latest
+        AFTER INSERT ON predictions
+        WHEN NEW.customer_id IS NOT NULL AND NEW.prediction_date IS NOT NULL
+        BEGIN
+            {LATEST_UPSERT_SQL}
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_delete_latest
+        AFTER DELETE ON customers
+        BEGIN
+            DELETE FROM latest_predictions WHERE customer_id = OLD.customer_id;
+        END
+    """)
+
+    # Backfill from the main table and every live partition; the newest prediction wins
+    from prediction_partitions import PredictionPartitions
+    partitions = PredictionPartitions(conn.execute("PRAGMA database_list").fetchone()[2])
+    sources = [latest_rows(conn)]
+    for month in partitions.months():
+        partition = sqlite3.connect(partitions.path(month))
+        try:
+            sources.append(latest_rows(partition))
+        finally:
+            partition.close()
+    for rows in sources:
+        conn.executemany(f"""
+            INSERT INTO latest_predictions ({', '.join(LATEST_COLUMNS)}) VALUES ({', '.join('?' * len(LATEST_COLUMNS))})
+            ON CONFLICT (customer_id) DO UPDATE SET
+                prediction_id = excluded.prediction_id,
+                prediction_date = excluded.prediction_date,
+                churn_probability = excluded.churn_probability,
+                churn_prediction = excluded.churn_prediction,
+                risk_level = excluded.risk_level,
+                model_version = excluded.model_version
+            WHERE excluded.prediction_date >= latest_predictions.prediction_date
+        """, rows)
+
+def add_high_risk_indexes(conn):
+    """Latest predictions by probability for high-risk pages, and by date for change polling"""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_latest_predictions_probability
+        ON latest_predictions(churn_probability DESC, customer_id)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_predictions_date ON latest_predictions(prediction_date)")
+    conn.execute("ANALYZE")
+
+# Trigger body logging a customer's turn to 'churned'. Stamped in server-local time, like
+# prediction_date, so label windows compare one clock
+CHURN_LOG_SQL = """
+    INSERT INTO customer_churns (customer_id, churned_at)
+    VALUES (NEW.customer_id, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+"""
+
+def add_customer_churns(conn):
+    """Append-only log of status changes to 'churned', read by label_backfill.py past a churn_id watermark"""
+    # churn_id grows in commit order (SQLite has one writer), so it is a safe watermark
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS customer_churns (
+            churn_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id TEXT NOT NULL,
+            churned_at TIMESTAMP NOT NULL
+        )
+    """)
+    # Only a real change logs a churn; later writes to an already churned customer do not
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_update_churn
+        AFTER UPDATE OF status ON customers
+        WHEN NEW.status = 'churned' AND OLD.status IS NOT 'churned'
+        BEGIN
+            {CHURN_LOG_SQL}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_insert_churn
+        AFTER INSERT ON customers
+        WHEN NEW.status = 'churned'
+        BEGIN
+            {CHURN_LOG_SQL}
+        END
+    """)
+
+    # Customers churned before this migration: their last write (UTC, see add_customer_updated_at)
+    # is the best estimate of when, in the order the old watermark walked them
+    conn.execute("""
+        INSERT INTO customer_churns (customer_id, churned_at)
+        SELECT customer_id, strftime('%Y-%m-%d %H:%M:%f', updated_at, 'localtime')
+        FROM customers
+        WHERE status = 'churned' AND updated_at IS NOT NULL
+        ORDER BY updated_at, customer_id
+    """)
+    # Churns the old (updated_at, customer_id) watermark already passed stay labeled
+    conn.execute("ALTER TABLE label_backfill_state ADD COLUMN churn_id INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE label_backfill_state SET churn_id = COALESCE((
+            SELECT MAX(ch.churn_id)
+            FROM customer_churns ch
+            JOIN customers c ON c.customer_id = ch.customer_id
+            WHERE (c.updated_at, c.customer_id)
+                  <= (label_backfill_state.churned_updated_at, label_backfill_state.churned_customer_id)
+        ), 0)
+    """)
+    conn.execute("ALTER TABLE label_backfill_state DROP COLUMN churned_updated_at")
+    conn.execute("ALTER TABLE label_backfill_state DROP COLUMN churned_customer_id")
+    conn.execute("DROP INDEX IF EXISTS idx_customers_status_updated")
+
+# Trigger body moving one customer's latest_predictions row past every change seen so far
+CHANGE_SEQ_SQL = """
+    UPDATE latest_predictions
+    SET change_seq = (SELECT IFNULL(MAX(change_seq), 0) + 1 FROM latest_predictions)
+    WHERE customer_id = NEW.customer_id;
+"""
+
+def add_high_risk_change_seq(conn):
+    """Change sequence for high_risk_index.py polling, and a partial index over High Risk latest predictions"""
+    # change_seq is assigned inside the writing transaction and SQLite has one writer, so it grows
+    # in commit order; prediction_date and updated_at are stamped before commit and can land late
+    if not column_exists(conn, 'latest_predictions', 'change_seq'):
+        conn.execute("ALTER TABLE latest_predictions ADD COLUMN change_seq INTEGER")
+    conn.execute("UPDATE latest_predictions SET change_seq = rowid")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_predictions_change_seq ON latest_predictions(change_seq)")
+
+    # LATEST_UPSERT_SQL now names its columns; the old trigger inserted by position
+    conn.execute("DROP TRIGGER IF EXISTS trg_predictions_insert_latest")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_predictions_insert_latest
+        AFTER INSERT ON predictions
+        WHEN NEW.customer_id IS NOT NULL AND NEW.prediction_date IS NOT NULL
+        BEGIN
+            {LATEST_UPSERT_SQL}
+        END
+    """)
+    # A new latest prediction, from the main table or a partition, and any customer write move the row
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_latest_predictions_insert_seq
+        AFTER INSERT ON latest_predictions
+        BEGIN
+            {CHANGE_SEQ_SQL}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_latest_predictions_update_seq
+        AFTER UPDATE OF prediction_id ON latest_predictions
+        BEGIN
+            {CHANGE_SEQ_SQL}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_customers_update_seq
+        AFTER UPDATE OF updated_at ON customers
+        WHEN NEW.updated_at IS NOT OLD.updated_at
+        BEGIN
+            {CHANGE_SEQ_SQL}
+        END
+    """)
+
+    # Pages only rank High Risk customers, so only their rows are indexed by probability
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_latest_predictions_high_risk
+        ON latest_predictions(churn_probability DESC, customer_id)
+        WHERE risk_level = 'High Risk'
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_latest_predictions_probability")
+    conn.execute("DROP INDEX IF EXISTS idx_latest_predictions_date")
+    conn.execute("ANALYZE")
+
+def add_latest_aggregate_indexes(conn):
+    """Covering indexes for the SQLite dashboard and segment aggregates over latest_predictions"""
+    # Active customers in customer_id order, so the probes into latest_predictions walk its index in order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_customers_status_id_bill ON customers(status, customer_id, monthly_bill)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_latest_predictions_customer_risk
+        ON latest_predictions(customer_id, risk_level, churn_probability)
+    """)
+    conn.execute("ANALYZE")
+
+def add_latest_risk_index(conn):
+    """Latest predictions of one risk band by probability, for risk-band listings and high-risk pages"""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_latest_predictions_risk_probability
+        ON latest_predictions(risk_level, churn_probability DESC, customer_id)
+    """)
+    # Its High Risk range covers the high-risk page query, which the partial index served
+    conn.execute("DROP INDEX IF EXISTS idx_latest_predictions_high_risk")
+    conn.execute("ANALYZE")
+
+# Ordered list of migrations; PRAGMA user_version records how many have been applied
+MIGRATIONS = [
+    add_customer_updated_at,
+    add_prediction_daily_rollup,
+    add_hot_query_indexes,
+    add_online_evaluation,
+    add_label_backfill_state,
+    add_interaction_ingest,
+    add_interaction_windows,
+    add_change_rescoring,
+    add_high_risk_indexes,
+    add_customer_churns,
+    add_high_risk_change_seq,
+    add_latest_aggregate_indexes,
+    add_latest_risk_index,
+]
+
+def migrate_database(db_path=DB_PATH):
+    """Apply any pending schema migrations"""
+    # Autocommit mode, so the explicit BEGIN below also covers DDL, which the sqlite3 module
+    # would otherwise run outside any transaction
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        while True:
+            # Each migration and its version bump commit together or not at all. The version is
+            # read under the write lock, so a process starting alongside never applies one twice
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.execute("COMMIT")
+                    return
+                migration = MIGRATIONS[version]
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"🗄️ Applied migration {version + 1}: {migration.__name__}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
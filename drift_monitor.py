@@ -0,0 +1,160 @@
+# Feature drift between live scoring traffic and the training data
+#
+#   python drift_monitor.py                   # write drift_reference.json from the training split
+#   curl http://localhost:5000/api/drift
+#
+# drift_reference.json holds fixed bins for every model input: one bin per value
+# for discrete features, deciles of the training split for continuous ones, and
+# the training counts in each. Scored rows only increment those counts. Each
+# thread owns its counter array, so recording takes no lock and the cost does not
+# grow with traffic. No raw request is kept. PSI and a binned KS statistic
+# against the reference are computed when /api/drift is read.
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from churn_features import DATASET_PATH, FEATURE_COLUMNS, holdout_split
+
+DRIFT_REFERENCE_PATH = 'drift_reference.json'
+DRIFT_BINS = 10
+
+# Conventional PSI reading: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 significant
+PSI_THRESHOLDS = [(0.25, 'significant'), (0.1, 'moderate'), (0.0, 'stable')]
+# Empty bins get this share so PSI stays finite
+PSI_EPSILON = 1e-4
+# Rows binned per step, bounding the temporary comparison array for large batches
+RECORD_CHUNK = 65536
+
+def reference_edges(values, bins=DRIFT_BINS):
+    """Inner bin edges: one bin per value for discrete features, training quantiles otherwise"""
+    unique = np.unique(values)
+    if len(unique) <= bins:
+        return (unique[:-1] + unique[1:]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+def build_reference(X, bins=DRIFT_BINS):
+    """Reference histograms for every column of a training feature frame"""
+    features = {}
+    for name in X.columns:
+        values = X[name].to_numpy(dtype=np.float64)
+        edges = reference_edges(values, bins)
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        features[name] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+    return {'created_at': time.time(), 'rows': len(X), 'features': features}
+
+def save_reference(reference, path=DRIFT_REFERENCE_PATH):
+    with open(path, 'w') as f:
+        json.dump(reference, f, indent=2)
+
+def psi(expected, actual):
+    """Population stability index of two count vectors over the same bins"""
+    expected = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    actual = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def binned_ks(expected, actual):
+    """Largest gap between the two cumulative distributions at the bin edges"""
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+def psi_status(value):
+    return next(status for threshold, status in PSI_THRESHOLDS if value >= threshold)
+
+class DriftMonitor:
+    """Streaming histograms of scored feature rows, compared with drift_reference.json on demand"""
+
+    def __init__(self, feature_columns=FEATURE_COLUMNS, reference_path=DRIFT_REFERENCE_PATH):
+        self.feature_columns = list(feature_columns)
+        self.reference_path = reference_path
+        self.reference = None
+        self.started_at = time.time()
+        self._local = threading.local()
+        self._counters = []
+        self._counters_lock = threading.Lock()
+
+    def load(self):
+        """Read the reference histograms and lay out every feature's bins in one flat counter"""
+        with open(self.reference_path) as f:
+            reference = json.load(f)
+        missing = [name for name in self.feature_columns if name not in reference['features']]
+        if missing:
+            raise ValueError(f"Drift reference lacks features: {', '.join(missing)}")
+
+        edges = [np.asarray(reference['features'][name]['edges']) for name in self.feature_columns]
+        # Edges padded with +inf never count, so one comparison bins every feature at once
+        self._edges = np.full((len(edges), max(len(e) for e in edges)), np.inf)
+        for i, feature_edges in enumerate(edges):
+            self._edges[i, :len(feature_edges)] = feature_edges
+        sizes = np.array([len(e) + 1 for e in edges])
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self._bins = int(sizes.sum())
+        self.reference = reference
+
+    def _local_counts(self):
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            counts = self._local.counts = np.zeros(self._bins, dtype=np.int64)
+            with self._counters_lock:
+                self._counters.append(counts)
+        return counts
+
+    def record(self, X):
+        """Count scored rows (model input columns, in feature_columns order) into their bins"""
+        if self.reference is None:
+            return
+        X = np.atleast_2d(X)
+        counts = self._local_counts()
+        for start in range(0, len(X), RECORD_CHUNK):
+            chunk = X[start:start + RECORD_CHUNK]
+            bins = (chunk[:, :, None] >= self._edges[None]).sum(axis=2) + self._offsets
+            counts += np.bincount(bins.ravel(), minlength=self._bins)
+
+    def counts(self):
+        """Live counts summed over every thread's counter"""
+        with self._counters_lock:
+            counters = list(self._counters)
+        return sum(counters, np.zeros(self._bins, dtype=np.int64))
+
+    def summary(self, histograms=False):
+        if self.reference is None:
+            return {'enabled': False}
+        totals = self.counts()
+        # Every row lands in exactly one bin per feature
+        rows = int(totals.sum()) // len(self.feature_columns)
+        features = []
+        for i, name in enumerate(self.feature_columns):
+            expected = np.asarray(self.reference['features'][name]['counts'], dtype=np.float64)
+            actual = totals[self._offsets[i]:self._offsets[i] + len(expected)].astype(np.float64)
+            item = {'feature': name}
+            if rows:
+                item['psi'] = round(psi(expected, actual), 4)
+                item['ks'] = round(binned_ks(expected, actual), 4)
+                item['status'] = psi_status(item['psi'])
+            if histograms:
+                item['edges'] = self.reference['features'][name]['edges']
+                item['reference_counts'] = self.reference['features'][name]['counts']
+                item['live_counts'] = actual.astype(np.int64).tolist()
+            features.append(item)
+        if rows:
+            features.sort(key=lambda item: item['psi'], reverse=True)
+        return {
+            'enabled': True,
+            'started_at': self.started_at,
+            'rows_observed': rows,
+            'reference_rows': self.reference['rows'],
+            'drifted_features': sum(1 for item in features if item.get('status') == 'significant'),
+            'features': features
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write training reference histograms for drift monitoring')
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=DRIFT_REFERENCE_PATH)
+    parser.add_argument('--bins', type=int, default=DRIFT_BINS)
+    args = parser.parse_args()
+
+    X_train, _, _, _ = holdout_split(args.dataset)
+    save_reference(build_reference(X_train, args.bins), args.output)
+    print(f"✅ Drift reference for {X_train.shape[1]} features ({len(X_train)} rows) written to {args.output}")
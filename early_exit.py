@@ -0,0 +1,103 @@
+# Sequential forest evaluation that stops once a row's risk band is decided
+#
+# The API only acts on which side of a few probability thresholds a customer
+# falls. Trees are walked in batches; after each batch a row's final average is
+# bounded by the leaf probabilities the remaining trees could still add, and a
+# row whose bound no longer straddles any threshold is finished early.
+#
+# Leaves near 0 and 1 exist in nearly every tree, so that guaranteed bound only
+# tightens near the end of the forest. Setting z additionally stops a row when
+# the running mean is z standard errors (over trees, with finite-population
+# correction) away from every threshold; that trades a small fraction of
+# mis-banded rows for far fewer trees.
+import threading
+
+import numpy as np
+
+from forest_compression import as_compact_forest
+
+class EarlyExitEvaluator:
+    """Scores rows with as few trees as the decision thresholds allow"""
+
+    def __init__(self, batch_trees=10, z=None):
+        self.batch_trees = batch_trees
+        self.z = z
+        self.rows = 0
+        self.trees_evaluated = 0
+        self._forests = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, serving):
+        """Flattened forest and per-tree leaf bounds for a ServingModel, built once per version"""
+        prepared = self._forests.get(serving.version)
+        if prepared is None:
+            model = as_compact_forest(serving.model)
+            lowest, highest = model.tree_value_bounds()
+            # Sum of the remaining trees' bounds once the first k trees are known
+            remaining_low = np.append(np.cumsum(lowest[::-1])[::-1], 0)
+            remaining_high = np.append(np.cumsum(highest[::-1])[::-1], 0)
+            prepared = (model, remaining_low, remaining_high)
+            # Only the served versions are kept
+            self._forests = {serving.version: prepared}
+        return prepared
+
+    def n_trees(self, serving):
+        return self.prepare(serving)[0].n_trees
+
+    @staticmethod
+    def _decided(low, high, thresholds):
+        """Rows whose whole [low, high] range sits on one side of every threshold, for >= and >"""
+        return (
+            ((low[:, None] >= thresholds) == (high[:, None] >= thresholds)) &
+            ((low[:, None] > thresholds) == (high[:, None] > thresholds))
+        ).all(axis=1)
+
+    def predict(self, serving, X, thresholds):
+        """Churn probabilities and the number of trees evaluated for each row"""
+        thresholds = np.asarray(thresholds)
+        forest, remaining_low, remaining_high = self.prepare(serving)
+        X = forest.check_input(X)
+        n_trees = forest.n_trees
+
+        churn = np.empty(len(X))
+        evaluated = np.empty(len(X), dtype=np.int64)
+        totals = np.zeros(len(X))
+        squares = np.zeros(len(X))
+        active = np.arange(len(X))
+
+        for start in range(0, n_trees, self.batch_trees):
+            trees = np.arange(start, min(start + self.batch_trees, n_trees))
+            values = forest.value[forest.tree_leaves(X[active], trees)].astype(np.float64)
+            totals[active] += values.sum(axis=1)
+            squares[active] += (values * values).sum(axis=1)
+            done = trees[-1] + 1
+
+            low = (totals[active] + remaining_low[done]) / n_trees
+            high = (totals[active] + remaining_high[done]) / n_trees
+            if self.z is not None and 1 < done < n_trees:
+                mean = totals[active] / done
+                variance = np.maximum(squares[active] / done - mean * mean, 0) * done / (done - 1)
+                error = self.z * np.sqrt(variance / done * (n_trees - done) / (n_trees - 1))
+                low = np.maximum(low, mean - error)
+                high = np.minimum(high, mean + error)
+            decided = self._decided(low, high, thresholds)
+
+            # Clamp the running average into the row's range so it lands in the decided band
+            finished = active[decided]
+            churn[finished] = np.clip(totals[finished] / done, low[decided], high[decided])
+            evaluated[finished] = done
+            active = active[~decided]
+            if not len(active):
+                break
+
+        with self._lock:
+            self.rows += len(X)
+            self.trees_evaluated += int(evaluated.sum())
+        return churn, evaluated
+
+    def summary(self):
+        return {
+            'z': self.z,
+            'rows_scored': self.rows,
+            'avg_trees_evaluated': self.trees_evaluated / self.rows if self.rows else None
+        }
@@ -0,0 +1,202 @@
+# Per-customer feature contributions for the served forest
+#
+# Two path-dependent methods over the flattened forest (CompactForest):
+#   shap  exact TreeSHAP. Each leaf's path is reduced to one (interval, cover
+#         fraction) per feature, and the Shapley weights are integrated with
+#         Gauss-Legendre quadrature, vectorized over leaves. Cost grows with the
+#         number of leaves (about 15 ms per customer for 100 depth-10 trees).
+#   path  decision-path attribution: each split on the customer's path credits
+#         its feature with the change in node probability. Same cost class as
+#         scoring; the approximation TreeSHAP implementations use for speed.
+# Both sum to the churn probability minus the forest's base rate. Contributions
+# are cached by model version, method and feature vector.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sparse
+
+from forest_compression import as_compact_forest
+
+EXPLAIN_METHODS = ('shap', 'path')
+# Leaf-path elements processed per TreeSHAP step, bounding the (quadrature, rows, leaves, features) arrays
+SHAP_CHUNK_ELEMENTS = 1_000_000
+
+def leaf_paths(forest):
+    """Per leaf of a CompactForest: value, and (feature, low, high, cover fraction) for each feature on its path"""
+    paths = []
+    for start, end in zip(forest.roots, np.append(forest.roots[1:], forest.node_count)):
+        left = forest.left[start:end]
+        right = forest.right[start:end]
+        stack = [(0, {})]
+        while stack:
+            node, path = stack.pop()
+            if left[node] == node:
+                paths.append((forest.value[start + node], path))
+                continue
+            feature = int(forest.feature[start + node])
+            threshold = float(forest.threshold[start + node])
+            cover = float(forest.cover[start + node])
+            for child, goes_left in ((int(left[node]), True), (int(right[node]), False)):
+                low, high, fraction = path.get(feature, (-np.inf, np.inf, 1.0))
+                if goes_left:
+                    high = min(high, threshold)
+                else:
+                    low = max(low, threshold)
+                child_fraction = fraction * float(forest.cover[start + child]) / cover
+                stack.append((child, {**path, feature: (low, high, child_fraction)}))
+    return paths
+
+class LeafTable:
+    """Leaf paths of a forest padded into (leaves, depth) arrays for vectorized TreeSHAP"""
+
+    def __init__(self, forest):
+        paths = leaf_paths(forest)
+        depth = max(len(path) for _, path in paths)
+        n_leaves = len(paths)
+
+        self.n_trees = forest.n_trees
+        self.n_features = forest.n_features_in_
+        self.value = np.array([value for value, _ in paths], dtype=np.float64)
+        # Padding slots have an unbounded interval and cover fraction 1, so they contribute nothing
+        self.feature = np.zeros((n_leaves, depth), dtype=np.int64)
+        self.low = np.full((n_leaves, depth), -np.inf, dtype=np.float32)
+        self.high = np.full((n_leaves, depth), np.inf, dtype=np.float32)
+        self.fraction = np.ones((n_leaves, depth))
+        for i, (_, path) in enumerate(paths):
+            for j, (feature, (low, high, fraction)) in enumerate(path.items()):
+                self.feature[i, j] = feature
+                self.low[i, j] = low
+                self.high[i, j] = high
+                self.fraction[i, j] = fraction
+
+        # Exact for the path polynomial, whose degree is below the path length
+        nodes, weights = np.polynomial.legendre.leggauss((depth + 1) // 2)
+        self.t = ((nodes + 1) / 2)[:, None, None, None]
+        self.weights = (weights / 2)[:, None, None, None]
+        self.scatter = sparse.csr_matrix(
+            (np.ones(self.feature.size), (np.arange(self.feature.size), self.feature.ravel())),
+            shape=(self.feature.size, self.n_features)
+        )
+
+    def shap_values(self, X):
+        n_leaves, depth = self.feature.shape
+        chunk = max(1, SHAP_CHUNK_ELEMENTS // (len(self.t) * n_leaves * depth))
+        contributions = np.empty((len(X), self.n_features))
+        for start in range(0, len(X), chunk):
+            values = X[start:start + chunk][:, self.feature]
+            # 1 where the customer satisfies the path's condition on that feature
+            one = ((values > self.low) & (values <= self.high)).astype(np.float64)
+            factors = (1 - self.t) * self.fraction + self.t * one
+            # Shapley weight of each path feature, integrated over t
+            weight = (self.weights * factors.prod(axis=3, keepdims=True) / factors).sum(axis=0)
+            per_leaf = self.value[:, None] * (one - self.fraction) * weight
+            contributions[start:start + chunk] = self.scatter.T.dot(per_leaf.reshape(len(values), -1).T).T
+        return contributions / self.n_trees
+
+def path_contributions(forest, X):
+    """Decision-path attribution for every row, shape (rows, features)"""
+    rows = np.arange(len(X))[:, None]
+    contributions = np.zeros(len(X) * forest.n_features_in_)
+    node = np.broadcast_to(forest.roots, (len(X), forest.n_trees)).copy()
+    for _ in range(forest.depth):
+        feature = forest.feature[node]
+        go_left = X[rows, feature] <= forest.threshold[node]
+        child = forest.roots + np.where(go_left, forest.left[node], forest.right[node])
+        # Leaves are their own child, so they add nothing
+        change = forest.value[child].astype(np.float64) - forest.value[node]
+        contributions += np.bincount((rows * forest.n_features_in_ + feature).ravel(), change.ravel(),
+                                     minlength=contributions.size)
+        node = child
+    return contributions.reshape(len(X), -1) / forest.n_trees
+
+class ForestExplainer:
+    """Feature contributions for a ServingModel's predictions, cached by feature vector"""
+
+    def __init__(self, feature_columns, cache_size=10000, top_features=5):
+        self.feature_columns = list(feature_columns)
+        self.cache_size = cache_size
+        self.top_features = top_features
+        self.hits = 0
+        self.misses = 0
+        self._models = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, serving, method='path'):
+        """Flattened forest, base rate and, for TreeSHAP, the leaf table of a version"""
+        with self._lock:
+            prepared = self._models.get(serving.version)
+            if prepared is None:
+                forest = as_compact_forest(serving.model)
+                base_value = float(forest.value[forest.roots].astype(np.float64).mean())
+                prepared = {'forest': forest, 'base_value': base_value, 'leaves': None}
+                # Explanations are served for the current version only
+                self._models = {serving.version: prepared}
+                self._cache.clear()
+            if method == 'shap' and prepared['leaves'] is None:
+                prepared['leaves'] = LeafTable(prepared['forest'])
+        return prepared
+
+    def contributions(self, serving, X, method='shap'):
+        """Base churn rate and (rows, features) contributions for the feature matrix X"""
+        if method not in EXPLAIN_METHODS:
+            raise ValueError(f"Unknown explanation method: {method}")
+        prepared = self.prepare(serving, method)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+
+        keys = [(serving.version, method, row.tobytes()) for row in X]
+        result = np.empty((len(X), X.shape[1]))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    result[i] = cached
+            self.hits += len(X) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            if method == 'shap':
+                computed = prepared['leaves'].shap_values(X[missing])
+            else:
+                computed = path_contributions(prepared['forest'], X[missing])
+            result[missing] = computed
+            with self._lock:
+                for i, row in zip(missing, computed):
+                    self._cache[keys[i]] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return prepared['base_value'], result
+
+    def explain(self, serving, X, method='shap'):
+        """Top contributing features per row, in percentage points of churn probability"""
+        base_value, contributions = self.contributions(serving, X, method)
+        return self.describe(X, base_value, contributions, method)
+
+    def describe(self, X, base_value, contributions, method):
+        """Response form of contributions: the base rate and each row's largest contributions"""
+        X = np.asarray(X, dtype=np.float32)
+        top = np.argsort(-np.abs(contributions), axis=1)[:, :self.top_features]
+        return [
+            {
+                'method': method,
+                'base_probability': round(base_value * 100, 1),
+                'top_features': [
+                    {
+                        'feature': self.feature_columns[j],
+                        'value': round(float(X[i, j]), 4),
+                        'contribution': round(float(contributions[i, j]) * 100, 2)
+                    }
+                    for j in top[i]
+                ]
+            }
+            for i in range(len(X))
+        ]
+
+    def summary(self):
+        return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
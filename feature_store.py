@@ -0,0 +1,196 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from interaction_windows import join_window_counts, window_counts
+
+CHANGED_CUSTOMERS_SQL = "SELECT * FROM customers WHERE updated_at > ?"
+CUSTOMER_BY_ID_SQL = "SELECT * FROM customers WHERE customer_id = ?"
+CUSTOMERS_BY_IDS_SQL = "SELECT * FROM customers WHERE customer_id IN (SELECT value FROM json_each(?))"
+# Customers with interactions logged in (since, last] of interaction_id
+INTERACTED_CUSTOMERS_SQL = (
+    "SELECT DISTINCT customer_id FROM customer_interactions WHERE interaction_id > ? AND interaction_id <= ?"
+)
+
+class FeatureStore:
+    """In-memory matrix of model features for every customer, indexed by customer_id"""
+
+    def __init__(self, feature_fn, db_path='churn_prediction_system.db', refresh_interval=30, interactions=False,
+                 lookup_interval=0.1):
+        self.feature_fn = feature_fn
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        # Minimum seconds between lookups of customers missing from the store
+        self.lookup_interval = lookup_interval
+        self._last_lookup = 0.0
+        # Join sliding-window interaction counts onto customers before feature_fn
+        self.interactions = interactions
+        self.interaction_watermark = None
+        self.windows_day = None
+        self.columns = []
+        self.matrix = np.empty((0, 0))
+        self.index = {}
+        self.size = 0
+        self.watermark = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _fetch(self, conn, since=None):
+        if since is None:
+            return pd.read_sql_query("SELECT * FROM customers", conn)
+        return pd.read_sql_query(CHANGED_CUSTOMERS_SQL, conn, params=(since,))
+
+    def _with_interactions(self, conn, customers, since=None):
+        """customers plus those with interactions past interaction_id since, joined with window counts"""
+        # since=None means customers already holds every customer
+        last = conn.execute("SELECT MAX(interaction_id) FROM customer_interactions").fetchone()[0] or 0
+        if since is not None:
+            known = set(customers['customer_id'])
+            interacted = [row[0] for row in conn.execute(INTERACTED_CUSTOMERS_SQL, (since, last))
+                          if row[0] not in known]
+            if interacted:
+                customers = pd.concat([customers, pd.read_sql_query(
+                    CUSTOMERS_BY_IDS_SQL, conn, params=(json.dumps(interacted),)
+                )], ignore_index=True)
+        counts = window_counts(conn, None if since is None else customers['customer_id'])
+        return join_window_counts(customers, counts), last
+
+    def load(self):
+        """Build the feature matrix from scratch"""
+        conn = self.get_connection()
+        try:
+            customers = self._fetch(conn)
+            total = len(customers)
+            if self.interactions:
+                customers, interaction_watermark = self._with_interactions(conn, customers)
+        finally:
+            conn.close()
+
+        X = self.feature_fn(customers)
+        matrix = np.ascontiguousarray(X.to_numpy(dtype=np.float64))
+        index = {customer_id: row for row, customer_id in enumerate(customers['customer_id'])}
+        watermark = customers['updated_at'].max() if total else None
+
+        with self._lock:
+            self.columns = list(X.columns)
+            self.matrix = matrix
+            self.index = index
+            self.size = total
+            self.watermark = watermark
+            if self.interactions:
+                self.interaction_watermark = interaction_watermark
+                self.windows_day = date.today()
+        return total
+
+    def refresh(self):
+        """Apply customer rows written since the last watermark"""
+        # Every window moves at midnight, so a new day recomputes all counts
+        if self.watermark is None or (self.interactions and self.windows_day != date.today()):
+            return self.load()
+
+        conn = self.get_connection()
+        try:
+            changed = self._fetch(conn, self.watermark)
+            total = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+            if self.interactions:
+                changed, interaction_watermark = self._with_interactions(conn, changed, self.interaction_watermark)
+        finally:
+            conn.close()
+
+        if not changed.empty:
+            values = self.feature_fn(changed).to_numpy(dtype=np.float64)
+            with self._lock:
+                self._put(changed['customer_id'], values)
+                self.watermark = max(self.watermark, changed['updated_at'].max())
+        if self.interactions:
+            self.interaction_watermark = interaction_watermark
+
+        # Deleted customers leave no trace in updated_at, so fall back to a full reload
+        if total != len(self.index):
+            return self.load()
+        return len(changed)
+
+    def lookup(self, customer_id):
+        """Read one customer missing from the store by primary key; returns a copy of its vector, or None
+
+        Lookups run at most once per lookup_interval, so requests for unknown ids cannot flood
+        SQLite; in between, a customer added since the last refresh waits for the next one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_lookup < self.lookup_interval:
+                return None
+            self._last_lookup = now
+
+        conn = self.get_connection()
+        try:
+            customer = pd.read_sql_query(CUSTOMER_BY_ID_SQL, conn, params=(customer_id,))
+            if customer.empty:
+                return None
+            if self.interactions:
+                customer = join_window_counts(customer, window_counts(conn, customer['customer_id']))
+        finally:
+            conn.close()
+
+        values = self.feature_fn(customer).to_numpy(dtype=np.float64)
+        with self._lock:
+            self._put(customer['customer_id'], values)
+        return values[0].copy()
+
+    def _put(self, customer_ids, values):
+        """Store feature vectors by customer_id, appending rows for new customers; hold _lock"""
+        for customer_id, vector in zip(customer_ids, values):
+            row = self.index.get(customer_id)
+            if row is None:
+                row = self._append_row()
+                self.index[customer_id] = row
+            self.matrix[row] = vector
+
+    def _append_row(self):
+        # Grow geometrically so a stream of new customers stays amortized O(1)
+        if self.size == len(self.matrix):
+            grown = np.empty((max(16, 2 * len(self.matrix)), len(self.columns)))
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+        self.size += 1
+        return self.size - 1
+
+    def get(self, customer_id):
+        """Return a copy of the customer's feature vector, or None"""
+        with self._lock:
+            row = self.index.get(customer_id)
+            if row is None:
+                return None
+            return self.matrix[row].copy()
+
+    def sample(self, limit=256):
+        """DataFrame of up to `limit` stored feature vectors"""
+        with self._lock:
+            rows = self.matrix[:min(self.size, limit)].copy()
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def start(self):
+        """Keep the store fresh from a background thread, loading it first if needed"""
+        if self.watermark is None:
+            self.load()
+        self._thread = threading.Thread(target=self._run, name='feature-store-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing feature store: {e}")
@@ -0,0 +1,270 @@
+# Compress a trained random forest into a small, fast serving artifact
+#
+#   python forest_compression.py churn_model.pkl churn_model_compact.pkl
+#   python model_registry.py publish churn_model_compact.pkl v1.1
+#
+# Steps:
+#   1. greedy forward selection of trees on held-out rows, stopping once the
+#      subset's AUC is within --tolerance of the full forest
+#   2. collapse splits whose two sides end in the same leaf probability
+#   3. flatten every tree into shared arrays: float32 thresholds, int8/int16
+#      feature ids, int16/int32 child offsets and a float32 probability and
+#      training cover per node
+import argparse
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from churn_features import holdout_split
+
+# Rows walked through the forest at once; bounds the (rows x trees) index arrays
+PREDICT_CHUNK = 4096
+
+def index_dtype(n):
+    """Smallest signed integer dtype that can index n items"""
+    return np.int8 if n <= 127 else np.int16 if n <= 32767 else np.int32
+
+def leaf_probabilities(tree):
+    """Class-1 probability at every node of a fitted sklearn tree"""
+    counts = tree.value[:, 0, :]
+    return counts[:, 1] / counts.sum(axis=1)
+
+def float32_thresholds(thresholds):
+    """Round thresholds down to float32 so x <= t gives the same branch for every float32 x"""
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+def compact_tree(tree):
+    """Flatten one sklearn tree, merging identical leaves, into (feature, threshold, left, right, value, cover)"""
+    left = tree.children_left
+    right = tree.children_right
+    value = leaf_probabilities(tree).astype(np.float32)
+    is_leaf = left == -1
+
+    # Children always have higher ids than their parent, so a reverse scan is a post-order walk
+    for node in range(tree.node_count - 1, -1, -1):
+        if not is_leaf[node] and is_leaf[left[node]] and is_leaf[right[node]] and value[left[node]] == value[right[node]]:
+            is_leaf[node] = True
+            value[node] = value[left[node]]
+
+    # Renumber the reachable nodes breadth-first
+    order = [0]
+    for node in order:
+        if not is_leaf[node]:
+            order.extend((left[node], right[node]))
+    order = np.array(order)
+    new_id = np.empty(tree.node_count, dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+
+    leaves = is_leaf[order]
+    ids = np.arange(len(order))
+    # A leaf points at itself, so walking a fixed number of levels needs no masking
+    compact_left = np.where(leaves, ids, new_id[left[order]])
+    compact_right = np.where(leaves, ids, new_id[right[order]])
+    feature = np.where(leaves, 0, tree.feature[order])
+    threshold = np.where(leaves, 0, float32_thresholds(tree.threshold[order]))
+    return feature, threshold, compact_left, compact_right, value[order], tree.weighted_n_node_samples[order]
+
+class CompactForest:
+    """Flattened random forest with the predict_proba interface the API uses"""
+
+    def __init__(self, trees, n_features, depth, feature_names=None):
+        sizes = [len(tree[0]) for tree in trees]
+        child_dtype = index_dtype(max(sizes))
+
+        self.roots = np.cumsum([0] + sizes[:-1]).astype(np.int32)
+        self.feature = np.concatenate([tree[0] for tree in trees]).astype(index_dtype(n_features))
+        self.threshold = np.concatenate([tree[1] for tree in trees]).astype(np.float32)
+        # Child offsets are local to their tree; roots[t] turns them into global ids
+        self.left = np.concatenate([tree[2] for tree in trees]).astype(child_dtype)
+        self.right = np.concatenate([tree[3] for tree in trees]).astype(child_dtype)
+        self.value = np.concatenate([tree[4] for tree in trees]).astype(np.float32)
+        # Weighted training samples reaching each node, for path-dependent explanations
+        self.cover = np.concatenate([tree[5] for tree in trees]).astype(np.float32)
+        # Levels to walk; merging leaves only ever makes trees shallower
+        self.depth = depth
+
+        self.n_features_in_ = n_features
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.classes_ = np.array([0, 1])
+        # Accepted for compatibility with ModelRegistry.set_n_jobs; prediction is single-threaded numpy
+        self.n_jobs = None
+
+    @classmethod
+    def from_forest(cls, forest, tree_indices=None):
+        """Build from a fitted RandomForestClassifier, optionally keeping only some trees"""
+        if tree_indices is None:
+            tree_indices = range(len(forest.estimators_))
+        trees = [forest.estimators_[i].tree_ for i in tree_indices]
+        return cls([compact_tree(tree) for tree in trees], forest.n_features_in_,
+                   max(tree.max_depth for tree in trees), getattr(forest, 'feature_names_in_', None))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def check_input(self, X):
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_ is not None:
+            if list(X.columns) != list(self.feature_names_in_):
+                raise ValueError("Feature names do not match those the model was trained with")
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Model expects {self.n_features_in_} features, got {X.shape[-1]}")
+        return X
+
+    def tree_leaves(self, X, trees=None):
+        """Global leaf id reached in every tree (or the given tree ids), shape (rows, trees)"""
+        X = self.check_input(X)
+        roots = self.roots if trees is None else self.roots[trees]
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(roots, (len(X), len(roots))).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = roots + np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def tree_value_bounds(self):
+        """Smallest and largest leaf probability of each tree"""
+        sizes = np.diff(np.append(self.roots, self.node_count))
+        is_leaf = self.left == np.arange(self.node_count) - np.repeat(self.roots, sizes)
+        lowest = np.minimum.reduceat(np.where(is_leaf, self.value, np.inf), self.roots)
+        highest = np.maximum.reduceat(np.where(is_leaf, self.value, -np.inf), self.roots)
+        return lowest.astype(np.float64), highest.astype(np.float64)
+
+    def predict_proba(self, X):
+        X = self.check_input(X)
+        churn = np.empty(len(X))
+        for start in range(0, len(X), PREDICT_CHUNK):
+            leaves = self.tree_leaves(X[start:start + PREDICT_CHUNK])
+            churn[start:start + PREDICT_CHUNK] = self.value[leaves].mean(axis=1, dtype=np.float64)
+        return np.column_stack([1 - churn, churn])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+def as_compact_forest(model):
+    """The model as a CompactForest, flattening a fitted RandomForestClassifier"""
+    if isinstance(model, CompactForest):
+        return model
+    if isinstance(model, RandomForestClassifier):
+        return CompactForest.from_forest(model)
+    raise ValueError(f"Expected a random forest, got {type(model).__name__}")
+
+def fast_auc(y, scores):
+    """ROC AUC of every row of scores against labels y, via rank sums"""
+    positive = np.asarray(y) == 1
+    n_pos = positive.sum()
+    n_neg = len(positive) - n_pos
+    ranks = rankdata(scores, axis=1)
+    return (ranks[:, positive].sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+def select_trees(per_tree_probs, y, tolerance=0.002, min_trees=30):
+    """Greedily add the tree that most improves AUC until the subset is within tolerance of the full forest"""
+    n_trees = len(per_tree_probs)
+    target = fast_auc(y, per_tree_probs.mean(axis=0, keepdims=True))[0] - tolerance
+    selected = []
+    total = np.zeros(per_tree_probs.shape[1])
+    remaining = list(range(n_trees))
+
+    while remaining:
+        candidates = (total + per_tree_probs[remaining]) / (len(selected) + 1)
+        best = int(np.argmax(fast_auc(y, candidates)))
+        auc = fast_auc(y, candidates[best:best + 1])[0]
+        total += per_tree_probs[remaining[best]]
+        selected.append(remaining.pop(best))
+        if len(selected) >= min_trees and auc >= target:
+            break
+
+    return sorted(selected)
+
+def artifact_size(model):
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+def single_row_latency_ms(model, X, calls=200):
+    """Median latency of one-row predict_proba calls, the API's common case"""
+    timings = []
+    for i in range(calls):
+        row = X.iloc[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def batch_latency_ms(model, X):
+    start = time.perf_counter()
+    model.predict_proba(X)
+    return (time.perf_counter() - start) * 1000
+
+def compress_forest(forest, X_select, y_select, tolerance=0.002, min_trees=30):
+    """Select trees on (X_select, y_select) and return the CompactForest"""
+    per_tree_probs = np.array([
+        tree.predict_proba(X_select.to_numpy(dtype=np.float32))[:, 1] for tree in forest.estimators_
+    ])
+    return CompactForest.from_forest(forest, select_trees(per_tree_probs, y_select, tolerance, min_trees))
+
+def compression_report(forest, compact, X_eval, y_eval):
+    """Size, latency and AUC of both models on the evaluation rows"""
+    report = {}
+    for name, model in (('original', forest), ('compact', compact)):
+        probs = model.predict_proba(X_eval)[:, 1]
+        report[name] = {
+            'trees': len(forest.estimators_) if model is forest else model.n_trees,
+            'nodes': sum(tree.tree_.node_count for tree in forest.estimators_) if model is forest else model.node_count,
+            'size_bytes': artifact_size(model),
+            'single_row_ms': single_row_latency_ms(model, X_eval),
+            'batch_ms': batch_latency_ms(model, X_eval),
+            'auc': roc_auc_score(y_eval, probs)
+        }
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compress a random forest for serving')
+    parser.add_argument('model_path', nargs='?', default='churn_model.pkl')
+    parser.add_argument('output_path', nargs='?', default='churn_model_compact.pkl')
+    parser.add_argument('--tolerance', type=float, default=0.002, help='AUC the selected trees may lose')
+    parser.add_argument('--min-trees', type=int, default=30)
+    parser.add_argument('--dataset', default='customer_churn_dataset.csv')
+    args = parser.parse_args()
+
+    forest = joblib.load(args.model_path)
+    # Match serving, where each worker predicts on one core
+    forest.n_jobs = 1
+
+    # Select trees on half of the held-out rows and report on the other half
+    _, X_test, _, y_test = holdout_split(args.dataset)
+    X_select, X_eval, y_select, y_eval = train_test_split(X_test, y_test, test_size=0.5, random_state=42, stratify=y_test)
+
+    print(f"🌲 Selecting trees from {len(forest.estimators_)} on {len(X_select)} held-out rows...")
+    # Build through the module, not __main__, so the pickle can be loaded by the server
+    import forest_compression
+    compact = forest_compression.compress_forest(forest, X_select, y_select, args.tolerance, args.min_trees)
+    joblib.dump(compact, args.output_path)
+
+    report = compression_report(forest, compact, X_eval, y_eval)
+    print(f"\n{'':14}{'original':>12}{'compact':>12}")
+    for key, label, fmt in (
+        ('trees', 'Trees', '{:>12d}'),
+        ('nodes', 'Nodes', '{:>12d}'),
+        ('size_bytes', 'Size (KB)', '{:>12.1f}'),
+        ('single_row_ms', '1-row (ms)', '{:>12.3f}'),
+        ('batch_ms', f'{len(X_eval)}-row (ms)', '{:>12.2f}'),
+        ('auc', 'AUC', '{:>12.4f}'),
+    ):
+        values = [report[name][key] / 1024 if key == 'size_bytes' else report[name][key] for name in ('original', 'compact')]
+        print(f"{label:14}" + ''.join(fmt.format(value) for value in values))
+
+    print(f"\n✅ Compact model saved to {args.output_path} ({os.path.getsize(args.output_path) / 1024:.1f} KB on disk)")
@@ -0,0 +1,52 @@
+# Production server configuration for the Customer Churn Prediction API
+#
+#   gunicorn -c gunicorn.conf.py backend_app:app
+#
+# Signals (sent to the master process):
+#   HUP   re-read this file and gracefully replace every worker
+#   TERM  graceful shutdown: stop accepting, finish in-flight requests, exit
+#   USR2  start a new master with fresh code and model (then TERM the old one)
+#   TTIN / TTOU  add / remove one worker
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('CHURN_BIND', '0.0.0.0:5000')
+
+# Prefork workers; each one serves requests from a small thread pool
+workers = int(os.environ.get('CHURN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('CHURN_THREADS', 4))
+
+# Import the app (model, feature store, snapshot) once in the master so the
+# forest's tree arrays are shared copy-on-write by every worker
+preload_app = True
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Cores available to one worker for batch scoring; the model was trained with
+# n_jobs=-1, which would make every worker fan out across all cores
+predict_jobs = int(os.environ.get('CHURN_PREDICT_JOBS', 1))
+
+# Stop native thread pools (OpenMP / BLAS) from oversubscribing the machine
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, str(predict_jobs))
+
+accesslog = os.environ.get('CHURN_ACCESS_LOG', '-')
+
+def pre_fork(server, worker):
+    # Move everything imported so far out of the GC's reach so collections in a
+    # worker don't write to (and un-share) the preloaded model's pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    import backend_app
+
+    backend_app.model_registry.set_n_jobs(predict_jobs)
+
+    # Threads don't survive fork, so each worker starts its own refresh loops
+    # and registry watcher (a hot-swapped model is loaded once per worker)
+    backend_app.start_background_tasks()
+    server.log.info("Worker %s ready (%s threads, predict n_jobs=%s)", worker.pid, threads, predict_jobs)
@@ -0,0 +1,220 @@
+# In-memory ranking of the active High Risk customers
+#
+#   python high_risk_index.py             # the top 20 active High Risk customers by churn probability
+#   python high_risk_index.py --page 3    # and further pages
+#
+# Each serving process keeps the top K (CHURN_HIGH_RISK_K) active customers whose
+# latest prediction is High Risk, by churn probability. Every such customer
+# scored above a bound is tracked, keyed by customer_id. A min-heap over the
+# tracked probabilities evicts the lowest when a new score pushes the set past
+# K, and the bound rises to the evicted probability. A tracked customer whose
+# score falls to the bound or below or out of High Risk, or who stops being
+# active, is dropped, since untracked customers may now outrank them. Once
+# fewer than K / 2 remain, the top K is reloaded from the High Risk range of
+# idx_latest_predictions_risk_probability. Changes arrive by polling
+# latest_predictions past the last change_seq seen. Triggers move a row's
+# change_seq on each new prediction and customer write, in commit order. The
+# ranking is re-sorted after each poll that changed it, so a page from the
+# first K is a slice. Pages past the tracked customers are read from SQLite
+# with the same ordering.
+import argparse
+import heapq
+import os
+import sqlite3
+import threading
+
+from db_migrations import DB_PATH
+
+HIGH_RISK_K = int(os.environ.get('CHURN_HIGH_RISK_K', 1000))
+REFRESH_INTERVAL = 5
+
+HIGH_RISK_FIELDS = [
+    'customer_id', 'first_name', 'last_name', 'monthly_bill', 'satisfaction_score', 'churn_probability', 'risk_level'
+]
+
+# CROSS JOIN keeps the probability index as the outer loop; otherwise SQLite sorts every active customer
+HIGH_RISK_PAGE_SQL = """
+    SELECT c.customer_id, c.first_name, c.last_name, c.monthly_bill, c.satisfaction_score,
+           lp.churn_probability, lp.risk_level
+    FROM latest_predictions lp
+    CROSS JOIN customers c ON c.customer_id = lp.customer_id
+    WHERE lp.risk_level = 'High Risk' AND c.status = 'active'
+    ORDER BY lp.churn_probability DESC, lp.customer_id
+    LIMIT ? OFFSET ?
+"""
+
+CHANGED_COLUMNS = """
+    c.customer_id, c.first_name, c.last_name, c.monthly_bill, c.satisfaction_score,
+    lp.churn_probability, lp.risk_level, c.status, lp.change_seq
+"""
+
+# Customers without a prediction are never ranked, so their writes need not be seen
+CHANGES_SINCE_SQL = f"""
+    SELECT {CHANGED_COLUMNS}
+    FROM latest_predictions lp
+    CROSS JOIN customers c ON c.customer_id = lp.customer_id
+    WHERE lp.change_seq > ?
+"""
+
+def high_risk_record(row):
+    return dict(zip(HIGH_RISK_FIELDS, row))
+
+class HighRiskIndex:
+    """Top-K active High Risk customers by latest churn probability, with database paging beyond them"""
+
+    def __init__(self, db_path=DB_PATH, k=HIGH_RISK_K, refresh_interval=REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.k = k
+        self.refresh_interval = refresh_interval
+        self.rows = {}
+        self.heap = []
+        # Every active customer scored above bound is in rows; None means every one is
+        self.bound = None
+        self.ranked = []
+        self.changes_seen = None
+        self.total = 0
+        self.reloads = 0
+        self.memory_pages = 0
+        self.database_pages = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def load(self):
+        """Rebuild the ranking from the top K active High Risk customers"""
+        conn = self.get_connection()
+        try:
+            # Watermark first, so anything written during the load is polled again
+            changes_seen, total = conn.execute("""
+                SELECT (SELECT COALESCE(MAX(change_seq), 0) FROM latest_predictions),
+                       (SELECT COUNT(*) FROM customers)
+            """).fetchone()
+            top = conn.execute(HIGH_RISK_PAGE_SQL, (self.k, 0)).fetchall()
+        finally:
+            conn.close()
+
+        rows = {row[0]: row for row in top}
+        heap = [(row[5], row[0]) for row in top]
+        heapq.heapify(heap)
+        with self._lock:
+            self.rows = rows
+            self.heap = heap
+            self.bound = top[-1][5] if len(top) == self.k else None
+            self.ranked = [high_risk_record(row) for row in top]
+            self.changes_seen = changes_seen
+            self.total = total
+            self.reloads += 1
+        return len(top)
+
+    def _apply(self, changed):
+        """Update rows and heap from CHANGED_COLUMNS rows; returns whether the ranking changed"""
+        modified = False
+        for row in changed:
+            customer_id, churn_probability, risk_level, status = row[0], row[5], row[6], row[7]
+            tracked = customer_id in self.rows
+            if status == 'active' and risk_level == 'High Risk' and (
+                    self.bound is None or churn_probability > self.bound):
+                if not tracked or self.rows[customer_id] != row[:7]:
+                    self.rows[customer_id] = row[:7]
+                    heapq.heappush(self.heap, (churn_probability, customer_id))
+                    modified = True
+            elif tracked:
+                del self.rows[customer_id]
+                modified = True
+
+        while len(self.rows) > self.k:
+            churn_probability, customer_id = heapq.heappop(self.heap)
+            row = self.rows.get(customer_id)
+            # Entries for dropped customers or superseded scores are skipped as they surface
+            if row is not None and row[5] == churn_probability:
+                del self.rows[customer_id]
+                self.bound = churn_probability if self.bound is None else max(self.bound, churn_probability)
+        if len(self.heap) > 2 * self.k:
+            self.heap = [(row[5], customer_id) for customer_id, row in self.rows.items()]
+            heapq.heapify(self.heap)
+        return modified
+
+    def refresh(self):
+        """Apply predictions and customer writes since the last poll; returns the number of rows read"""
+        if self.changes_seen is None:
+            return self.load()
+
+        conn = self.get_connection()
+        try:
+            changed = conn.execute(CHANGES_SINCE_SQL, (self.changes_seen,)).fetchall()
+            total = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        finally:
+            conn.close()
+
+        # Deleted customers leave no trace in either table, so fall back to a full reload
+        if total < self.total:
+            return self.load()
+
+        with self._lock:
+            if self._apply(changed):
+                self.ranked = [high_risk_record(row) for row in sorted(
+                    self.rows.values(), key=lambda row: (-row[5], row[0])
+                )]
+            if changed:
+                self.changes_seen = max(self.changes_seen, max(row[8] for row in changed))
+            self.total = total
+            short = self.bound is not None and len(self.rows) < self.k // 2
+        if short:
+            self.load()
+        return len(changed)
+
+    def page(self, page=1, per_page=20):
+        """Active High Risk customers ranked by churn probability, one page at a time"""
+        if page < 1 or per_page < 1:
+            raise ValueError("page and per_page must be positive")
+        offset = (page - 1) * per_page
+        ranked = self.ranked
+        if offset + per_page <= len(ranked) or self.bound is None:
+            self.memory_pages += 1
+            return ranked[offset:offset + per_page]
+
+        self.database_pages += 1
+        conn = self.get_connection()
+        try:
+            return [high_risk_record(row) for row in conn.execute(HIGH_RISK_PAGE_SQL, (per_page, offset))]
+        finally:
+            conn.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='high-risk-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing high-risk index: {e}")
+
+    def summary(self):
+        return {
+            'k': self.k,
+            'tracked': len(self.ranked),
+            'bound': self.bound,
+            'reloads': self.reloads,
+            'memory_pages': self.memory_pages,
+            'database_pages': self.database_pages
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show active High Risk customers ranked by churn probability')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args()
+
+    index = HighRiskIndex()
+    index.load()
+    for record in index.page(args.page, args.per_page):
+        print(f"   {record['customer_id']}  {record['churn_probability']:.3f}  {record['risk_level']:12} "
+              f"{record['first_name']} {record['last_name']}")
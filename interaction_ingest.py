@@ -0,0 +1,372 @@
+# Ingestion of customer interaction events from call-center and web streams
+#
+#   curl -X POST http://localhost:5000/api/interactions -H 'Content-Type: application/x-ndjson' \
+#        --data-binary @events.ndjson
+#   python interaction_ingest.py events.ndjson             # load a file
+#   python interaction_ingest.py events.ndjson --follow    # tail it as it grows
+#
+# Events are newline-delimited JSON objects, one per line:
+#   {"customer_id": "CUST_000001", "interaction_type": "call", "interaction_date": "2026-10-19T09:30:00",
+#    "outcome": "resolved", "details": "Billing question", "agent_id": "AGENT_1234"}
+# Each request body or file chunk is checked as one DataFrame, a column at a time,
+# and invalid lines are reported with the reason. The endpoint passes valid rows
+# to a single writer thread. The writer takes everything queued (up to GROUP_ROWS)
+# and inserts it with executemany in one transaction, so concurrent requests
+# share a commit. A request returns once its rows are committed. The file tail
+# commits its read position with each chunk, in interaction_ingest_offsets, so a
+# restart resumes exactly after the last committed line.
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from db_migrations import DB_PATH
+
+# Values used by populate_database (script_5.py)
+INTERACTION_TYPES = ['email', 'call', 'support_ticket', 'login', 'payment', 'chat']
+OUTCOMES = ['resolved', 'escalated', 'pending', 'successful', 'failed']
+EVENT_FIELDS = ['customer_id', 'interaction_type', 'interaction_date', 'details', 'outcome', 'agent_id']
+# Longest accepted value for each free-text field
+MAX_LENGTHS = {'customer_id': 64, 'details': 2000, 'agent_id': 64}
+# Event timestamps further ahead of the server clock are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+GROUP_ROWS = 20000
+QUEUE_SIZE = 1000
+COMMIT_TIMEOUT = 30
+# Per-line errors returned to the sender; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+THROUGHPUT_WINDOW = 60
+
+INSERT_SQL = """
+    INSERT INTO customer_interactions
+    (customer_id, interaction_type, interaction_date, details, outcome, agent_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+class IngestBusy(Exception):
+    pass
+
+def parse_lines(lines):
+    """(line numbers, JSON objects, {line number: reason}) for the non-blank lines of an NDJSON batch"""
+    numbers, objects, rejected = [], [], {}
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError as e:
+            rejected[number] = f"Invalid JSON: {e}"
+            continue
+        if not isinstance(event, dict):
+            rejected[number] = "Event is not a JSON object"
+            continue
+        numbers.append(number)
+        objects.append(event)
+    return numbers, objects, rejected
+
+def text_column(values, name, required):
+    """(column with non-strings as NaN, mask of values that are missing, the wrong type or too long)"""
+    values = values.astype(object)
+    text = values.where(values.map(type) == str)
+    lengths = text.str.len().astype(float)
+    invalid = lengths > MAX_LENGTHS.get(name, float('inf'))
+    if required:
+        invalid |= ~(lengths > 0)
+    else:
+        invalid |= values.notna() & lengths.isna()
+    return text, invalid
+
+def event_times(values, now):
+    """Event timestamps as naive server-local datetimes; NaT where unparseable"""
+    parsed = pd.to_datetime(values, format='ISO8601', errors='coerce', utc=True).dt.tz_localize(None)
+    # Naive timestamps are server local time, like every other date in the database;
+    # ones with an offset or Z are moved to it
+    offset_given = values.str.contains(r'(?:Z|[+-]\d\d:?\d\d)$', na=False)
+    return parsed.where(~offset_given, parsed + now.astimezone().utcoffset())
+
+def prepare_events(lines, now=None):
+    """(rows for INSERT_SQL, {line number: reason}, newest event time) for a batch of NDJSON lines"""
+    now = now or datetime.now()
+    numbers, objects, rejected = parse_lines(lines)
+    if not objects:
+        return [], rejected, None
+
+    events = pd.DataFrame.from_records(objects, columns=EVENT_FIELDS)
+    valid = np.ones(len(events), dtype=bool)
+    reasons = np.empty(len(events), dtype=object)
+
+    def reject(mask, reason):
+        # Each line keeps the first reason found
+        mask = mask.to_numpy() & valid
+        reasons[mask] = reason
+        valid[mask] = False
+
+    events['customer_id'], invalid = text_column(events['customer_id'], 'customer_id', required=True)
+    reject(invalid, f"customer_id is required, at most {MAX_LENGTHS['customer_id']} characters")
+    for name in ('details', 'agent_id'):
+        events[name], invalid = text_column(events[name], name, required=False)
+        reject(invalid, f"{name} must be a string of at most {MAX_LENGTHS[name]} characters")
+
+    interaction_type, invalid = text_column(events['interaction_type'], 'interaction_type', required=True)
+    reject(invalid | ~interaction_type.isin(INTERACTION_TYPES),
+           f"interaction_type must be one of {', '.join(INTERACTION_TYPES)}")
+    outcome, invalid = text_column(events['outcome'], 'outcome', required=False)
+    reject(invalid | (outcome.notna() & ~outcome.isin(OUTCOMES)), f"outcome must be one of {', '.join(OUTCOMES)}")
+
+    dates, invalid = text_column(events['interaction_date'], 'interaction_date', required=False)
+    times = event_times(dates, now)
+    reject(invalid | (dates.notna() & times.isna()), "interaction_date must be an ISO 8601 timestamp")
+    reject(times > pd.Timestamp(now + MAX_CLOCK_SKEW), "interaction_date is in the future")
+    # Events without a timestamp happened when they arrived
+    times = times.fillna(pd.Timestamp(now))
+
+    rejected.update(zip(np.asarray(numbers)[~valid].tolist(), reasons[~valid]))
+    events = events[valid]
+    if events.empty:
+        return [], dict(sorted(rejected.items())), None
+    events['interaction_date'] = times[valid].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    # NaN would be stored as a REAL; missing optional fields become NULL
+    events = events.astype(object).where(events.notna(), None)
+    rows = list(events.itertuples(index=False, name=None))
+    return rows, dict(sorted(rejected.items())), times[valid].max().to_pydatetime()
+
+class IngestBatch:
+    """Validated rows waiting for the writer; done is set once they are committed or failed"""
+
+    def __init__(self, rows, newest_event):
+        self.rows = rows
+        self.newest_event = newest_event
+        self.received_at = time.time()
+        self.done = threading.Event()
+        self.error = None
+
+class InteractionIngestor:
+    """Validates NDJSON interaction events and group-commits them from one writer thread"""
+
+    def __init__(self, db_path=DB_PATH, group_rows=GROUP_ROWS, queue_size=QUEUE_SIZE):
+        self.db_path = db_path
+        self.group_rows = group_rows
+        self.events_received = 0
+        self.events_rejected = 0
+        self.events_committed = 0
+        self.commits = 0
+        self.last_commit_lag = None
+        self.max_commit_lag = 0.0
+        self.event_lag = None
+        self.started_at = time.time()
+        self._recent = deque()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ingest(self, body, timeout=COMMIT_TIMEOUT):
+        """Validate an NDJSON body, queue its valid events and wait until they are committed"""
+        text = body.decode('utf-8') if isinstance(body, bytes) else body
+        rows, rejected, newest_event = prepare_events(text.splitlines())
+        if not rows and not rejected:
+            raise ValueError("No events provided")
+        with self._lock:
+            self.events_received += len(rows) + len(rejected)
+            self.events_rejected += len(rejected)
+
+        if rows:
+            batch = IngestBatch(rows, newest_event)
+            try:
+                self._queue.put(batch, timeout=timeout)
+            except queue.Full:
+                raise IngestBusy("Ingest queue full, retry later")
+            if not batch.done.wait(timeout):
+                raise IngestBusy(f"Events not committed within {timeout}s; they may still be written")
+            if batch.error is not None:
+                raise batch.error
+        return {
+            'accepted': len(rows),
+            'rejected': len(rejected),
+            'errors': [{'line': number, 'error': reason}
+                       for number, reason in list(rejected.items())[:MAX_REPORTED_ERRORS]]
+        }
+
+    def commit(self, conn, batches, after_insert=None):
+        """Insert several batches in one transaction; after_insert(conn) runs inside it"""
+        with conn:
+            for batch in batches:
+                conn.executemany(INSERT_SQL, batch.rows)
+            if after_insert is not None:
+                after_insert(conn)
+        committed_at = time.time()
+
+        rows = sum(len(batch.rows) for batch in batches)
+        newest_event = max(batch.newest_event for batch in batches)
+        commit_lag = committed_at - min(batch.received_at for batch in batches)
+        with self._lock:
+            self.events_committed += rows
+            self.commits += 1
+            self.last_commit_lag = commit_lag
+            self.max_commit_lag = max(self.max_commit_lag, commit_lag)
+            # How far the committed data trails the source stream
+            self.event_lag = committed_at - newest_event.timestamp()
+            self._recent.append((committed_at, rows))
+            while self._recent[0][0] < committed_at - THROUGHPUT_WINDOW:
+                self._recent.popleft()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    break
+                # Everything queued while the last group committed shares the next commit
+                group, rows = [batch], len(batch.rows)
+                while rows < self.group_rows:
+                    try:
+                        batch = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if batch is None:
+                        self._queue.put(None)
+                        break
+                    group.append(batch)
+                    rows += len(batch.rows)
+                try:
+                    self.commit(conn, group)
+                except Exception as e:
+                    print(f"Error ingesting interactions: {e}")
+                    for batch in group:
+                        batch.error = e
+                for batch in group:
+                    batch.done.set()
+        finally:
+            conn.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='interaction-ingest', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def events_per_second(self):
+        """Committed events per second over the last THROUGHPUT_WINDOW seconds"""
+        now = time.time()
+        window = min(THROUGHPUT_WINDOW, now - self.started_at) or 1
+        with self._lock:
+            return sum(rows for committed_at, rows in self._recent if committed_at >= now - window) / window
+
+    def summary(self):
+        return {
+            'events_received': self.events_received,
+            'events_rejected': self.events_rejected,
+            'events_committed': self.events_committed,
+            'commits': self.commits,
+            'mean_rows_per_commit': round(self.events_committed / self.commits, 1) if self.commits else None,
+            'queued_batches': self._queue.qsize(),
+            'events_per_second': round(self.events_per_second(), 1),
+            'commit_lag_ms': {
+                'last': None if self.last_commit_lag is None else round(self.last_commit_lag * 1000, 1),
+                'max': round(self.max_commit_lag * 1000, 1)
+            },
+            'event_lag_seconds': None if self.event_lag is None else round(self.event_lag, 3)
+        }
+
+def read_complete_lines(f, limit):
+    """Up to limit whole lines from f; a trailing line still being written is left for the next read"""
+    lines = []
+    while len(lines) < limit:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if not line.endswith(b'\n'):
+            f.seek(position)
+            break
+        lines.append(line)
+    return lines
+
+def tail_file(path, follow=False, chunk_lines=GROUP_ROWS, poll_interval=0.5, report_interval=5, db_path=DB_PATH):
+    """Ingest an NDJSON file from its last committed position, optionally following it as it grows"""
+    source = os.path.abspath(path)
+    ingestor = InteractionIngestor(db_path)
+    conn = sqlite3.connect(db_path, timeout=30)
+    stored = conn.execute("SELECT inode, position, line FROM interaction_ingest_offsets WHERE source = ?",
+                          (source,)).fetchone()
+    f = open(path, 'rb')
+    inode = os.fstat(f.fileno()).st_ino
+    position, line_number = (stored[1], stored[2]) if stored and stored[0] == inode else (0, 0)
+    f.seek(position)
+    last_report = time.time()
+
+    try:
+        while True:
+            lines = read_complete_lines(f, chunk_lines)
+            if lines:
+                rows, rejected, newest_event = prepare_events([line.decode('utf-8', 'replace') for line in lines])
+                for number, reason in rejected.items():
+                    print(f"⚠️  {path}:{line_number + number}: {reason}")
+                position, line_number = f.tell(), line_number + len(lines)
+
+                def save_position(conn, position=position, line_number=line_number):
+                    conn.execute("INSERT OR REPLACE INTO interaction_ingest_offsets VALUES (?, ?, ?, ?, ?)",
+                                 (source, inode, position, line_number, datetime.now()))
+
+                if rows:
+                    ingestor.commit(conn, [IngestBatch(rows, newest_event)], after_insert=save_position)
+                else:
+                    with conn:
+                        save_position(conn)
+                ingestor.events_received += len(rows) + len(rejected)
+                ingestor.events_rejected += len(rejected)
+            elif not follow:
+                break
+            else:
+                # Rotated or truncated: continue with the file now at path from its start
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    current = None
+                if current is not None and (current.st_ino != inode or current.st_size < position):
+                    # Finish lines that reached the old file just before it was rotated
+                    if current.st_ino != inode and f.readline().endswith(b'\n'):
+                        f.seek(position)
+                        continue
+                    f.close()
+                    f = open(path, 'rb')
+                    inode = os.fstat(f.fileno()).st_ino
+                    position = line_number = 0
+                time.sleep(poll_interval)
+
+            if time.time() - last_report >= report_interval:
+                stats = ingestor.summary()
+                lag = '-' if stats['event_lag_seconds'] is None else f"{stats['event_lag_seconds']:.1f}s"
+                print(f"📥 {stats['events_committed']} events committed, {stats['events_per_second']:.0f}/s, "
+                      f"lag {lag}, {stats['events_rejected']} rejected")
+                last_report = time.time()
+    finally:
+        f.close()
+        conn.close()
+    return ingestor.summary()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingest newline-delimited JSON interaction events')
+    parser.add_argument('path', help='NDJSON file; ingestion resumes after the last committed line')
+    parser.add_argument('--follow', action='store_true', help='Keep reading as the file grows or rotates')
+    parser.add_argument('--chunk-lines', type=int, default=GROUP_ROWS, help='Lines per transaction')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    try:
+        stats = tail_file(args.path, args.follow, args.chunk_lines, args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    else:
+        print(f"✅ Committed {stats['events_committed']} events ({stats['events_rejected']} rejected), "
+              f"{stats['events_per_second']:.0f}/s over the last minute")
@@ -0,0 +1,94 @@
+# Sliding-window interaction counts per customer
+#
+#   python interaction_windows.py CUST_000001     # a customer's 7/30/90-day counts
+#   python interaction_windows.py --prune         # drop daily buckets older than the longest window
+#
+# A trigger on customer_interactions adds each inserted event to
+# interaction_daily_counts, which has one row per customer and day. Each row
+# holds a counter per interaction type plus counters for escalated and failed
+# outcomes. Buckets are updated in the same transaction that ingests the events.
+# A window count is the sum over the last 7, 30 or 90 daily buckets, read through
+# the primary key, so customer_interactions is never rescanned. Events age out
+# of a window when its first day moves past them. With
+# CHURN_INTERACTION_FEATURES=1, the counts become model inputs (churn_features.py).
+import argparse
+import json
+import sqlite3
+from datetime import date, timedelta
+
+import pandas as pd
+
+from churn_features import INTERACTION_COUNTERS, INTERACTION_FEATURES, INTERACTION_WINDOWS
+from db_migrations import DB_PATH
+
+STORED_CUSTOMERS_SQL = "SELECT customer_id FROM customers WHERE customer_id IN (SELECT value FROM json_each(?))"
+
+def window_start(days, as_of=None):
+    """First day (ISO date) of a window of `days` days ending on as_of, today by default"""
+    return ((as_of or date.today()) - timedelta(days=days - 1)).isoformat()
+
+def window_counts_sql(customer_filter):
+    """One row per customer with a column per INTERACTION_FEATURES entry"""
+    sums = ', '.join(
+        f"SUM(CASE WHEN day >= :since_{days} THEN {counter} ELSE 0 END) AS {counter}_count_{days}d"
+        for days in INTERACTION_WINDOWS for counter in INTERACTION_COUNTERS
+    )
+    return f"""
+        SELECT customer_id, {sums}
+        FROM interaction_daily_counts
+        WHERE day >= :since_{max(INTERACTION_WINDOWS)} {customer_filter}
+        GROUP BY customer_id
+    """
+
+def window_counts(conn, customer_ids=None, as_of=None):
+    """Window counts by customer_id; customers without interactions in the longest window are absent"""
+    params = {f'since_{days}': window_start(days, as_of) for days in INTERACTION_WINDOWS}
+    customer_filter = ''
+    if customer_ids is not None:
+        # Drive from the id list so each customer is a primary-key range
+        customer_filter = "AND customer_id IN (SELECT value FROM json_each(:customer_ids))"
+        params['customer_ids'] = json.dumps(list(customer_ids))
+    counts = pd.read_sql_query(window_counts_sql(customer_filter), conn, params=params, index_col='customer_id')
+    return counts.reindex(columns=INTERACTION_FEATURES).astype(int)
+
+def join_window_counts(customers, counts):
+    """customers with their window counts; customers absent from counts had no interactions, so zeros"""
+    joined = customers.join(counts, on='customer_id')
+    joined[INTERACTION_FEATURES] = joined[INTERACTION_FEATURES].fillna(0).astype(int)
+    return joined
+
+def stored_window_counts(conn, customer_ids, as_of=None):
+    """Window counts of the ids that are stored customers, zeros where they had no interactions; others are absent"""
+    stored = pd.read_sql_query(STORED_CUSTOMERS_SQL, conn, params=(json.dumps(list(customer_ids)),))
+    if stored.empty:
+        return pd.DataFrame(columns=INTERACTION_FEATURES, dtype=int)
+    counts = window_counts(conn, stored['customer_id'], as_of)
+    return join_window_counts(stored, counts).set_index('customer_id')[INTERACTION_FEATURES]
+
+def prune(conn, as_of=None):
+    """Delete buckets that no window reads any more; returns the number deleted"""
+    with conn:
+        return conn.execute("DELETE FROM interaction_daily_counts WHERE day < ?",
+                            (window_start(max(INTERACTION_WINDOWS), as_of),)).rowcount
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show or prune sliding-window interaction counts')
+    parser.add_argument('customer_id', nargs='*')
+    parser.add_argument('--prune', action='store_true', help='Delete buckets older than the longest window')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if args.prune:
+            print(f"✅ Deleted {prune(conn)} expired daily buckets")
+        if args.customer_id:
+            counts = window_counts(conn, args.customer_id)
+            for customer_id in args.customer_id:
+                print(f"   {customer_id}:")
+                for counter in INTERACTION_COUNTERS:
+                    values = [counts.at[customer_id, f'{counter}_count_{days}d'] if customer_id in counts.index else 0
+                              for days in INTERACTION_WINDOWS]
+                    print(f"      {counter:15} " + ' '.join(f"{days}d: {value:<6}"
+                                                         for days, value in zip(INTERACTION_WINDOWS, values)))
+    finally:
+        conn.close()
@@ -0,0 +1,148 @@
+# Fill predictions.actual_churn from customer status changes
+#
+#   python label_backfill.py                       # run from cron, e.g. hourly
+#   python label_backfill.py --horizon-days 60
+#
+# A prediction is labeled 1 when its customer turns 'churned' within the horizon
+# after it, and 0 once the horizon has passed without a churn. Churns are read
+# from customer_churns past a churn_id watermark; a trigger logs each change of
+# status to 'churned' there, in the same local time as prediction_date. The
+# predictions of up to CUSTOMER_CHUNK churns are labeled by one executemany per
+# table, main and each partition, each row an index range of one customer. Expired
+# predictions are labeled in PREDICTION_CHUNK slices of idx_predictions_date.
+# Each chunk commits on its own along with its watermark, so no transaction
+# holds the write lock for long. Only unlabeled rows are touched, which makes a
+# rerun or a resumed run harmless.
+# Every label lands in prediction_labels for online_evaluation.py.
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from db_migrations import DB_PATH
+from prediction_partitions import PredictionPartitions
+
+LABEL_HORIZON_DAYS = int(os.environ.get('CHURN_LABEL_HORIZON_DAYS', 90))
+CUSTOMER_CHUNK = 500
+PREDICTION_CHUNK = 10000
+# Sleep after each chunk commit; a writer in its busy handler otherwise loses the lock to the next chunk
+CHUNK_PAUSE = 0.05
+
+CHURN_CHUNK_SQL = """
+    SELECT churn_id, customer_id, churned_at FROM customer_churns
+    WHERE churn_id > ?
+    ORDER BY churn_id
+    LIMIT ?
+"""
+
+# One churn's horizon of one predictions table: ?1 customer_id, ?2 '-N days', ?3 churned_at
+LABEL_CHURNED_SQL = """
+    UPDATE {table} SET actual_churn = 1
+    WHERE customer_id = ?1
+    AND prediction_date >= strftime('%Y-%m-%d %H:%M:%f', ?3, ?2) AND prediction_date <= ?3
+    AND actual_churn IS NULL
+"""
+
+EXPIRED_CHUNK_SQL = """
+    SELECT prediction_date, prediction_id FROM {table}
+    WHERE (prediction_date, prediction_id) > (?, ?) AND prediction_date < ?
+    ORDER BY prediction_date, prediction_id
+    LIMIT ?
+"""
+
+class LabelBackfill:
+    """Resumable job labeling predictions from churned customers and elapsed horizons"""
+
+    def __init__(self, db_path=DB_PATH, partitions=None, horizon_days=LABEL_HORIZON_DAYS,
+                 customer_chunk=CUSTOMER_CHUNK, prediction_chunk=PREDICTION_CHUNK, pause=CHUNK_PAUSE):
+        self.db_path = db_path
+        self.partitions = partitions or PredictionPartitions(db_path)
+        self.horizon_days = horizon_days
+        self.customer_chunk = customer_chunk
+        self.prediction_chunk = prediction_chunk
+        self.pause = pause
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # Every live partition, including months past retention that have not been compacted yet
+        self.partitions.attach(conn, self.partitions.months())
+        return conn
+
+    @staticmethod
+    def _tables(conn):
+        return [f"{row[1]}.predictions" for row in conn.execute("PRAGMA database_list") if row[1] != 'temp']
+
+    def label_churns(self, conn):
+        """Label predictions of customers that turned 'churned' since the watermark; returns (churns, labels)"""
+        customers = labels = 0
+        tables = self._tables(conn)
+        while True:
+            since = conn.execute("SELECT churn_id FROM label_backfill_state").fetchone()[0]
+            chunk = conn.execute(CHURN_CHUNK_SQL, (since, self.customer_chunk)).fetchall()
+            if not chunk:
+                return customers, labels
+
+            # Per churn, an index range on (customer_id, prediction_date) of each table
+            windows = [(customer_id, f'-{self.horizon_days} days', churned_at) for _, customer_id, churned_at in chunk]
+            with conn:
+                for table in tables:
+                    labels += conn.executemany(LABEL_CHURNED_SQL.format(table=table), windows).rowcount
+                conn.execute("UPDATE label_backfill_state SET churn_id = ?", (chunk[-1][0],))
+            customers += len(chunk)
+            time.sleep(self.pause)
+
+    def label_expired(self, conn):
+        """Label 0 every unlabeled prediction whose horizon has passed; returns the number labeled"""
+        cutoff = (datetime.now() - timedelta(days=self.horizon_days)).strftime('%Y-%m-%d %H:%M:%S.%f')
+        since = conn.execute("SELECT expired_before FROM label_backfill_state").fetchone()[0] or ''
+        labels = 0
+        for table in self._tables(conn):
+            position = (since, -1)
+            while True:
+                # Walk idx_predictions_date in slices; labeled rows in the range are passed over, never rewritten
+                chunk = conn.execute(
+                    EXPIRED_CHUNK_SQL.format(table=table), (*position, cutoff, self.prediction_chunk)
+                ).fetchall()
+                if not chunk:
+                    break
+                with conn:
+                    labels += conn.execute(f"""
+                        UPDATE {table} SET actual_churn = 0
+                        WHERE (prediction_date, prediction_id) >= (?, ?) AND (prediction_date, prediction_id) <= (?, ?)
+                        AND actual_churn IS NULL
+                    """, (*chunk[0], *chunk[-1])).rowcount
+                position = chunk[-1]
+                time.sleep(self.pause)
+        with conn:
+            conn.execute("UPDATE label_backfill_state SET expired_before = ?", (cutoff,))
+        return labels
+
+    def run(self):
+        """Label churns first, so predictions inside a churn's horizon are never marked retained"""
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            customers, churn_labels = self.label_churns(conn)
+            retained_labels = self.label_expired(conn)
+        finally:
+            conn.close()
+        return {
+            'churned_customers': customers,
+            'churned_labels': churn_labels,
+            'retained_labels': retained_labels,
+            'seconds': round(time.perf_counter() - start, 2)
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Label predictions from customer churn')
+    parser.add_argument('--horizon-days', type=int, default=LABEL_HORIZON_DAYS)
+    parser.add_argument('--customer-chunk', type=int, default=CUSTOMER_CHUNK)
+    parser.add_argument('--prediction-chunk', type=int, default=PREDICTION_CHUNK)
+    parser.add_argument('--pause', type=float, default=CHUNK_PAUSE, help='Seconds to yield the lock between chunks')
+    args = parser.parse_args()
+
+    result = LabelBackfill(horizon_days=args.horizon_days, customer_chunk=args.customer_chunk,
+                           prediction_chunk=args.prediction_chunk, pause=args.pause).run()
+    print(f"✅ Labeled {result['churned_labels']} predictions churned ({result['churned_customers']} customers) "
+          f"and {result['retained_labels']} retained in {result['seconds']}s")
@@ -0,0 +1,260 @@
+# Versioned model registry with background hot-swap
+#
+# Layout:
+#   model_registry/
+#     v1.1/churn_model.pkl     one directory per published version
+#     v1.1/model_info.json     (optional) training metadata
+#     CURRENT                  (optional) version to serve; defaults to the newest
+#     CANDIDATE                (optional) version to shadow-score against live traffic
+#
+#   python model_registry.py publish churn_model.pkl v1.1 --info model_info.json
+#   python model_registry.py activate v1.0      # roll back
+#   python model_registry.py shadow v1.2        # evaluate v1.2 off the request path
+#   python model_registry.py list
+import argparse
+import contextlib
+import os
+import re
+import shutil
+import threading
+from collections import namedtuple
+
+import joblib
+
+REGISTRY_DIR = 'model_registry'
+MODEL_FILENAME = 'churn_model.pkl'
+CURRENT_FILENAME = 'CURRENT'
+CANDIDATE_FILENAME = 'CANDIDATE'
+
+# The model and the version it was published as, swapped together as one reference
+ServingModel = namedtuple('ServingModel', ['version', 'model'])
+
+def version_key(version):
+    """Natural sort key so v1.10 sorts after v1.9"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Published versions, oldest first"""
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = [
+        name for name in os.listdir(registry_dir)
+        if not name.endswith('.tmp') and os.path.isfile(os.path.join(registry_dir, name, MODEL_FILENAME))
+    ]
+    return sorted(versions, key=version_key)
+
+def _write_pointer(filename, version, registry_dir):
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Unknown model version: {version}")
+    path = os.path.join(registry_dir, filename)
+    with open(path + '.tmp', 'w') as f:
+        f.write(version + '\n')
+    os.replace(path + '.tmp', path)
+
+def _read_pointer(filename, registry_dir):
+    path = os.path.join(registry_dir, filename)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+def set_current(version, registry_dir=REGISTRY_DIR):
+    """Point CURRENT at a published version"""
+    _write_pointer(CURRENT_FILENAME, version, registry_dir)
+
+def set_candidate(version, registry_dir=REGISTRY_DIR):
+    """Point CANDIDATE at a published version, or clear it with None"""
+    if version is None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(registry_dir, CANDIDATE_FILENAME))
+    else:
+        _write_pointer(CANDIDATE_FILENAME, version, registry_dir)
+
+def publish_model(model_path, version, registry_dir=REGISTRY_DIR, info_path=None, activate=True):
+    """Copy a trained model into the registry, optionally making it the served version"""
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise ValueError(f"Model version already published: {version}")
+
+    # Stage in a temp directory and rename, so watchers never see a half-copied model
+    staging = target + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    shutil.copy2(model_path, os.path.join(staging, MODEL_FILENAME))
+    if info_path:
+        shutil.copy2(info_path, os.path.join(staging, 'model_info.json'))
+    os.rename(staging, target)
+
+    if activate:
+        set_current(version, registry_dir)
+
+class ModelRegistry:
+    """Serves one model version and hot-swaps to a newly published one in the background"""
+
+    def __init__(self, registry_dir=REGISTRY_DIR, fallback_path='churn_model.pkl', fallback_version='v1.0',
+                 poll_interval=10):
+        self.registry_dir = registry_dir
+        self.fallback_path = fallback_path
+        self.fallback_version = fallback_version
+        self.poll_interval = poll_interval
+        self.active = None
+        self.candidate = None
+        self.n_jobs = None
+        # Callable returning a DataFrame of model features used to warm new versions
+        self.warmup_sample = None
+        self.failed_versions = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """The ServingModel to use for one request, or None if nothing is loaded"""
+        return self.active
+
+    def target_version(self):
+        current = _read_pointer(CURRENT_FILENAME, self.registry_dir)
+        if current:
+            return current
+        versions = list_versions(self.registry_dir)
+        return versions[-1] if versions else None
+
+    def _load(self, version):
+        if version == self.fallback_version and version not in list_versions(self.registry_dir):
+            path = self.fallback_path
+        else:
+            path = os.path.join(self.registry_dir, version, MODEL_FILENAME)
+        model = joblib.load(path)
+        if self.n_jobs is not None:
+            model.n_jobs = self.n_jobs
+        return model
+
+    def _warm(self, model):
+        """Validate a candidate and run sample traffic through it before it takes requests"""
+        if self.warmup_sample is None:
+            return
+        sample = self.warmup_sample()
+        if sample is None or len(sample) == 0:
+            return
+        if model.n_features_in_ != sample.shape[1]:
+            raise ValueError(f"Model expects {model.n_features_in_} features, serving builds {sample.shape[1]}")
+
+        # Single-row requests dominate live traffic, so warm that path as well as a batch
+        for i in range(min(len(sample), 32)):
+            model.predict_proba(sample.iloc[i:i + 1])
+        probs = model.predict_proba(sample)[:, 1]
+        if not ((probs >= 0) & (probs <= 1)).all():
+            raise ValueError("Model returned probabilities outside [0, 1]")
+
+    def load_initial(self):
+        """Load the target version, or the fallback model when the registry is empty"""
+        version = self.target_version() or self.fallback_version
+        self.active = ServingModel(version, self._load(version))
+        return self.active
+
+    def check(self):
+        """Swap in the target version if it differs from the one being served"""
+        target = self.target_version()
+        if target is None or target in self.failed_versions:
+            return False
+        if self.active is not None and target == self.active.version:
+            return False
+
+        try:
+            model = self._load(target)
+            self._warm(model)
+        except Exception as e:
+            # Keep serving the current model and don't retry a broken artifact every poll
+            self.failed_versions.add(target)
+            print(f"❌ Model {target} rejected: {e}")
+            return False
+
+        previous = self.active.version if self.active else None
+        # In-flight requests keep the ServingModel they already grabbed
+        self.active = ServingModel(target, model)
+        print(f"🔄 Model swapped: {previous} -> {target}")
+        return True
+
+    def check_candidate(self):
+        """Load, replace or drop the shadow candidate to match CANDIDATE"""
+        target = _read_pointer(CANDIDATE_FILENAME, self.registry_dir)
+        if target is None or (self.active is not None and target == self.active.version):
+            self.candidate = None
+            return False
+        if target in self.failed_versions or (self.candidate is not None and target == self.candidate.version):
+            return False
+
+        try:
+            model = self._load(target)
+            self._warm(model)
+        except Exception as e:
+            self.failed_versions.add(target)
+            print(f"❌ Candidate model {target} rejected: {e}")
+            return False
+
+        self.candidate = ServingModel(target, model)
+        print(f"👥 Shadow scoring candidate {target}")
+        return True
+
+    def set_n_jobs(self, n_jobs):
+        """Cores used per prediction, applied to the loaded models and every future one"""
+        self.n_jobs = n_jobs
+        for serving in (self.active, self.candidate):
+            if serving is not None:
+                serving.model.n_jobs = n_jobs
+
+    def start(self):
+        """Watch the registry for new versions from a background thread"""
+        self._thread = threading.Thread(target=self._run, name='model-registry-watch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+                self.check_candidate()
+            except Exception as e:
+                print(f"Error checking model registry: {e}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the local model registry')
+    parser.add_argument('--registry', default=REGISTRY_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish = commands.add_parser('publish', help='Publish a trained model as a new version')
+    publish.add_argument('model_path')
+    publish.add_argument('version')
+    publish.add_argument('--info', help='model_info.json to store alongside the model')
+    publish.add_argument('--no-activate', action='store_true', help='Publish without serving it')
+
+    activate = commands.add_parser('activate', help='Serve an already published version')
+    activate.add_argument('version')
+
+    shadow = commands.add_parser('shadow', help='Shadow-score a published version against live traffic')
+    shadow.add_argument('version', nargs='?')
+    shadow.add_argument('--clear', action='store_true', help='Stop shadow scoring')
+
+    commands.add_parser('list', help='List published versions')
+
+    args = parser.parse_args()
+    if args.command == 'publish':
+        publish_model(args.model_path, args.version, args.registry, args.info, not args.no_activate)
+        print(f"✅ Published {args.version}")
+    elif args.command == 'activate':
+        set_current(args.version, args.registry)
+        print(f"✅ Serving {args.version}")
+    elif args.command == 'shadow':
+        if args.clear or not args.version:
+            set_candidate(None, args.registry)
+            print("✅ Shadow scoring stopped")
+        else:
+            set_candidate(args.version, args.registry)
+            print(f"✅ Shadow scoring {args.version}")
+    else:
+        registry = ModelRegistry(args.registry)
+        target = registry.target_version()
+        candidate = _read_pointer(CANDIDATE_FILENAME, args.registry)
+        for version in list_versions(args.registry):
+            marker = '*' if version == target else ('~' if version == candidate else ' ')
+            print(f"{marker} {version}")
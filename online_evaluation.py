@@ -0,0 +1,232 @@
+# Online model evaluation from actual_churn labels
+#
+#   python online_evaluation.py              # fold in new labels and write model_performance rows
+#   python online_evaluation.py --history    # show the recorded evaluations
+#
+# Setting predictions.actual_churn logs the change to prediction_labels (a
+# trigger on the main table, temp triggers on the partitions). Each run reads
+# the log past its watermark and adds it to evaluation_histogram: per model
+# version and 0.001-wide probability bin, counts of churned and retained
+# customers plus probability sums. AUC, precision, recall, F1, accuracy, Brier
+# score and calibration then come from at most EVALUATION_BINS rows per
+# version, however many labels exist. A run writes one model_performance row for
+# every version that gained labels. Folding, watermark and rows commit together,
+# so concurrent or interrupted runs never count a label twice.
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from db_migrations import DB_PATH
+
+EVALUATION_BINS = 1000
+EVALUATION_INTERVAL = float(os.environ.get('CHURN_EVALUATION_INTERVAL', 300))
+# churn_prediction is churn_probability >= 0.5, which falls on a bin edge
+DECISION_THRESHOLD = 0.5
+CALIBRATION_GROUPS = 10
+
+# Model versions with labels logged in (after, last] of label_id
+LABELED_VERSIONS_SQL = (
+    "SELECT DISTINCT COALESCE(model_version, '') FROM prediction_labels WHERE label_id > ? AND label_id <= ?"
+)
+
+HISTOGRAM_SQL = (
+    "SELECT bin, positives, negatives, probability_sum, probability_sum_sq, "
+    "positive_probability_sum FROM evaluation_histogram WHERE model_version = ?"
+)
+
+# A relabel adds the new label and takes back the previous one
+HISTOGRAM_UPSERT_SQL = """
+    INSERT INTO evaluation_histogram
+    SELECT
+        COALESCE(model_version, ''),
+        MIN(CAST(churn_probability * :bins AS INTEGER), :bins - 1) AS bin,
+        SUM(COALESCE(actual_churn = 1, 0) - COALESCE(previous_churn = 1, 0)),
+        SUM(COALESCE(actual_churn = 0, 0) - COALESCE(previous_churn = 0, 0)),
+        SUM(churn_probability * ((actual_churn IS NOT NULL) - (previous_churn IS NOT NULL))),
+        SUM(churn_probability * churn_probability * ((actual_churn IS NOT NULL) - (previous_churn IS NOT NULL))),
+        SUM(churn_probability * (COALESCE(actual_churn = 1, 0) - COALESCE(previous_churn = 1, 0)))
+    FROM prediction_labels
+    WHERE label_id > :after AND label_id <= :last AND churn_probability IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (model_version, bin) DO UPDATE SET
+        positives = positives + excluded.positives,
+        negatives = negatives + excluded.negatives,
+        probability_sum = probability_sum + excluded.probability_sum,
+        probability_sum_sq = probability_sum_sq + excluded.probability_sum_sq,
+        positive_probability_sum = positive_probability_sum + excluded.positive_probability_sum
+"""
+
+def evaluation_metrics(histogram, bins=EVALUATION_BINS):
+    """Metrics from one version's histogram rows (bin, positives, negatives, probability sums), or None"""
+    columns = np.zeros((5, bins))
+    for row in histogram:
+        columns[:, row[0]] = row[1:]
+    positives, negatives, probability_sum, probability_sum_sq, positive_probability_sum = columns
+    P, N = positives.sum(), negatives.sum()
+    total = P + N
+    if total == 0:
+        return None
+
+    # Pairs ranked correctly, with pairs sharing a bin counted as ties
+    auc = None
+    if P and N:
+        negatives_below = np.cumsum(negatives) - negatives
+        auc = float((positives * negatives_below).sum() + 0.5 * (positives * negatives).sum()) / (P * N)
+
+    threshold = int(DECISION_THRESHOLD * bins)
+    tp, fp = positives[threshold:].sum(), negatives[threshold:].sum()
+    tn = N - fp
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / P if P else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+
+    calibration = []
+    error = 0.0
+    for group in np.array_split(np.arange(bins), CALIBRATION_GROUPS):
+        count = positives[group].sum() + negatives[group].sum()
+        if not count:
+            continue
+        predicted = probability_sum[group].sum() / count
+        observed = positives[group].sum() / count
+        error += abs(predicted - observed) * count / total
+        calibration.append({
+            'range': [round(group[0] / bins, 3), round((group[-1] + 1) / bins, 3)],
+            'count': int(count),
+            'mean_predicted': round(float(predicted), 4),
+            'observed_rate': round(float(observed), 4)
+        })
+
+    return {
+        'auc_score': auc,
+        'precision_score': None if precision is None else float(precision),
+        'recall_score': None if recall is None else float(recall),
+        'f1_score': None if f1 is None else float(f1),
+        'accuracy': float((tp + tn) / total),
+        'brier_score': float((probability_sum_sq.sum() - 2 * positive_probability_sum.sum() + P) / total),
+        'calibration_error': float(error),
+        'calibration': calibration,
+        'total_predictions': int(total)
+    }
+
+class OnlineEvaluator:
+    """Folds new prediction labels into evaluation_histogram and records model_performance rows"""
+
+    def __init__(self, db_path=DB_PATH, interval=EVALUATION_INTERVAL):
+        self.db_path = db_path
+        self.interval = interval
+        self.labels_processed = 0
+        self.last_run = None
+        self.last_run_seconds = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self):
+        """Evaluate every model version with new labels; returns the model_performance rows written"""
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            # Take the write lock first so concurrent evaluators queue rather than read the same watermark
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                watermark = conn.execute("SELECT label_id FROM evaluation_watermark").fetchone()
+                after = watermark[0] if watermark else 0
+                last = conn.execute("SELECT MAX(label_id) FROM prediction_labels").fetchone()[0] or 0
+                if last <= after:
+                    conn.execute("ROLLBACK")
+                    return []
+
+                versions = [row[0] for row in conn.execute(LABELED_VERSIONS_SQL, (after, last))]
+                conn.execute(HISTOGRAM_UPSERT_SQL, {'bins': EVALUATION_BINS, 'after': after, 'last': last})
+                conn.execute("INSERT OR REPLACE INTO evaluation_watermark (id, label_id) VALUES (1, ?)", (last,))
+
+                written = []
+                evaluated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for version in versions:
+                    metrics = evaluation_metrics(conn.execute(HISTOGRAM_SQL, (version,)))
+                    if metrics is None:
+                        continue
+                    conn.execute("""
+                        INSERT INTO model_performance
+                        (model_version, evaluation_date, auc_score, precision_score, recall_score, f1_score,
+                         accuracy, total_predictions, brier_score, calibration_error, calibration_json, notes)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        version or None, evaluated_at, metrics['auc_score'], metrics['precision_score'],
+                        metrics['recall_score'], metrics['f1_score'], metrics['accuracy'],
+                        metrics['total_predictions'], metrics['brier_score'], metrics['calibration_error'],
+                        json.dumps(metrics['calibration']),
+                        f"Online evaluation over {metrics['total_predictions']} labeled predictions"
+                    ))
+                    written.append(dict(metrics, model_version=version or None))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+        self.labels_processed += last - after
+        self.last_run = time.time()
+        self.last_run_seconds = time.perf_counter() - start
+        return written
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='online-evaluation', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Error in online evaluation: {e}")
+
+    def summary(self):
+        return {
+            'interval_seconds': self.interval,
+            'labels_processed': self.labels_processed,
+            'last_run': self.last_run,
+            'last_run_seconds': self.last_run_seconds
+        }
+
+def performance_history(db_path=DB_PATH, limit=20):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("""
+            SELECT model_version, evaluation_date, auc_score, precision_score, recall_score, f1_score,
+                   accuracy, brier_score, calibration_error, total_predictions
+            FROM model_performance
+            ORDER BY performance_id DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate served models on labeled predictions')
+    parser.add_argument('--history', action='store_true', help='Show recent model_performance rows')
+    args = parser.parse_args()
+
+    if args.history:
+        print(f"   {'version':8} {'evaluated':19} {'AUC':>6} {'prec':>6} {'recall':>6} {'F1':>6} "
+              f"{'acc':>6} {'brier':>6} {'ECE':>6} {'labels':>8}")
+        for row in performance_history():
+            print(f"   {row[0] or '-':8} {row[1]:19} " + ' '.join(
+                '     -' if value is None else f"{value:6.3f}" for value in row[2:9]
+            ) + f" {row[9]:>8}")
+    else:
+        rows = OnlineEvaluator().run()
+        for metrics in rows:
+            auc = '-' if metrics['auc_score'] is None else f"{metrics['auc_score']:.3f}"
+            print(f"   {metrics['model_version']}: AUC {auc}, accuracy {metrics['accuracy']:.3f}, "
+                  f"Brier {metrics['brier_score']:.3f} over {metrics['total_predictions']} labels")
+        print(f"✅ Recorded {len(rows)} model_performance row(s)")
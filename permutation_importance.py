@@ -0,0 +1,134 @@
+# Permutation feature importance for model_info.json
+#
+#   python permutation_importance.py --model churn_model.pkl --info model_info.json
+#
+# Impurity importances favour continuous features with many split points
+# (monthly_bill, clv_estimate). Permutation importance instead measures how much
+# test AUC drops when one feature's values are shuffled. Every feature x repeat
+# evaluation runs in a process pool. Workers map one read-only .npy copy of
+# the test matrix. Scores are cached per (model hash, dataset hash, feature,
+# repeat), so an unchanged model and test set cost nothing to re-report and
+# extra repeats only compute the new ones.
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+
+from churn_features import holdout_split
+
+CACHE_DIR = '.importance_cache'
+SEED = 42
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def dataset_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(X.columns)).encode())
+    digest.update(np.ascontiguousarray(X.to_numpy(dtype=np.float64)).tobytes())
+    digest.update(np.ascontiguousarray(np.asarray(y, dtype=np.int64)).tobytes())
+    return digest.hexdigest()[:16]
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+def _init_worker(model_path, matrix_path, y, columns):
+    model = joblib.load(model_path)
+    # The pool already uses every core
+    model.n_jobs = 1
+    _worker.update(model=model, X=np.load(matrix_path, mmap_mode='r'), y=y, columns=columns)
+
+def _auc(X):
+    frame = pd.DataFrame(X, columns=_worker['columns'], copy=False)
+    return roc_auc_score(_worker['y'], _worker['model'].predict_proba(frame)[:, 1])
+
+def _permuted_auc(task):
+    feature, repeat = task
+    X = np.array(_worker['X'])
+    # Seeded by (feature, repeat) so a cached score never depends on scheduling
+    rng = np.random.default_rng([SEED, feature, repeat])
+    X[:, feature] = rng.permutation(X[:, feature])
+    return feature, repeat, _auc(X)
+
+def _baseline_auc(_):
+    return _auc(np.asarray(_worker['X']))
+
+def _load_cache(path):
+    if not os.path.exists(path):
+        return {'baseline': None, 'scores': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_cache(path, cache):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    os.replace(path + '.tmp', path)
+
+def permutation_importance(model_path, X_test, y_test, n_repeats=5, workers=None, cache_dir=CACHE_DIR):
+    """Mean and std AUC drop per feature, most important first"""
+    os.makedirs(cache_dir, exist_ok=True)
+    model_key = file_hash(model_path)
+    data_key = dataset_hash(X_test, y_test)
+    cache_path = os.path.join(cache_dir, f'{model_key}_{data_key}.json')
+    cache = _load_cache(cache_path)
+
+    columns = list(X_test.columns)
+    todo = [
+        (feature, repeat) for feature in range(len(columns)) for repeat in range(n_repeats)
+        if str(repeat) not in cache['scores'].get(columns[feature], {})
+    ]
+
+    if todo or cache['baseline'] is None:
+        matrix_path = os.path.join(cache_dir, f'{data_key}.npy')
+        if not os.path.exists(matrix_path):
+            np.save(matrix_path, X_test.to_numpy(dtype=np.float32))
+
+        y = np.asarray(y_test)
+        print(f"🔄 Permutation importance: {len(todo)} evaluations ({len(columns) * n_repeats - len(todo)} cached)")
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(model_path, matrix_path, y, columns)) as pool:
+            if cache['baseline'] is None:
+                cache['baseline'] = next(pool.map(_baseline_auc, [None]))
+            chunksize = max(1, len(todo) // ((workers or os.cpu_count() or 1) * 4))
+            for feature, repeat, auc in pool.map(_permuted_auc, todo, chunksize=chunksize):
+                cache['scores'].setdefault(columns[feature], {})[str(repeat)] = auc
+        _save_cache(cache_path, cache)
+
+    importances = []
+    for name in columns:
+        drops = cache['baseline'] - np.array([cache['scores'][name][str(repeat)] for repeat in range(n_repeats)])
+        importances.append({'feature': name, 'importance': float(drops.mean()), 'std': float(drops.std())})
+    return sorted(importances, key=lambda item: item['importance'], reverse=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Add permutation importance to model_info.json')
+    parser.add_argument('--model', default='churn_model.pkl')
+    parser.add_argument('--info', default='model_info.json')
+    parser.add_argument('--dataset', default='customer_churn_dataset.csv')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--workers', type=int, help='Processes to use (default: one per CPU)')
+    args = parser.parse_args()
+
+    _, X_test, _, y_test = holdout_split(args.dataset)
+    importances = permutation_importance(args.model, X_test, y_test, args.repeats, args.workers)
+
+    with open(args.info) as f:
+        info = json.load(f)
+    info['permutation_importance'] = importances
+    with open(args.info, 'w') as f:
+        json.dump(info, f, indent=2)
+
+    print("\nTop 10 features by AUC drop:")
+    for item in importances[:10]:
+        print(f"   {item['feature']:28} {item['importance']:.4f} ± {item['std']:.4f}")
+    print(f"✅ Permutation importance written to {args.info}")
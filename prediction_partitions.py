@@ -0,0 +1,296 @@
+# Monthly partitions for the predictions table
+#
+#   python prediction_partitions.py list
+#   python prediction_partitions.py compact              # run monthly, e.g. from cron
+#   python prediction_partitions.py compact --drop       # delete old partitions instead of archiving
+#
+# New predictions go to prediction_partitions/predictions_YYYY_MM.db, one SQLite
+# file per month, which every connection ATTACHes. The temp view predictions_all
+# unions the main predictions table (rows written before partitioning) with the
+# attached partitions. Temp triggers keep prediction_daily_rollup and
+# latest_predictions current for partition inserts and log actual_churn changes
+# to prediction_labels. The retention job recomputes the rollup for months
+# older than the retention window, archives or drops their partitions, and
+# deletes those months from the main table. Only the recent months stay
+# attached, so their indexes stay small.
+import argparse
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote
+
+from db_migrations import DB_PATH, LABEL_LOG_SQL, LATEST_UPSERT_SQL, ROLLUP_UPSERT_SQL
+
+# Months of raw predictions kept attached; older months survive only in the rollup
+RETENTION_MONTHS = int(os.environ.get('CHURN_PREDICTION_RETENTION_MONTHS', 3))
+
+PREDICTION_COLUMNS = [
+    'prediction_id', 'customer_id', 'prediction_date', 'churn_probability', 'churn_prediction',
+    'risk_level', 'model_version', 'actual_churn'
+]
+
+PARTITION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS predictions (
+        prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id TEXT,
+        prediction_date TIMESTAMP,
+        churn_probability REAL,
+        churn_prediction INTEGER,
+        risk_level TEXT,
+        model_version TEXT,
+        actual_churn INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_predictions_date ON predictions(prediction_date)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_predictions_customer_latest
+    ON predictions(customer_id, prediction_date DESC, churn_probability, risk_level)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_predictions_risk_probability
+    ON predictions(risk_level, churn_probability, customer_id, prediction_date)
+    """,
+]
+
+def month_key(when):
+    return when.strftime('%Y_%m')
+
+def month_bounds(month):
+    """First day of a YYYY_MM month and of the month after it, as ISO dates"""
+    year, number = map(int, month.split('_'))
+    following = (year + 1, 1) if number == 12 else (year, number + 1)
+    return f'{year:04d}-{number:02d}-01', f'{following[0]:04d}-{following[1]:02d}-01'
+
+def months_before(month, count):
+    """The month count months before a YYYY_MM month"""
+    year, number = map(int, month.split('_'))
+    index = year * 12 + number - 1 - count
+    return f'{index // 12:04d}_{index % 12 + 1:02d}'
+
+def schema_name(month):
+    return f'p_{month}'
+
+def create_partition(path, month):
+    """Create a partition file; prediction_ids start at YYYYMM * 10^10 so they never collide"""
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for statement in PARTITION_SCHEMA:
+                conn.execute(statement)
+            if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'predictions'").fetchone() is None:
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES ('predictions', ?)",
+                    (int(month.replace('_', '')) * 10 ** 10,)
+                )
+    finally:
+        conn.close()
+
+def read_only_uri(path):
+    """SQLite URI that opens or attaches a file read-only; the connection needs uri=True"""
+    return f'file:{quote(os.path.abspath(path))}?mode=ro'
+
+def insert_sql(month):
+    """INSERT INTO one month's partition, parameters as from backend_app.prediction_record"""
+    return f"""
+        INSERT INTO {schema_name(month)}.predictions
+        (customer_id, prediction_date, churn_probability, churn_prediction,
+         risk_level, model_version)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+
+def group_by_month(records):
+    """prediction_record tuples keyed by the month of their prediction_date"""
+    by_month = {}
+    for record in records:
+        by_month.setdefault(month_key(record[1]), []).append(record)
+    return by_month
+
+class PredictionPartitions:
+    """Monthly prediction partition files next to the main database"""
+
+    def __init__(self, db_path=DB_PATH, partition_dir=None, retention_months=RETENTION_MONTHS, read_only=False):
+        self.db_path = db_path
+        self.partition_dir = partition_dir or os.path.join(
+            os.path.dirname(os.path.abspath(db_path)), 'prediction_partitions'
+        )
+        self.archive_dir = os.path.join(self.partition_dir, 'archive')
+        # SQLite attaches at most 10 databases by default; one slot is left for the retention job
+        if not 1 <= retention_months <= 9:
+            raise ValueError("retention_months must be between 1 and 9")
+        self.retention_months = retention_months
+        # Read-only partitions (snapshot copies) are attached by URI and never created
+        self.read_only = read_only
+
+    def path(self, month):
+        return os.path.join(self.partition_dir, f'predictions_{month}.db')
+
+    def months(self):
+        """Months with a live (not yet archived) partition, oldest first"""
+        if not os.path.isdir(self.partition_dir):
+            return []
+        return sorted(
+            name[len('predictions_'):-len('.db')] for name in os.listdir(self.partition_dir)
+            if name.startswith('predictions_') and name.endswith('.db')
+        )
+
+    def current_month(self):
+        return month_key(datetime.now())
+
+    def oldest_month(self):
+        """First month inside the retention window"""
+        return months_before(self.current_month(), self.retention_months - 1)
+
+    def setup_statements(self, attached, months=()):
+        """(sql, params) that attach every live partition to a connection and build predictions_all
+
+        attached is the set of schema names the connection already has (PRAGMA database_list),
+        so the statements can be rerun when the month rolls over. Partitions for the current
+        month and for any of months are created first, unless read_only. Months past the retention
+        window that have not been compacted yet are left detached; their totals are already in the rollup.
+        """
+        for month in {self.current_month(), *months}:
+            if not self.read_only and not os.path.exists(self.path(month)):
+                os.makedirs(self.partition_dir, exist_ok=True)
+                create_partition(self.path(month), month)
+
+        columns = ', '.join(PREDICTION_COLUMNS)
+        selects = [f"SELECT {columns} FROM main.predictions"]
+        statements = []
+        oldest = self.oldest_month()
+        for month in self.months():
+            if month < oldest and month not in months:
+                continue
+            schema = schema_name(month)
+            if schema not in attached:
+                target = read_only_uri(self.path(month)) if self.read_only else self.path(month)
+                statements.append((f"ATTACH DATABASE ? AS {schema}", (target,)))
+            # Temp triggers may watch attached tables; the unqualified rollup resolves to main
+            statements.append((f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_{schema}_rollup
+                AFTER INSERT ON {schema}.predictions
+                WHEN NEW.prediction_date IS NOT NULL
+                BEGIN
+                    {ROLLUP_UPSERT_SQL}
+                END
+            """, ()))
+            statements.append((f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_{schema}_latest
+                AFTER INSERT ON {schema}.predictions
+                WHEN NEW.customer_id IS NOT NULL AND NEW.prediction_date IS NOT NULL
+                BEGIN
+                    {LATEST_UPSERT_SQL}
+                END
+            """, ()))
+            statements.append((f"""
+                CREATE TEMP TRIGGER IF NOT EXISTS trg_{schema}_label_log
+                AFTER UPDATE OF actual_churn ON {schema}.predictions
+                WHEN NEW.actual_churn IS NOT OLD.actual_churn
+                BEGIN
+                    {LABEL_LOG_SQL}
+                END
+            """, ()))
+            selects.append(f"SELECT {columns} FROM {schema}.predictions")
+
+        statements.append(("DROP VIEW IF EXISTS temp.predictions_all", ()))
+        statements.append((f"CREATE TEMP VIEW predictions_all AS {' UNION ALL '.join(selects)}", ()))
+        return statements
+
+    def attach(self, conn, months=()):
+        """Attach the partitions and create predictions_all on a sqlite3 connection"""
+        attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+        for statement, params in self.setup_statements(attached, months):
+            conn.execute(statement, params)
+
+    def insert(self, conn, records):
+        """Write prediction_record tuples to the partitions of their prediction dates"""
+        attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+        by_month = group_by_month(records)
+        if any(schema_name(month) not in attached for month in by_month):
+            self.attach(conn, by_month)
+        for month, rows in by_month.items():
+            conn.executemany(insert_sql(month), rows)
+
+    def compact(self, drop=False):
+        """Fold months past the retention window into the rollup, then archive or drop their rows"""
+        cutoff = self.oldest_month()
+        cutoff_date = month_bounds(cutoff)[0]
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            legacy = {
+                row[0].replace('-', '_') for row in conn.execute(
+                    "SELECT DISTINCT substr(prediction_date, 1, 7) FROM predictions WHERE prediction_date < ?",
+                    (cutoff_date,)
+                )
+            }
+            partitioned = {month for month in self.months() if month < cutoff}
+
+            for month in sorted(legacy | partitioned):
+                start, end = month_bounds(month)
+                schemas = ['main']
+                if month in partitioned:
+                    conn.execute("ATTACH DATABASE ? AS old_partition", (self.path(month),))
+                    schemas.append('old_partition')
+                sources = [
+                    f"SELECT {', '.join(PREDICTION_COLUMNS)} FROM {schema}.predictions "
+                    "WHERE prediction_date >= :start AND prediction_date < :end"
+                    for schema in schemas
+                ]
+
+                # Recompute rather than trust the triggers, in case a writer bypassed them
+                with conn:
+                    conn.execute("DELETE FROM prediction_daily_rollup WHERE date >= :start AND date < :end",
+                                 {'start': start, 'end': end})
+                    conn.execute(f"""
+                        INSERT INTO prediction_daily_rollup
+                        SELECT DATE(prediction_date), COALESCE(model_version, ''), COALESCE(risk_level, ''),
+                               COUNT(*), SUM(churn_probability), SUM(churn_probability * churn_probability)
+                        FROM ({' UNION ALL '.join(sources)})
+                        GROUP BY 1, 2, 3
+                    """, {'start': start, 'end': end})
+                    conn.execute("DELETE FROM predictions WHERE prediction_date >= :start AND prediction_date < :end",
+                                 {'start': start, 'end': end})
+
+                if month in partitioned:
+                    conn.execute("DETACH DATABASE old_partition")
+                    if drop:
+                        os.remove(self.path(month))
+                    else:
+                        os.makedirs(self.archive_dir, exist_ok=True)
+                        shutil.move(self.path(month), os.path.join(self.archive_dir, f'predictions_{month}.db'))
+                print(f"🗄️ Compacted predictions for {month.replace('_', '-')}")
+        finally:
+            conn.close()
+        return sorted(legacy | partitioned)
+
+    def summary(self):
+        """Row count and file size of each live partition"""
+        partitions = []
+        for month in self.months():
+            conn = sqlite3.connect(self.path(month))
+            try:
+                rows = conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            finally:
+                conn.close()
+            partitions.append({'month': month, 'rows': rows, 'bytes': os.path.getsize(self.path(month))})
+        return partitions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage monthly prediction partitions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='Show live partitions')
+    compact_parser = subparsers.add_parser('compact', help='Roll up and archive months past retention')
+    compact_parser.add_argument('--retention-months', type=int, default=RETENTION_MONTHS)
+    compact_parser.add_argument('--drop', action='store_true', help='Delete old partitions instead of archiving')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for partition in PredictionPartitions().summary():
+            print(f"   {partition['month'].replace('_', '-')}  {partition['rows']:>10} rows  "
+                  f"{partition['bytes'] / 1e6:8.1f} MB")
+    else:
+        partitions = PredictionPartitions(retention_months=args.retention_months)
+        months = partitions.compact(drop=args.drop)
+        print(f"✅ Compacted {len(months)} month(s)")
@@ -0,0 +1,53 @@
+# Daily prediction trends, read from prediction_daily_rollup (see db_migrations)
+#
+# The rollup holds one row per (date, model version, risk band), so a trend query
+# reads a bounded number of rows no matter how many predictions have been written.
+# Its dates are server-local days of prediction_date, so the window is counted back
+# from today in local time as well.
+MAX_TREND_DAYS = 365
+
+TRENDS_SQL = """
+    SELECT
+        date,
+        SUM(predictions_count) AS predictions_count,
+        SUM(probability_sum) AS probability_sum,
+        SUM(probability_sum_sq) AS probability_sum_sq,
+        SUM(CASE WHEN risk_level = 'High Risk' THEN predictions_count ELSE 0 END) AS high_risk_count,
+        SUM(CASE WHEN risk_level = 'Medium Risk' THEN predictions_count ELSE 0 END) AS medium_risk_count,
+        SUM(CASE WHEN risk_level = 'Low Risk' THEN predictions_count ELSE 0 END) AS low_risk_count
+    FROM prediction_daily_rollup
+    WHERE date >= date('now', 'localtime', ?){version_filter}
+    GROUP BY date
+    ORDER BY date
+"""
+
+def build_trends_query(args):
+    """Parameterized trends query for ?days= (1-365, default 30) and an optional ?model_version="""
+    days = int(args.get('days', 30))
+    if not 1 <= days <= MAX_TREND_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_TREND_DAYS}")
+
+    # Today plus the previous days - 1, so at most MAX_TREND_DAYS dates come back
+    params = [f'-{days - 1} days']
+    version_filter = ''
+    if args.get('model_version'):
+        version_filter = ' AND model_version = ?'
+        params.append(args['model_version'])
+    return TRENDS_SQL.format(version_filter=version_filter), params
+
+def trend_records(rows):
+    """Response form of trend rows: daily count, mean and std of churn probability (%), band counts"""
+    records = []
+    for date, count, total, total_sq, high, medium, low in rows:
+        mean = total / count
+        variance = max(total_sq / count - mean * mean, 0)
+        records.append({
+            'date': date,
+            'predictions_count': count,
+            'avg_churn_prob': round(mean * 100, 1),
+            'std_churn_prob': round(variance ** 0.5 * 100, 1),
+            'high_risk_count': high,
+            'medium_risk_count': medium,
+            'low_risk_count': low
+        })
+    return records
@@ -0,0 +1,172 @@
+# Read-only snapshots of the database for dashboard and export queries
+#
+#   CHURN_READ_REPLICA=snapshot gunicorn -c gunicorn.conf.py backend_app:app
+#   CHURN_SNAPSHOT_INTERVAL=15 CHURN_SNAPSHOT_MAX_STALENESS=60
+#
+# Under SQLite's rollback journal, a long dashboard scan keeps prediction INSERTs
+# waiting, and a pending write blocks new readers. With CHURN_READ_REPLICA=snapshot,
+# a background thread copies the database and its attached prediction partitions
+# into snapshots/<created_ms>/ with the online backup API. All files are copied
+# inside one read transaction, so they agree with each other. Read-only endpoints
+# open the newest snapshot with mode=ro and writers keep the primary. The only lock they share
+# is the one held while a copy runs. A snapshot older than the staleness bound is
+# ignored, and reads go back to the primary until a new one lands.
+import fcntl
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from db_migrations import DB_PATH
+from prediction_partitions import PredictionPartitions, read_only_uri
+
+SNAPSHOT_INTERVAL = float(os.environ.get('CHURN_SNAPSHOT_INTERVAL', 15))
+MAX_STALENESS = float(os.environ.get('CHURN_SNAPSHOT_MAX_STALENESS', 60))
+
+# Snapshots kept on disk; the previous one stays for requests that opened it just before a swap
+KEEP_SNAPSHOTS = 2
+
+class SnapshotReplica:
+    """Periodic backup-API copies of the primary database that read-only endpoints query"""
+
+    def __init__(self, db_path=DB_PATH, partitions=None, snapshot_dir=None,
+                 interval=SNAPSHOT_INTERVAL, max_staleness=MAX_STALENESS):
+        if max_staleness < interval:
+            raise ValueError("max_staleness must be at least the snapshot interval")
+        self.db_path = db_path
+        self.partitions = partitions or PredictionPartitions(db_path)
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'snapshots')
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.last_copy_seconds = None
+        self.snapshot_bytes = None
+        self.snapshot_reads = 0
+        self.primary_reads = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def latest(self):
+        """(directory, created timestamp) of the newest published snapshot, or None"""
+        try:
+            with open(os.path.join(self.snapshot_dir, 'CURRENT')) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.snapshot_dir, name), int(name) / 1000
+
+    def current(self):
+        """(read-only URI, PredictionPartitions) of the newest snapshot within the staleness bound, or None
+
+        Connect with uri=True; the partitions attach read-only as well.
+        """
+        latest = self.latest()
+        fresh = latest is not None and time.time() - latest[1] <= self.max_staleness
+        with self._lock:
+            if fresh:
+                self.snapshot_reads += 1
+            else:
+                self.primary_reads += 1
+        if not fresh:
+            return None
+        db_path = os.path.join(latest[0], os.path.basename(self.db_path))
+        partition_dir = os.path.join(latest[0], os.path.basename(self.partitions.partition_dir))
+        partitions = PredictionPartitions(db_path, partition_dir, self.partitions.retention_months, read_only=True)
+        return read_only_uri(db_path), partitions
+
+    def take(self):
+        """Copy the primary into a new snapshot; False if another process is copying or just did"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # Serving processes share the snapshot directory; one copy per interval serves them all
+        with open(os.path.join(self.snapshot_dir, '.lock'), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            latest = self.latest()
+            if latest is not None and time.time() - latest[1] < self.interval:
+                return False
+
+            start = time.perf_counter()
+            source = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                self.partitions.attach(source)
+                files = [(row[1], row[2]) for row in source.execute("PRAGMA database_list") if row[1] != 'temp']
+                # Read every file inside one transaction so the copies match each other
+                source.execute("BEGIN")
+                for schema, _ in files:
+                    source.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+                created = time.time()
+                name = str(int(created * 1000))
+                staging = os.path.join(self.snapshot_dir, name + '.tmp')
+                os.makedirs(os.path.join(staging, os.path.basename(self.partitions.partition_dir)))
+
+                size = 0
+                for schema, path in files:
+                    if schema == 'main':
+                        target_path = os.path.join(staging, os.path.basename(self.db_path))
+                    else:
+                        target_path = os.path.join(staging, os.path.basename(self.partitions.partition_dir),
+                                                   os.path.basename(path))
+                    target = sqlite3.connect(target_path)
+                    try:
+                        source.backup(target, name=schema)
+                    finally:
+                        target.close()
+                    size += os.path.getsize(target_path)
+                source.execute("COMMIT")
+            finally:
+                source.close()
+
+            os.rename(staging, os.path.join(self.snapshot_dir, name))
+            pointer = os.path.join(self.snapshot_dir, 'CURRENT.tmp')
+            with open(pointer, 'w') as f:
+                f.write(name)
+            os.replace(pointer, os.path.join(self.snapshot_dir, 'CURRENT'))
+            self._prune()
+
+        self.last_copy_seconds = time.perf_counter() - start
+        self.snapshot_bytes = size
+        return True
+
+    def _prune(self):
+        """Delete all but the newest KEEP_SNAPSHOTS snapshots and any abandoned staging copies"""
+        names = sorted(
+            (name for name in os.listdir(self.snapshot_dir) if name.split('.')[0].isdigit()),
+            key=lambda name: int(name.split('.')[0])
+        )
+        published = [name for name in names if name.isdigit()]
+        for name in names:
+            if name.endswith('.tmp') or name in published[:-KEEP_SNAPSHOTS]:
+                # Open connections keep reading unlinked files, so in-flight requests finish
+                shutil.rmtree(os.path.join(self.snapshot_dir, name), ignore_errors=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='read-replica-snapshot', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.take()
+            except Exception as e:
+                print(f"Error taking database snapshot: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def summary(self):
+        latest = self.latest()
+        return {
+            'mode': 'snapshot',
+            'snapshot_age_seconds': None if latest is None else round(time.time() - latest[1], 1),
+            'max_staleness_seconds': self.max_staleness,
+            'interval_seconds': self.interval,
+            'last_copy_seconds': self.last_copy_seconds,
+            'snapshot_bytes': self.snapshot_bytes,
+            'snapshot_reads': self.snapshot_reads,
+            'primary_reads': self.primary_reads
+        }
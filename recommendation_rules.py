@@ -0,0 +1,138 @@
+# Declarative retention recommendations, evaluated as boolean masks over the feature matrix
+#
+# retention_rules.json lists rules as {id, priority, message, when}; `when` is a list of
+# {feature, op, value} conditions that must all hold. `feature` is any model feature or
+# churn_probability (0-1). Rows matching no rule get the fallback message. Edits to the
+# file are picked up by running servers without a restart.
+import json
+import operator
+import os
+import threading
+
+import numpy as np
+
+RULES_PATH = 'retention_rules.json'
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+class RuleSet:
+    """A rules table compiled against the model's feature columns"""
+
+    def __init__(self, config, feature_columns):
+        rules = sorted(config['rules'], key=lambda rule: rule.get('priority', 0))
+        # Recommendation sets are encoded as one bit per rule in an int64
+        if len(rules) > 62:
+            raise ValueError("At most 62 rules are supported")
+
+        self.fallback = config.get('fallback')
+        self.ids = [rule['id'] for rule in rules]
+        self.messages = [rule['message'] for rule in rules]
+        self.conditions = []
+        for rule in rules:
+            compiled = []
+            for condition in rule['when']:
+                feature = condition['feature']
+                if feature != 'churn_probability' and feature not in feature_columns:
+                    raise ValueError(f"Rule {rule['id']}: unknown feature {feature}")
+                if condition['op'] not in OPERATORS:
+                    raise ValueError(f"Rule {rule['id']}: unknown operator {condition['op']}")
+                column = None if feature == 'churn_probability' else feature_columns.index(feature)
+                compiled.append((column, OPERATORS[condition['op']], float(condition['value'])))
+            self.conditions.append(compiled)
+
+        self.probability_thresholds = sorted({
+            value for compiled in self.conditions for column, _, value in compiled if column is None
+        })
+        self._lists = {}
+
+    def masks(self, X, churn_probs):
+        """Boolean (rows, rules) matrix of which rules fire, in priority order"""
+        X = np.asarray(X)
+        churn_probs = np.asarray(churn_probs)
+        fired = np.ones((len(churn_probs), len(self.conditions)), dtype=bool)
+        for i, compiled in enumerate(self.conditions):
+            for column, compare, value in compiled:
+                fired[:, i] &= compare(churn_probs if column is None else X[:, column], value)
+        return fired
+
+    def codes(self, X, churn_probs):
+        """Bitmask per row; bit i set when rule i (see self.messages) fires"""
+        return self.masks(X, churn_probs) @ (np.int64(1) << np.arange(len(self.conditions), dtype=np.int64))
+
+    def messages_for(self, code):
+        messages = self._lists.get(code)
+        if messages is None:
+            messages = [message for i, message in enumerate(self.messages) if code >> i & 1]
+            if not messages and self.fallback:
+                messages = [self.fallback]
+            self._lists[code] = messages
+        return messages
+
+    def recommend(self, X, churn_probs):
+        """Recommendation list for every row; rows with the same rules share one list"""
+        unique, inverse = np.unique(self.codes(X, churn_probs), return_inverse=True)
+        lists = [self.messages_for(int(code)) for code in unique]
+        return [lists[i] for i in inverse]
+
+def load_rules(feature_columns, path=RULES_PATH):
+    with open(path) as f:
+        return RuleSet(json.load(f), feature_columns)
+
+class RecommendationRules:
+    """The current RuleSet, recompiled in the background when the rules file changes"""
+
+    def __init__(self, feature_columns, path=RULES_PATH, refresh_interval=5):
+        self.feature_columns = list(feature_columns)
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.rules = None
+        self.mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        return self.rules
+
+    def reload(self):
+        """Recompile if the file changed; a broken file keeps the previous rules"""
+        mtime = os.path.getmtime(self.path)
+        if mtime == self.mtime:
+            return False
+        try:
+            rules = load_rules(self.feature_columns, self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if self.rules is None:
+                raise
+            print(f"❌ Retention rules not reloaded: {e}")
+            return False
+        finally:
+            self.mtime = mtime
+
+        reloaded = self.rules is not None
+        self.rules = rules
+        if reloaded:
+            print(f"🔄 Retention rules reloaded ({len(rules.messages)} rules)")
+        return True
+
+    def start(self):
+        if self.rules is None:
+            self.reload()
+        self._thread = threading.Thread(target=self._run, name='retention-rules-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading retention rules: {e}")
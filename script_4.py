@@ -7,46 +7,13 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, roc_auc_score
 import joblib
 import json
+from recommendation_rules import load_rules
+from churn_features import create_features, load_dataset
 
-# Load the dataset
-df = pd.read_csv('customer_churn_dataset.csv')
+# Load the dataset (with window interaction counts when CHURN_INTERACTION_FEATURES=1)
+df = load_dataset()
 print(f"Dataset loaded: {df.shape}")
 
-# Efficient preprocessing
-def create_features(data):
-    """Create engineered features for churn prediction"""
-    
-    # Select most important features based on domain knowledge
-    numeric_features = [
-        'age', 'subscription_length_months', 'monthly_bill', 'total_usage_gb',
-        'customer_service_calls', 'satisfaction_score', 'last_payment_days_ago',
-        'last_login_days_ago', 'credit_score', 'support_tickets', 'avg_monthly_usage_growth'
-    ]
-    
-    binary_features = [
-        'phone_service', 'multiple_lines', 'online_security', 'online_backup',
-        'device_protection', 'tech_support', 'streaming_tv', 'streaming_movies', 'paperless_billing'
-    ]
-    
-    # Create feature matrix
-    X = data[numeric_features + binary_features].copy()
-    
-    # Add engineered features
-    X['clv_estimate'] = data['monthly_bill'] * data['subscription_length_months']
-    X['services_count'] = data[binary_features].sum(axis=1)
-    X['high_value'] = (data['monthly_bill'] > 100).astype(int)
-    X['new_customer'] = (data['subscription_length_months'] <= 6).astype(int)
-    X['at_risk'] = ((data['satisfaction_score'] < 6) | 
-                    (data['customer_service_calls'] > 3) |
-                    (data['last_payment_days_ago'] > 30)).astype(int)
-    
-    # Add categorical features as binary
-    X['contract_monthly'] = (data['contract_type'] == 'Month-to-month').astype(int)
-    X['payment_electronic'] = (data['payment_method'] == 'Electronic check').astype(int)
-    X['internet_fiber'] = (data['internet_service'] == 'Fiber optic').astype(int)
-    
-    return X
-
 # Create features and target
 print("Creating features...")
 X = create_features(df)
@@ -103,9 +70,18 @@ feature_info = {
     'feature_importance': feature_importance.to_dict('records')[:20]  # Top 20
 }
 
+# Permutation importance (AUC drop), unbiased by how many split points a feature offers
+print("\nComputing permutation importance...")
+from permutation_importance import permutation_importance
+feature_info['permutation_importance'] = permutation_importance('churn_model.pkl', X_test, y_test)[:20]
+
 with open('model_info.json', 'w') as f:
     json.dump(feature_info, f, indent=2)
 
+# Training histograms that the API's drift monitor compares live traffic against
+from drift_monitor import build_reference, save_reference
+save_reference(build_reference(X_train))
+
 # Create prediction function
 def predict_customer_churn(customer_data, model_path='churn_model.pkl'):
     """
@@ -156,31 +132,11 @@ def predict_customer_churn(customer_data, model_path='churn_model.pkl'):
 def get_recommendation(churn_prob, customer_data):
     """Generate personalized retention recommendation"""
     if isinstance(customer_data, dict):
-        data = customer_data
-    else:
-        data = customer_data.iloc[0].to_dict()
-    
-    recommendations = []
-    
-    if churn_prob > 0.6:
-        recommendations.append("🔴 URGENT: Contact customer immediately")
-        
-    if data.get('satisfaction_score', 7) < 6:
-        recommendations.append("📞 Follow up on satisfaction concerns")
-        
-    if data.get('customer_service_calls', 0) > 3:
-        recommendations.append("🎧 Provide premium support")
-        
-    if data.get('contract_type') == 'Month-to-month':
-        recommendations.append("📋 Offer long-term contract incentive")
-        
-    if data.get('monthly_bill', 50) > 100:
-        recommendations.append("💰 Consider loyalty discount")
-        
-    if not recommendations:
-        recommendations.append("✅ Customer appears stable")
-    
-    return recommendations
+        customer_data = pd.DataFrame([customer_data])
+
+    # Same rules table the API serves recommendations from
+    rules = load_rules(X.columns.tolist())
+    return rules.recommend(create_features(customer_data).to_numpy(), [churn_prob])[0]
 
 # Test the prediction function
 print("\nTesting prediction function...")
@@ -217,4 +173,5 @@ print("\n✅ Machine learning model completed successfully!")
 print("📁 Files created:")
 print("   - churn_model.pkl (trained model)")
 print("   - model_info.json (model metadata)")
+print("   - drift_reference.json (training feature histograms)")
 print(f"📊 Model AUC Score: {auc_score:.3f}")
\ No newline at end of file
@@ -2,9 +2,13 @@
 import sqlite3
 import pandas as pd
 import json
+import os
 from datetime import datetime, timedelta
 import random
 
+from db_migrations import migrate_database
+from prediction_partitions import PredictionPartitions
+
 # Create SQLite database with comprehensive schema
 def create_database_schema():
     """Create comprehensive database schema for churn prediction system"""
@@ -18,6 +22,16 @@ def create_database_schema():
     cursor.execute('DROP TABLE IF EXISTS customer_interactions')
     cursor.execute('DROP TABLE IF EXISTS subscription_history')
     cursor.execute('DROP TABLE IF EXISTS model_performance')
+    # Tables db_migrations.py derives from the ones above; user_version 0 re-applies every migration
+    for table in ['prediction_daily_rollup', 'prediction_labels', 'latest_predictions', 'customer_changes',
+                  'customer_churns', 'label_backfill_state', 'evaluation_histogram', 'evaluation_watermark',
+                  'interaction_daily_counts', 'interaction_ingest_offsets']:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    cursor.execute('PRAGMA user_version = 0')
+    # Monthly partitions hold predictions for the dropped customers
+    partitions = PredictionPartitions()
+    for month in partitions.months():
+        os.remove(partitions.path(month))
     
     # Customers table - main customer information
     cursor.execute('''
@@ -129,6 +143,8 @@ def create_database_schema():
     
     conn.commit()
     conn.close()
+    # Triggers, rollups and indexes the API relies on; created before populating so the triggers see every row
+    migrate_database()
     print("✅ Database schema created successfully!")
 
 # Populate database with sample data
@@ -147,8 +163,9 @@ def populate_database():
     domains = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'company.com']
     
     for _, row in df.iterrows():
-        # Generate email
-        email = f"{row['first_name'].lower()}.{row['last_name'].lower()}@{random.choice(domains)}"
+        # Generate email; the customer number keeps it unique, as the schema requires
+        email = (f"{row['first_name'].lower()}.{row['last_name'].lower()}{row['customer_id'].split('_')[-1]}"
+                 f"@{random.choice(domains)}")
         
         # Generate phone
         phone = f"+1-{random.randint(100,999)}-{random.randint(100,999)}-{random.randint(1000,9999)}"
@@ -165,7 +182,7 @@ def populate_database():
                 paperless_billing, payment_method, customer_service_calls, satisfaction_score,
                 last_payment_days_ago, last_login_days_ago, credit_score, support_tickets,
                 avg_monthly_usage_growth, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             row['customer_id'], row['first_name'], row['last_name'], email, phone,
             row['age'], row['gender'], row['location'], start_date.date(),
@@ -223,130 +240,67 @@ def create_database_functions():
     database_functions = '''
 import sqlite3
 import pandas as pd
-import json
 from datetime import datetime
 
+from analytics_replica import DASHBOARD_SQL, dashboard_record, sqlite_query
+from database_queries import CUSTOMER_BY_ID_SQL, CUSTOMERS_BY_RISK_SQL, PREDICTION_TRENDS_SQL
+from prediction_partitions import PredictionPartitions
+
 class ChurnDatabase:
     def __init__(self, db_path='churn_prediction_system.db'):
         self.db_path = db_path
+        self.partitions = PredictionPartitions(db_path)
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        # New predictions live in the monthly partitions; attaching them also installs their triggers
+        conn = sqlite3.connect(self.db_path)
+        self.partitions.attach(conn)
+        return conn
     
     def get_customer(self, customer_id):
         """Get customer by ID"""
         conn = self.get_connection()
-        query = "SELECT * FROM customers WHERE customer_id = ?"
-        customer = pd.read_sql_query(query, conn, params=(customer_id,))
+        customer = pd.read_sql_query(CUSTOMER_BY_ID_SQL, conn, params=(customer_id,))
         conn.close()
         return customer.iloc[0].to_dict() if not customer.empty else None
     
     def get_customers_by_risk(self, risk_level):
         """Get customers by risk level from latest predictions"""
         conn = self.get_connection()
-        query = """
-        SELECT c.*, p.churn_probability, p.risk_level, p.prediction_date
-        FROM customers c
-        JOIN predictions p ON c.customer_id = p.customer_id
-        WHERE p.risk_level = ? 
-        AND p.prediction_date = (
-            SELECT MAX(prediction_date) 
-            FROM predictions p2 
-            WHERE p2.customer_id = c.customer_id
-        )
-        ORDER BY p.churn_probability DESC
-        """
-        customers = pd.read_sql_query(query, conn, params=(risk_level,))
+        customers = pd.read_sql_query(CUSTOMERS_BY_RISK_SQL, conn, params=(risk_level,))
         conn.close()
         return customers
     
     def save_prediction(self, customer_id, prediction_result, model_version='v1.0'):
-        """Save prediction to database"""
+        """Save prediction to this month's partition"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO predictions 
-            (customer_id, prediction_date, churn_probability, churn_prediction, 
-             risk_level, model_version, features_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        self.partitions.insert(conn, [(
             customer_id,
             datetime.now(),
             prediction_result['churn_probability'] / 100,  # Convert back to decimal
             prediction_result['churn_prediction'],
             prediction_result['risk_level'],
-            model_version,
-            json.dumps({})  # Can store feature values if needed
-        ))
-        
+            model_version
+        )])
         conn.commit()
         conn.close()
     
     def get_dashboard_stats(self):
-        """Get key statistics for dashboard"""
+        """Get key statistics for dashboard, as /api/dashboard computes them"""
         conn = self.get_connection()
-        
-        # Total customers
-        total_customers = pd.read_sql_query("SELECT COUNT(*) as count FROM customers WHERE status = 'active'", conn).iloc[0]['count']
-        
-        # Churn rate (from latest predictions)
-        churn_stats = pd.read_sql_query("""
-            SELECT 
-                AVG(churn_probability) as avg_churn_prob,
-                COUNT(*) as total_predictions,
-                SUM(CASE WHEN risk_level = 'High Risk' THEN 1 ELSE 0 END) as high_risk_count,
-                SUM(CASE WHEN risk_level = 'Medium Risk' THEN 1 ELSE 0 END) as medium_risk_count,
-                SUM(CASE WHEN risk_level = 'Low Risk' THEN 1 ELSE 0 END) as low_risk_count
-            FROM predictions p1
-            WHERE p1.prediction_date = (
-                SELECT MAX(p2.prediction_date) 
-                FROM predictions p2 
-                WHERE p2.customer_id = p1.customer_id
-            )
-        """, conn).iloc[0]
-        
-        # Monthly revenue at risk
-        revenue_at_risk = pd.read_sql_query("""
-            SELECT 
-                SUM(c.monthly_bill) as total_revenue_at_risk
-            FROM customers c
-            JOIN predictions p ON c.customer_id = p.customer_id
-            WHERE p.risk_level = 'High Risk'
-            AND p.prediction_date = (
-                SELECT MAX(prediction_date) 
-                FROM predictions p2 
-                WHERE p2.customer_id = c.customer_id
-            )
-        """, conn).iloc[0]['total_revenue_at_risk'] or 0
-        
+        stats = dashboard_record(sqlite_query(conn, DASHBOARD_SQL)[0])
         conn.close()
-        
-        return {
-            'total_customers': total_customers,
-            'average_churn_risk': round(churn_stats['avg_churn_prob'] * 100, 1),
-            'high_risk_customers': int(churn_stats['high_risk_count']),
-            'medium_risk_customers': int(churn_stats['medium_risk_count']),
-            'low_risk_customers': int(churn_stats['low_risk_count']),
-            'revenue_at_risk': round(revenue_at_risk, 2)
-        }
+        return stats
     
     def get_prediction_trends(self, days=30):
         """Get prediction trends over time"""
+        if not 1 <= int(days) <= 365:
+            raise ValueError("days must be between 1 and 365")
         conn = self.get_connection()
         
-        query = """
-        SELECT 
-            DATE(prediction_date) as date,
-            AVG(churn_probability) as avg_churn_prob,
-            COUNT(*) as predictions_count
-        FROM predictions
-        WHERE prediction_date >= date('now', '-{} days')
-        GROUP BY DATE(prediction_date)
-        ORDER BY date
-        """.format(days)
-        
-        trends = pd.read_sql_query(query, conn)
+        # prediction_daily_rollup is maintained on insert, so this reads one row per day and band.
+        # Its dates are local days; today and the previous days - 1 give at most `days` dates
+        trends = pd.read_sql_query(PREDICTION_TRENDS_SQL, conn, params=[f'-{int(days) - 1} days'])
         conn.close()
         return trends
 
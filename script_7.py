@@ -274,15 +274,15 @@ def dashboard_stats():
             WHERE p.risk_level = 'High Risk' AND c.status = 'active'
         ''').fetchone()
         
-        # Churn trends (last 30 days)
+        # Churn trends (last 30 days): rollup dates are local days, so count back from today's local date
         trends = conn.execute('''
             SELECT 
-                DATE(prediction_date) as date,
-                AVG(churn_probability) as avg_churn_prob,
-                COUNT(*) as predictions_count
-            FROM predictions
-            WHERE prediction_date >= date('now', '-30 days')
-            GROUP BY DATE(prediction_date)
+                date,
+                SUM(probability_sum) / SUM(predictions_count) as avg_churn_prob,
+                SUM(predictions_count) as predictions_count
+            FROM prediction_daily_rollup
+            WHERE date >= date('now', 'localtime', '-29 days')
+            GROUP BY date
             ORDER BY date
         ''').fetchall()
         
@@ -0,0 +1,162 @@
+import logging
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+from columnar_batch import RISK_LEVELS, risk_codes
+
+# Candidate latency buckets: log-spaced from 0.1 ms to 10 s
+LATENCY_EDGES_MS = np.logspace(-1, 4, 51)
+# Candidate minus primary probability, in 0.05 steps
+DIFF_EDGES = np.linspace(-1, 1, 41)
+
+logger = logging.getLogger(__name__)
+
+class ShadowStats:
+    """Running comparison of candidate and primary scores for one candidate version"""
+
+    def __init__(self, candidate_version):
+        self.candidate_version = candidate_version
+        self.started_at = time.time()
+        self.rows = 0
+        self.diff_sum = 0.0
+        self.diff_sq_sum = 0.0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.prediction_flips = 0
+        self.band_flips = np.zeros((len(RISK_LEVELS), len(RISK_LEVELS)), dtype=np.int64)
+        self.diff_histogram = np.zeros(len(DIFF_EDGES) - 1, dtype=np.int64)
+        self.latency_histogram = np.zeros(len(LATENCY_EDGES_MS) + 1, dtype=np.int64)
+        self.latency_sum_ms = 0.0
+        self.calls = 0
+
+    def record(self, primary_probs, candidate_probs, latency_ms):
+        diff = candidate_probs - primary_probs
+        self.rows += len(diff)
+        self.diff_sum += float(diff.sum())
+        self.diff_sq_sum += float((diff * diff).sum())
+        self.abs_diff_sum += float(np.abs(diff).sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(np.abs(diff).max()))
+        self.prediction_flips += int(np.count_nonzero((primary_probs >= 0.5) != (candidate_probs >= 0.5)))
+        np.add.at(self.band_flips, (risk_codes(primary_probs), risk_codes(candidate_probs)), 1)
+        self.diff_histogram += np.histogram(np.clip(diff, -1, 1), DIFF_EDGES)[0]
+        self.latency_histogram[np.searchsorted(LATENCY_EDGES_MS, latency_ms)] += 1
+        self.latency_sum_ms += latency_ms
+        self.calls += 1
+
+    def latency_percentile(self, q):
+        """Upper bucket edge below which q of the candidate calls finished"""
+        if not self.calls:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(self.latency_histogram), q * self.calls))
+        return float(LATENCY_EDGES_MS[min(bucket, len(LATENCY_EDGES_MS) - 1)])
+
+    def summary(self):
+        rows = self.rows or 1
+        changed = self.band_flips.sum() - np.trace(self.band_flips)
+        return {
+            'candidate_version': self.candidate_version,
+            'started_at': self.started_at,
+            'rows_scored': self.rows,
+            'mean_diff': self.diff_sum / rows,
+            'mean_abs_diff': self.abs_diff_sum / rows,
+            'rmse': (self.diff_sq_sum / rows) ** 0.5,
+            'max_abs_diff': self.max_abs_diff,
+            'prediction_flips': self.prediction_flips,
+            'risk_band_flip_rate': int(changed) / rows,
+            # risk_band_flips[primary][candidate], indexed like risk_levels
+            'risk_levels': RISK_LEVELS,
+            'risk_band_flips': self.band_flips.tolist(),
+            'diff_histogram': {
+                'edges': DIFF_EDGES.round(2).tolist(),
+                'counts': self.diff_histogram.tolist()
+            },
+            'candidate_latency_ms': {
+                'calls': self.calls,
+                'mean': self.latency_sum_ms / self.calls if self.calls else None,
+                'p50': self.latency_percentile(0.50),
+                'p95': self.latency_percentile(0.95),
+                'p99': self.latency_percentile(0.99)
+            }
+        }
+
+
+class ShadowScorer:
+    """Scores a candidate model on copies of live traffic, off the request path"""
+
+    def __init__(self, registry, feature_columns, workers=1, queue_size=10000, log=logger):
+        self.registry = registry
+        self.feature_columns = feature_columns
+        self.workers = workers
+        self.log = log
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.stats = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, features, primary_probs):
+        """Queue scored rows for the candidate; never blocks the caller"""
+        candidate = self.registry.candidate
+        if candidate is None:
+            return
+        try:
+            self._queue.put_nowait((candidate, features, primary_probs))
+        except queue.Full:
+            # Shadow results are a sample; shedding them is preferable to slowing requests
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.submitted += 1
+
+    def _score(self, candidate, features, primary_probs):
+        X = pd.DataFrame(np.atleast_2d(features), columns=self.feature_columns)
+        start = time.perf_counter()
+        candidate_probs = candidate.model.predict_proba(X)[:, 1]
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            if self.stats is None or self.stats.candidate_version != candidate.version:
+                self.stats = ShadowStats(candidate.version)
+            self.stats.record(np.atleast_1d(primary_probs), candidate_probs, latency_ms)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._score(*item)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                self.log.exception("Shadow scoring failed for candidate %s", item[0].version)
+
+    def summary(self):
+        candidate = self.registry.candidate
+        with self._lock:
+            stats = self.stats.summary() if self.stats else None
+            submitted, dropped, failed = self.submitted, self.dropped, self.failed
+        return {
+            'enabled': candidate is not None,
+            'candidate_version': candidate.version if candidate else None,
+            'submitted': submitted,
+            'dropped': dropped,
+            'failed': failed,
+            'queued': self._queue.qsize(),
+            'comparison': stats
+        }
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'shadow-scoring-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
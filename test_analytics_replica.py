@@ -0,0 +1,98 @@
+import random
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics_replica import (
+    AnalyticsReplica, DASHBOARD_SQL, SEGMENT_COLUMNS, dashboard_record, segments_sql, segment_records, sqlite_query
+)
+from customer_snapshot import CustomerSnapshot
+from db_migrations import DB_PATH, migrate_database
+from prediction_partitions import PredictionPartitions, month_bounds
+
+pytest.importorskip('duckdb')
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Migrated copy of the database with predictions in the main table and this month's partition"""
+    path = str(tmp_path / 'churn.db')
+    shutil.copy(DB_PATH, path)
+    migrate_database(path)
+
+    rng = random.Random(7)
+    now = datetime.now()
+    conn = sqlite3.connect(path)
+    customer_ids = [row[0] for row in conn.execute("SELECT customer_id FROM customers")]
+    rows = []
+    for customer_id in customer_ids:
+        for _ in range(3):
+            probability = rng.random()
+            risk_level = 'High Risk' if probability >= 0.7 else 'Medium Risk' if probability >= 0.4 else 'Low Risk'
+            rows.append((customer_id, now - timedelta(days=rng.randint(0, 400)), probability,
+                         int(probability >= 0.5), risk_level, 'v1.0'))
+    # Rows written before partitioning, some of them older than the retention window
+    conn.executemany("""
+        INSERT INTO predictions
+        (customer_id, prediction_date, churn_probability, churn_prediction, risk_level, model_version)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    partitions = PredictionPartitions(path)
+    partitions.attach(conn)
+    partitions.insert(conn, [(row[0], now) + row[2:] for row in rows[:len(rows) // 6]])
+    conn.commit()
+    conn.close()
+    return path
+
+def sqlite_aggregates(path):
+    conn = sqlite3.connect(path)
+    try:
+        PredictionPartitions(path).attach(conn)
+        return (dashboard_record(sqlite_query(conn, DASHBOARD_SQL)[0]),
+                {segment: segment_records(sqlite_query(conn, segments_sql(segment))) for segment in SEGMENT_COLUMNS})
+    finally:
+        conn.close()
+
+def replica_aggregates(replica):
+    return (dashboard_record(replica.query(DASHBOARD_SQL)[0]),
+            {segment: segment_records(replica.query(segments_sql(segment))) for segment in SEGMENT_COLUMNS})
+
+def prediction_counts(path, replica):
+    """Predictions older than the retention window and in total, on SQLite and on the replica"""
+    oldest = month_bounds(PredictionPartitions(path).oldest_month())[0]
+    sql = "SELECT SUM(prediction_date < ?), COUNT(*) FROM {predictions}"
+    conn = sqlite3.connect(path)
+    try:
+        PredictionPartitions(path).attach(conn)
+        return sqlite_query(conn, sql, (oldest,))[0], tuple(replica.query(sql, (oldest,))[0])
+    finally:
+        conn.close()
+
+def test_replica_mirrors_compaction(db_path):
+    replica = AnalyticsReplica(db_path)
+    replica.refresh()
+    # Main-table rows past retention stay on both engines until the retention job runs
+    sqlite_counts, replica_counts = prediction_counts(db_path, replica)
+    assert sqlite_counts[0] > 0
+    assert replica_counts == sqlite_counts
+
+    PredictionPartitions(db_path).compact()
+    replica.refresh()
+    sqlite_counts, replica_counts = prediction_counts(db_path, replica)
+    assert sqlite_counts[0] == 0
+    assert replica_counts == sqlite_counts
+
+def test_sqlite_and_duckdb_aggregates_match(db_path):
+    # /api/dashboard and /api/analytics/segments answer the same whichever engine is serving them
+    replica = AnalyticsReplica(db_path)
+    replica.refresh()
+    dashboard, segments = sqlite_aggregates(db_path)
+    assert dashboard['high_risk_customers'] > 0
+    assert replica_aggregates(replica) == (dashboard, segments)
+
+def test_snapshot_dashboard_matches_sqlite(db_path):
+    # /api/dashboard is computed from the customer snapshot until the replica has loaded
+    dashboard, _ = sqlite_aggregates(db_path)
+    snapshot = CustomerSnapshot(db_path).get()
+    assert dashboard_record(snapshot.dashboard_row()) == dashboard
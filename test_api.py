@@ -40,6 +40,13 @@ def test_api():
         print(f"Response: {json.dumps(response.json(), indent=2)}")
         print()
 
+        # Test score-by-id endpoint
+        print("🔢 Testing Score API...")
+        response = requests.get(f"{base_url}/api/customers/CUST_000001/score")
+        print(f"Status: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        print()
+
         # Test dashboard endpoint
         print("📊 Testing Dashboard API...")
         response = requests.get(f"{base_url}/api/dashboard")
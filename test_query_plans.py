@@ -0,0 +1,169 @@
+import random
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from db_migrations import DB_PATH, migrate_database
+from data_export import build_export_query, table_columns
+from prediction_partitions import PredictionPartitions
+from prediction_trends import build_trends_query
+from interaction_windows import STORED_CUSTOMERS_SQL, window_counts_sql, window_start
+from high_risk_index import CHANGES_SINCE_SQL, HIGH_RISK_PAGE_SQL
+from analytics_replica import DASHBOARD_SQL, segments_sql
+from customer_snapshot import SIGNATURE_SQL
+from database_queries import CUSTOMER_BY_ID_SQL, CUSTOMERS_BY_RISK_SQL, PREDICTION_TRENDS_SQL
+from feature_store import CHANGED_CUSTOMERS_SQL, CUSTOMERS_BY_IDS_SQL, INTERACTED_CUSTOMERS_SQL
+from change_rescoring import INPUT_HASHES_SQL
+from label_backfill import CHURN_CHUNK_SQL, EXPIRED_CHUNK_SQL, LABEL_CHURNED_SQL
+from online_evaluation import HISTOGRAM_SQL, LABELED_VERSIONS_SQL
+
+# Queries the API, the background workers, the in-memory stores and ChurnDatabase (database_queries.py)
+# issue against SQLite. Whole-table loads (SELECT * FROM customers for the snapshot and feature store,
+# unfiltered exports) read every row by design and are not listed, nor are reads of a queue's head.
+STATIC_QUERIES = {
+    'customer_by_id': (CUSTOMER_BY_ID_SQL, ('CUST_000001',)),
+    'customers_by_risk': (CUSTOMERS_BY_RISK_SQL, ('High Risk',)),
+    'prediction_trends': (PREDICTION_TRENDS_SQL, ('-29 days',)),
+    'feature_store_changes': (CHANGED_CUSTOMERS_SQL, ('2025-01-01',)),
+    'snapshot_signature': (SIGNATURE_SQL, ()),
+    'new_label_versions': (LABELED_VERSIONS_SQL, (0, 1000)),
+    'evaluation_histogram': (HISTOGRAM_SQL, ('v1.0',)),
+    'backfill_churns': (CHURN_CHUNK_SQL, (0, 500)),
+    'backfill_label_churned': (LABEL_CHURNED_SQL.format(table='predictions'),
+                               ('CUST_000001', '-90 days', '2025-01-01')),
+    'backfill_expired_chunk': (EXPIRED_CHUNK_SQL.format(table='predictions'), ('', -1, '2025-01-01', 10000)),
+    'window_counts_customers': (
+        window_counts_sql("AND customer_id IN (SELECT value FROM json_each(:customer_ids))"),
+        {'since_7': window_start(7), 'since_30': window_start(30), 'since_90': window_start(90),
+         'customer_ids': '["CUST_000001"]'},
+    ),
+    'stored_customers': (STORED_CUSTOMERS_SQL, ('["CUST_000001"]',)),
+    'feature_store_interacted': (INTERACTED_CUSTOMERS_SQL, (0, 1000)),
+    'rescoring_customers': (CUSTOMERS_BY_IDS_SQL, ('["CUST_000001"]',)),
+    'rescoring_input_hashes': (INPUT_HASHES_SQL, ('["CUST_000001"]',)),
+    'high_risk_page': (HIGH_RISK_PAGE_SQL, (20, 1000)),
+    'high_risk_changes_since': (CHANGES_SINCE_SQL, (0,)),
+}
+
+# Aggregates SQLite answers while the analytics replica is off or loading. They read every active
+# customer and its latest prediction by design, so they are checked separately below
+AGGREGATE_QUERIES = {
+    'dashboard': DASHBOARD_SQL.format(customers='customers', latest_predictions='latest_predictions'),
+    'segments': segments_sql('contract_type').format(customers='customers', latest_predictions='latest_predictions'),
+}
+
+EXPORT_ARGS = [
+    ('customers', {'since': '2025-01-01'}),
+    ('predictions', {'since': '2025-01-01', 'until': '2025-02-01'}),
+    ('predictions', {'customer_id': 'CUST_000001', 'since': '2025-01-01'}),
+]
+
+TREND_ARGS = [{'days': '365'}, {'days': '30', 'model_version': 'v1.0'}]
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    """Migrated copy of the database with a realistic prediction history per customer"""
+    path = str(tmp_path_factory.mktemp('plans') / 'churn.db')
+    shutil.copy(DB_PATH, path)
+
+    conn = sqlite3.connect(path)
+    rng = random.Random(42)
+    now = datetime.now()
+    customer_ids = [row[0] for row in conn.execute("SELECT customer_id FROM customers")]
+    rows = []
+    for customer_id in customer_ids:
+        for _ in range(10):
+            probability = rng.random()
+            risk_level = 'High Risk' if probability >= 0.7 else 'Medium Risk' if probability >= 0.4 else 'Low Risk'
+            rows.append((customer_id, now - timedelta(days=rng.randint(0, 400)), probability,
+                         int(probability > 0.5), risk_level, 'v1.0'))
+    conn.executemany("""
+        INSERT INTO predictions
+        (customer_id, prediction_date, churn_probability, churn_prediction, risk_level, model_version)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+    migrate_database(path)
+    conn = sqlite3.connect(path)
+    # Exports read predictions_all, the union of the main table and the monthly partitions
+    partitions = PredictionPartitions(path)
+    partitions.attach(conn)
+    partitions.insert(conn, [(row[0], now) + row[2:] for row in rows[:1000]])
+    conn.commit()
+    yield conn
+    conn.close()
+
+def api_queries(conn):
+    queries = dict(STATIC_QUERIES)
+    for table, args in EXPORT_ARGS:
+        query, params, _ = build_export_query(table_columns(conn, table), table, args)
+        queries[f"export_{table}_{'_'.join(args)}"] = (query, params)
+    for args in TREND_ARGS:
+        queries[f"trends_{'_'.join(args)}"] = build_trends_query(args)
+    return queries
+
+def full_scans(conn, query, params):
+    """Plan steps that read a whole table rather than an index"""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    # Scans of materialized subqueries, co-routines and json_each are not table reads
+    subqueries = {step.split(' ', 1)[1] for step in plan if step.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    return [
+        step for step in plan
+        if step.startswith('SCAN ') and ' USING ' not in step and ' VIRTUAL TABLE ' not in step
+        and step[len('SCAN '):] not in subqueries
+    ]
+
+def test_no_query_scans_a_whole_table(conn):
+    regressions = {}
+    for name, (query, params) in api_queries(conn).items():
+        scans = full_scans(conn, query, params)
+        if scans:
+            regressions[name] = scans
+    assert not regressions, f"Queries fell back to full table scans: {regressions}"
+
+def test_customers_by_risk_does_not_sort(conn):
+    # ChurnDatabase reads one risk band of idx_latest_predictions_risk_probability in probability order
+    query, params = STATIC_QUERIES['customers_by_risk']
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    assert any('idx_latest_predictions_risk_probability (risk_level=?)' in step for step in plan), plan
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+def test_high_risk_pages_do_not_sort(conn):
+    # Pages walk the High Risk range of idx_latest_predictions_risk_probability in order rather than
+    # sorting every active customer
+    query, params = STATIC_QUERIES['high_risk_page']
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    assert any('idx_latest_predictions_risk_probability (risk_level=?)' in step for step in plan), plan
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+def plan_tree(conn, query, params=()):
+    """(detail, detail of each ancestor step) for every step of a query plan"""
+    steps = {}
+    for step_id, parent, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+        steps[step_id] = (detail, parent)
+    tree = []
+    for detail, parent in steps.values():
+        ancestors = []
+        while parent in steps:
+            ancestors.append(steps[parent][0])
+            parent = steps[parent][1]
+        tree.append((detail, ancestors))
+    return tree
+
+def test_aggregates_read_latest_predictions_by_customer(conn):
+    # Each active customer probes its latest_predictions row through a covering index; the prediction
+    # history is never read
+    for name, query in AGGREGATE_QUERIES.items():
+        plan = [detail for detail, _ in plan_tree(conn, query)]
+        assert any(step.startswith('SEARCH p USING COVERING INDEX idx_latest_predictions_customer_risk (customer_id=?)')
+                   for step in plan), (name, plan)
+        assert not any('predictions' in step.replace('latest_predictions', '') for step in plan), (name, plan)
+
+def test_dashboard_reads_active_customers_by_index(conn):
+    # In customer_id order, so the probes above walk their index in order too
+    plan = [detail for detail, _ in plan_tree(conn, AGGREGATE_QUERIES['dashboard'])]
+    assert any('COVERING INDEX idx_customers_status_id_bill (status=?)' in step for step in plan), plan